@@ -3,19 +3,22 @@
 SM3项目命令行接口
 
 提供统一的命令行入口来运行各种SM3相关功能
+各子命令只在执行时导入所需模块，以缩短 `cli.py hash` 等命令的启动时间
 """
 
 import argparse
 import sys
 import time
-import os
-from sm3_algorithms import SM3Basic, SM3Optimized, SM3Benchmark, test_standard_vectors
-from merkle_tree import MerkleTree, demo_merkle_tree, large_merkle_tree_test
-from length_extension_attack import demonstrate_length_extension_attack, demonstrate_hmac_protection
 
 
 def cmd_hash(args):
-    """计算文件或字符串的SM3哈希"""
+    """计算文件、字符串、标准输入或目录树的SM3哈希"""
+    if args.tree:
+        cmd_hash_tree(args)
+        return
+    
+    from sm3_algorithms import SM3Basic, SM3Optimized
+    
     if args.optimized:
         sm3 = SM3Optimized()
         print("使用优化版本SM3")
@@ -23,15 +26,27 @@ def cmd_hash(args):
         sm3 = SM3Basic()
         print("使用基础版本SM3")
     
-    if args.file:
+    if args.input is None or args.input == '-':
+        # 从标准输入/管道读取
+        data = sys.stdin.buffer.read()
+        
+        start_time = time.perf_counter()
+        hash_result = sm3.hash(data)
+        elapsed = time.perf_counter() - start_time
+        
+        print("输入: <stdin>")
+        print(f"大小: {len(data)} 字节")
+        print(f"SM3: {hash_result}")
+        print(f"计算时间: {elapsed*1000:.2f} 毫秒")
+    elif args.file:
         # 计算文件哈希
         try:
             with open(args.input, 'rb') as f:
                 data = f.read()
             
-            start_time = time.time()
+            start_time = time.perf_counter()
             hash_result = sm3.hash(data)
-            elapsed = time.time() - start_time
+            elapsed = time.perf_counter() - start_time
             
             print(f"文件: {args.input}")
             print(f"大小: {len(data)} 字节")
@@ -53,10 +68,28 @@ def cmd_hash(args):
         print(f"SM3: {hash_result}")
 
 
+def cmd_hash_tree(args):
+    """并行计算目录树的SM3清单和Merkle根，只重新计算变化的文件"""
+    from tree_hash import hash_tree, print_tree_result
+    
+    implementation = 'optimized' if args.optimized else 'basic'
+    print(f"目录: {args.tree}")
+    
+    try:
+        result = hash_tree(args.tree, args.manifest, args.jobs, implementation)
+    except NotADirectoryError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+    
+    print_tree_result(result)
+
+
 def cmd_benchmark(args):
     """运行性能基准测试"""
     print("=== SM3性能基准测试 ===")
     
+    from sm3_algorithms import SM3Benchmark
+    
     benchmark = SM3Benchmark()
     
     # 默认测试大小
@@ -118,6 +151,10 @@ def cmd_test(args):
     """运行测试套件"""
     print("=== SM3测试套件 ===")
     
+    from sm3_algorithms import SM3Benchmark, test_standard_vectors
+    from merkle_tree import demo_merkle_tree
+    from length_extension_attack import demonstrate_length_extension_attack
+    
     # 1. 标准测试向量
     if not args.skip_vectors:
         print("\n1. 标准测试向量验证")
@@ -150,6 +187,8 @@ def cmd_test(args):
 
 def cmd_merkle(args):
     """Merkle树操作"""
+    from merkle_tree import MerkleTree, demo_merkle_tree, large_merkle_tree_test
+    
     if args.demo:
         print("运行Merkle树演示...")
         demo_merkle_tree()
@@ -205,8 +244,10 @@ def cmd_merkle(args):
 
 def cmd_attack(args):
     """长度扩展攻击演示"""
+    from length_extension_attack import (demonstrate_length_extension_attack,
+                                         demonstrate_hmac_protection, interactive_demo)
+    
     if args.interactive:
-        from length_extension_attack import interactive_demo
         interactive_demo()
     else:
         print("运行长度扩展攻击演示...")
@@ -218,50 +259,31 @@ def cmd_attack(args):
         return success
 
 
+def cmd_oracle(args):
+    """本地MAC验证服务吞吐量测试"""
+    from mac_oracle import demo_mac_oracle, serve_mac_oracle, attack_mac_oracle
+    
+    if args.serve:
+        serve_mac_oracle(args.host, args.port)
+    elif args.connect:
+        if not (args.message and args.mac and args.secret_length):
+            print("错误: --connect 需要同时指定 --message、--mac 和 --secret-length")
+            sys.exit(1)
+        attack_mac_oracle(args.host, args.port, args.message.encode('utf-8'), args.mac,
+                          args.secret_length, args.requests, args.connections, args.window)
+    else:
+        demo_mac_oracle(args.requests, args.connections, args.window)
+
+
 def cmd_verify(args):
     """OpenSSL对比验证"""
     print("=== 与OpenSSL标准实现对比验证 ===")
     
-    import subprocess
     from sm3_algorithms import SM3Basic
-    
-    def check_openssl():
-        """检查OpenSSL是否支持SM3"""
-        try:
-            result = subprocess.run(
-                ['openssl', 'dgst', '-sm3'],
-                input="test",
-                text=True,
-                capture_output=True,
-                check=True
-            )
-            return True
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            return False
-    
-    def compare_with_openssl(message):
-        """与OpenSSL对比单个消息"""
-        try:
-            # OpenSSL结果
-            result = subprocess.run(
-                ['openssl', 'dgst', '-sm3'],
-                input=message,
-                text=True,
-                capture_output=True,
-                check=True
-            )
-            openssl_hash = result.stdout.strip().split('= ')[1]
-            
-            # 我们的结果
-            sm3 = SM3Basic()
-            our_hash = sm3.hash(message.encode('utf-8'))
-            
-            return our_hash, openssl_hash, our_hash == openssl_hash
-        except Exception as e:
-            return None, None, False
+    from openssl_backend import openssl_sm3_available, openssl_sm3_many
     
     # 检查OpenSSL可用性
-    if not check_openssl():
+    if not openssl_sm3_available():
         print("❌ OpenSSL不可用或不支持SM3算法")
         print("   请确保安装了支持SM3的OpenSSL版本")
         return
@@ -283,18 +305,23 @@ def cmd_verify(args):
             "1234567890" * 10
         ]
     
+    # 一次性批量获取OpenSSL结果
+    sm3 = SM3Basic()
+    openssl_hashes = openssl_sm3_many(v.encode('utf-8') for v in test_vectors)
+    
     all_passed = True
     
-    for i, test_input in enumerate(test_vectors, 1):
+    for i, (test_input, openssl_hash) in enumerate(zip(test_vectors, openssl_hashes), 1):
         print(f"测试 {i}: {repr(test_input[:30])}{('...' if len(test_input) > 30 else '')}")
         
-        our_hash, openssl_hash, match = compare_with_openssl(test_input)
-        
-        if our_hash is None:
+        if openssl_hash is None:
             print("  ❌ 测试失败")
             all_passed = False
             continue
         
+        our_hash = sm3.hash(test_input.encode('utf-8'))
+        match = our_hash == openssl_hash
+        
         print(f"  我们的实现: {our_hash}")
         print(f"  OpenSSL:    {openssl_hash}")
         print(f"  匹配结果:   {'✅' if match else '❌'}")
@@ -316,6 +343,18 @@ def cmd_verify(args):
         subprocess.run([sys.executable, "openssl_verification.py"], cwd=".")
 
 
+def cmd_fuzz(args):
+    """差分模糊测试"""
+    from sm3_fuzz import run_fuzz
+    
+    result = run_fuzz(args.count, args.jobs, args.seed, args.max_len, args.out,
+                      use_reference=not args.no_reference)
+    
+    print(f"用时: {result['elapsed']:.2f} 秒, 吞吐量: {result['messages_per_second']:.0f} 条/秒")
+    if result['failures']:
+        sys.exit(1)
+
+
 def create_sample_data(args):
     """创建示例数据文件"""
     if args.type == 'text':
@@ -343,6 +382,41 @@ def create_sample_data(args):
         print(f"已创建 {filename}，大小 {size} 字节")
 
 
+def profile_startup(argv):
+    """以 -X importtime 重新运行命令，汇总启动阶段的导入耗时，返回子进程退出码"""
+    import subprocess
+    
+    command = [sys.executable, '-X', 'importtime', __file__] + argv
+    start_time = time.perf_counter()
+    result = subprocess.run(command, stderr=subprocess.PIPE, text=True)
+    wall_time = time.perf_counter() - start_time
+    
+    # 格式: import time: self [us] | cumulative | imported package
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            print(line, file=sys.stderr)
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(fields[0]), int(fields[1]), depth))
+    
+    top_level = [item for item in imports if item[3] == 0]
+    total_import = sum(item[2] for item in top_level)
+    
+    print("\n=== 启动耗时分析 (-X importtime) ===", file=sys.stderr)
+    print(f"进程总耗时: {wall_time*1000:.2f} 毫秒", file=sys.stderr)
+    print(f"模块导入耗时: {total_import/1000:.2f} 毫秒 ({len(imports)} 个模块)", file=sys.stderr)
+    print(f"{'顶层导入':<28} {'累计(ms)':>10} {'自身(ms)':>10}", file=sys.stderr)
+    for name, self_us, cumulative_us, _ in sorted(top_level, key=lambda item: -item[2])[:10]:
+        print(f"{name:<28} {cumulative_us/1000:>10.2f} {self_us/1000:>10.2f}", file=sys.stderr)
+    
+    return result.returncode
+
+
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(
@@ -353,6 +427,9 @@ def main():
   %(prog)s hash "hello world"                    # 计算字符串哈希
   %(prog)s hash -f document.txt                  # 计算文件哈希
   %(prog)s hash -f large_file.dat --optimized   # 使用优化版本
+  echo -n abc | %(prog)s hash                    # 从管道读取
+  %(prog)s hash --tree artifacts/ -j 8           # 目录树清单与Merkle根
+  %(prog)s --profile-startup hash abc            # 报告启动耗时
   
   %(prog)s benchmark                             # 运行性能测试
   %(prog)s benchmark -s 4096 -i 10000           # 指定测试参数
@@ -366,18 +443,27 @@ def main():
   
   %(prog)s attack                                # 长度扩展攻击演示
   %(prog)s attack --interactive --show-hmac     # 交互式演示
+  %(prog)s oracle -n 5000 --window 64           # 本地MAC验证服务吞吐量测试
+  
+  %(prog)s fuzz -n 1000000 -j 8                 # 差分模糊测试
   
   %(prog)s sample text -o data.txt -c 1000      # 创建示例数据
         """
     )
     
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='以 -X importtime 运行命令并报告启动耗时')
+    
     subparsers = parser.add_subparsers(dest='command', help='可用命令')
     
     # hash命令
     hash_parser = subparsers.add_parser('hash', help='计算SM3哈希值')
-    hash_parser.add_argument('input', help='输入字符串或文件路径')
+    hash_parser.add_argument('input', nargs='?', help='输入字符串或文件路径（省略或为 - 时读取标准输入）')
     hash_parser.add_argument('-f', '--file', action='store_true', help='输入是文件路径')
     hash_parser.add_argument('--optimized', action='store_true', help='使用优化版本')
+    hash_parser.add_argument('--tree', metavar='DIR', help='计算目录树清单和Merkle根（只重算变化的文件）')
+    hash_parser.add_argument('--manifest', help='清单文件路径（默认 DIR/.sm3_manifest.json）')
+    hash_parser.add_argument('-j', '--jobs', type=int, help='并行进程数（默认CPU核数）')
     hash_parser.set_defaults(func=cmd_hash)
     
     # benchmark命令
@@ -410,12 +496,37 @@ def main():
     attack_parser.add_argument('--show-hmac', action='store_true', help='显示HMAC防护')
     attack_parser.set_defaults(func=cmd_attack)
     
+    # oracle命令
+    oracle_parser = subparsers.add_parser('oracle', help='本地MAC验证服务吞吐量测试')
+    oracle_mode = oracle_parser.add_mutually_exclusive_group()
+    oracle_mode.add_argument('--serve', action='store_true', help='只运行MAC验证服务')
+    oracle_mode.add_argument('--connect', action='store_true', help='只运行客户端，连接已运行的服务')
+    oracle_parser.add_argument('--host', default='127.0.0.1', help='服务地址')
+    oracle_parser.add_argument('--port', type=int, default=9300, help='服务端口')
+    oracle_parser.add_argument('-n', '--requests', type=int, default=1000, help='伪造请求数量')
+    oracle_parser.add_argument('-c', '--connections', type=int, default=4, help='客户端连接数')
+    oracle_parser.add_argument('-w', '--window', type=int, default=32, help='每个连接的流水线窗口')
+    oracle_parser.add_argument('--message', help='原始消息（--connect模式）')
+    oracle_parser.add_argument('--mac', help='原始MAC（--connect模式）')
+    oracle_parser.add_argument('--secret-length', type=int, help='密钥长度（--connect模式）')
+    oracle_parser.set_defaults(func=cmd_oracle)
+    
     # verify命令
     verify_parser = subparsers.add_parser('verify', help='与OpenSSL标准实现对比验证')
     verify_parser.add_argument('--quick', action='store_true', help='快速验证（少量测试用例）')
     verify_parser.add_argument('--full', action='store_true', help='完整验证（包括HMAC和攻击验证）')
     verify_parser.set_defaults(func=cmd_verify)
     
+    # fuzz命令
+    fuzz_parser = subparsers.add_parser('fuzz', help='SM3实现差分模糊测试')
+    fuzz_parser.add_argument('-n', '--count', type=int, default=100000, help='随机消息数量')
+    fuzz_parser.add_argument('-j', '--jobs', type=int, help='进程数（默认CPU核数）')
+    fuzz_parser.add_argument('--seed', type=int, help='随机种子（用于复现）')
+    fuzz_parser.add_argument('--max-len', type=int, default=320, help='最大消息长度（字节）')
+    fuzz_parser.add_argument('--out', default='fuzz_failures', help='失败输入保存目录')
+    fuzz_parser.add_argument('--no-reference', action='store_true', help='不与OpenSSL参考实现对比')
+    fuzz_parser.set_defaults(func=cmd_fuzz)
+    
     # sample命令
     sample_parser = subparsers.add_parser('sample', help='创建示例数据')
     sample_parser.add_argument('type', choices=['text', 'binary'], help='数据类型')
@@ -424,6 +535,10 @@ def main():
     sample_parser.add_argument('-s', '--size', type=int, help='二进制文件大小')
     sample_parser.set_defaults(func=create_sample_data)
     
+    # 启动耗时分析在子进程中重新运行命令
+    if '--profile-startup' in sys.argv[1:]:
+        sys.exit(profile_startup([arg for arg in sys.argv[1:] if arg != '--profile-startup']))
+    
     # 解析参数
     args = parser.parse_args()
     
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+延迟统计
+
+MAC验证服务（mac_oracle）、SM2签名/验证服务以及SM2基准测试共用的百分位数与吞吐量汇总
+"""
+
+import math
+from typing import Dict, List
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """计算百分位数（最近秩法），samples无需预先排序"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = math.ceil(q / 100 * len(ordered))
+    return ordered[min(len(ordered), max(rank, 1)) - 1]
+
+
+def summarize_latencies(count: int, elapsed: float, latencies: List[float]) -> Dict:
+    """汇总请求数、吞吐量和延迟百分位数（毫秒）"""
+    return {
+        'requests': count,
+        'elapsed': elapsed,
+        'requests_per_second': count / elapsed if elapsed > 0 else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': max(latencies) * 1000 if latencies else 0.0
+    }
+
+
+def print_stats(title: str, stats: Dict):
+    """打印吞吐量统计（按stats中存在的字段打印各服务特有的计数）"""
+    print(f"\n{title}:")
+    print(f"请求数: {stats['requests']}")
+    if 'accepted' in stats:
+        print(f"通过/拒绝: {stats['accepted']}/{stats['rejected']}")
+    if 'ok' in stats:
+        print(f"成功/失败/错误: {stats['ok']}/{stats['failed']}/{stats['errors']}")
+    if 'batches' in stats:
+        print(f"批次数: {stats['batches']}, 平均批大小: {stats['mean_batch']:.1f}")
+    print(f"总时间: {stats['elapsed']:.4f} 秒")
+    print(f"吞吐量: {stats['requests_per_second']:.0f} 请求/秒")
+    print(f"延迟 p50/p95/p99: {stats['p50_ms']:.3f} / {stats['p95_ms']:.3f} / "
+          f"{stats['p99_ms']:.3f} 毫秒 (max {stats['max_ms']:.3f})")
@@ -5,42 +5,23 @@
 演示SM3算法的长度扩展攻击漏洞以及HMAC-SM3的防护效果
 """
 
-import os
-import subprocess
-from typing import Tuple
 from sm3_algorithms import SM3Basic
+from openssl_backend import get_backend, openssl_sm3_available
 
 
 def run_openssl_sm3(message: bytes) -> str:
     """使用OpenSSL计算SM3哈希"""
-    try:
-        result = subprocess.run(
-            ['openssl', 'dgst', '-sm3'],
-            input=message,
-            capture_output=True,
-            check=True
-        )
-        # 输出格式: SM3(stdin)= hash_value
-        return result.stdout.decode().strip().split('= ')[1]
-    except (subprocess.CalledProcessError, FileNotFoundError, IndexError):
-        return None
+    backend = get_backend()
+    return backend.sm3(message) if backend else None
 
 
 def run_openssl_hmac_sm3(message: bytes, key: bytes) -> str:
     """使用OpenSSL计算HMAC-SM3"""
-    try:
-        # 确保key是字符串格式
-        key_str = key.decode('utf-8') if isinstance(key, bytes) else key
-        
-        result = subprocess.run(
-            ['openssl', 'dgst', '-sm3', '-hmac', key_str],
-            input=message,
-            capture_output=True,
-            check=True
-        )
-        return result.stdout.decode().strip().split('= ')[1]
-    except (subprocess.CalledProcessError, FileNotFoundError, IndexError):
+    backend = get_backend()
+    if backend is None:
         return None
+    key_bytes = key.encode('utf-8') if isinstance(key, str) else key
+    return backend.hmac_sm3(message, key_bytes)
 
 
 def demonstrate_length_extension_attack():
@@ -50,7 +31,7 @@ def demonstrate_length_extension_attack():
     sm3 = SM3Basic()
     
     # 检查OpenSSL是否可用
-    openssl_available = run_openssl_sm3(b"test") is not None
+    openssl_available = openssl_sm3_available()
     if openssl_available:
         print("✅ OpenSSL SM3支持已检测到，将进行对比验证")
     else:
@@ -188,7 +169,7 @@ def demonstrate_hmac_protection():
         return sm3.hash(outer_input)
     
     # 检查OpenSSL是否可用
-    openssl_available = run_openssl_sm3(b"test") is not None
+    openssl_available = openssl_sm3_available()
     
     # 使用相同的测试数据
     secret = b"super_secret_key_12345"
@@ -275,7 +256,7 @@ def interactive_demo():
     print("=== 交互式长度扩展攻击演示 ===")
     
     sm3 = SM3Basic()
-    openssl_available = run_openssl_sm3(b"test") is not None
+    openssl_available = openssl_sm3_available()
     
     if openssl_available:
         print("✅ OpenSSL可用，将进行验证对比")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+流水线行协议客户端
+
+请求和响应各占一行，服务端在同一连接上按请求顺序返回响应。请求轮流分配到多个连接，
+每个连接最多保持window个未完成请求。MAC验证服务与SM2签名/验证服务的负载客户端共用
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+from latency_stats import summarize_latencies
+
+
+class PipelinedLineClient:
+    """以流水线方式发送按行请求的异步客户端（TCP或Unix套接字）"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, connections: int = 4,
+                 window: int = 32, unix_path: Optional[str] = None):
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.connections = max(1, connections)
+        self.window = max(1, window)
+
+    async def _open(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        if self.unix_path:
+            return await asyncio.open_unix_connection(self.unix_path)
+        return await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, line: bytes) -> bytes:
+        """发送单个请求并返回响应行"""
+        reader, writer = await self._open()
+        try:
+            writer.write(line)
+            await writer.drain()
+            return await reader.readline()
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+    async def _run_connection(self, lines: List[bytes], latencies: List[float], responses: List[bytes]):
+        """在单个连接上发送请求，最多保持window个未完成请求"""
+        reader, writer = await self._open()
+        in_flight = asyncio.Semaphore(self.window)
+        send_times: Deque[float] = deque()
+
+        async def send_all():
+            for line in lines:
+                await in_flight.acquire()
+                send_times.append(time.perf_counter())
+                writer.write(line)
+                await writer.drain()
+
+        async def receive_all():
+            for _ in range(len(lines)):
+                line = await reader.readline()
+                if not line:
+                    raise ConnectionError("服务端提前关闭连接")
+                # 同一连接上的响应按请求顺序返回
+                latencies.append(time.perf_counter() - send_times.popleft())
+                responses.append(line)
+                in_flight.release()
+
+        try:
+            await asyncio.gather(send_all(), receive_all())
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+    async def run_lines(self, lines: List[bytes]) -> Tuple[Dict, List[bytes]]:
+        """发送全部请求行，返回 (客户端统计, 响应行)，延迟为往返时间"""
+        latencies: List[float] = []
+        responses: List[bytes] = []
+
+        # 轮流分配到各个连接
+        shards = [lines[i::self.connections] for i in range(self.connections)]
+
+        start = time.perf_counter()
+        await asyncio.gather(*(self._run_connection(shard, latencies, responses)
+                               for shard in shards if shard))
+        elapsed = time.perf_counter() - start
+
+        return summarize_latencies(len(latencies), elapsed, latencies), responses
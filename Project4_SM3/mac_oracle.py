@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+MAC验证服务模拟模块
+
+在本地启动基于asyncio的TCP服务，使用 SM3(secret || message) 校验消息认证码，
+并提供以流水线方式发送伪造请求的异步客户端，用于对长度扩展攻击流程和
+验证端进行吞吐量与延迟测试
+
+协议（按行，ASCII）:
+  请求: <message_hex> <mac_hex>\\n
+  响应: OK\\n | FAIL\\n | ERR\\n
+"""
+
+import asyncio
+import hmac
+import time
+from typing import Dict, List, Optional, Tuple
+from sm3_algorithms import SM3Basic
+from latency_stats import summarize_latencies, print_stats
+from line_client import PipelinedLineClient
+
+
+class MACOracleServer:
+    """使用 SM3(secret || message) 校验MAC的本地服务"""
+
+    def __init__(self, secret: bytes, host: str = '127.0.0.1', port: int = 0):
+        self.secret = secret
+        self.host = host
+        self.port = port
+        self.sm3 = SM3Basic()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        """清空服务端统计"""
+        self.accepted = 0
+        self.rejected = 0
+        self.errors = 0
+        self.latencies: List[float] = []
+        self._first_request: Optional[float] = None
+        self._last_response: Optional[float] = None
+
+    def compute_mac(self, message: bytes) -> str:
+        """服务端计算MAC"""
+        return self.sm3.hash(self.secret + message)
+
+    def verify(self, message: bytes, mac_hex: str) -> bool:
+        """校验MAC（恒定时间比较，与真实服务端一致）"""
+        return hmac.compare_digest(self.compute_mac(message).encode(), mac_hex.lower().encode())
+
+    async def start(self) -> Tuple[str, int]:
+        """启动服务，返回实际监听的 (host, port)"""
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        self.host, self.port = self._server.sockets[0].getsockname()[:2]
+        return self.host, self.port
+
+    async def stop(self):
+        """停止服务"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def serve_forever(self):
+        """启动服务并一直运行"""
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """处理单个连接上的流水线请求"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                start = time.perf_counter()
+                if self._first_request is None:
+                    self._first_request = start
+
+                try:
+                    message_hex, mac_hex = line.split()
+                    ok = self.verify(bytes.fromhex(message_hex.decode()), mac_hex.decode())
+                    response = b'OK\n' if ok else b'FAIL\n'
+                    if ok:
+                        self.accepted += 1
+                    else:
+                        self.rejected += 1
+                except ValueError:
+                    response = b'ERR\n'
+                    self.errors += 1
+
+                writer.write(response)
+                end = time.perf_counter()
+                self.latencies.append(end - start)
+                self._last_response = end
+
+                # 仅在写缓冲区超过高水位时才会真正等待
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def stats(self) -> Dict:
+        """服务端统计（延迟为单个请求的处理时间）"""
+        count = len(self.latencies)
+        elapsed = 0.0
+        if self._first_request is not None and self._last_response is not None:
+            elapsed = self._last_response - self._first_request
+        stats = summarize_latencies(count, elapsed, self.latencies)
+        stats.update({'accepted': self.accepted, 'rejected': self.rejected, 'errors': self.errors})
+        return stats
+
+
+class MACOracleClient(PipelinedLineClient):
+    """以流水线方式向MAC验证服务发送伪造请求的异步客户端"""
+
+    async def run(self, requests: List[Tuple[bytes, str]]) -> Dict:
+        """发送全部请求并返回客户端统计（延迟为往返时间）"""
+        lines = [message.hex().encode() + b' ' + mac_hex.encode() + b'\n' for message, mac_hex in requests]
+        stats, responses = await self.run_lines(lines)
+        stats['accepted'] = sum(1 for line in responses if line == b'OK\n')
+        stats['rejected'] = len(responses) - stats['accepted']
+        return stats
+
+
+def forge_requests(original_message: bytes, original_mac: str, secret_length: int,
+                   count: int) -> List[Tuple[bytes, str]]:
+    """使用长度扩展攻击批量构造伪造请求 (message, mac)"""
+    sm3 = SM3Basic()
+    known_length = secret_length + len(original_message)
+    forged = []
+
+    for i in range(count):
+        append_data = f"&role=admin&request={i}".encode()
+        forged_mac, suffix = sm3.length_extension_attack(original_mac, known_length, append_data)
+        forged.append((original_message + suffix, forged_mac))
+
+    return forged
+
+
+async def run_oracle_benchmark(count: int = 1000, connections: int = 4, window: int = 32,
+                               secret: bytes = b"super_secret_key_12345",
+                               original_message: bytes = b"user=alice&role=user&balance=1000") -> Dict:
+    """在同一事件循环中启动服务端和客户端，测试攻击流程与验证端的吞吐量"""
+    server = MACOracleServer(secret)
+    host, port = await server.start()
+    print(f"MAC验证服务已启动: {host}:{port}")
+
+    try:
+        # 攻击者只知道原始消息、MAC和密钥长度
+        original_mac = server.compute_mac(original_message)
+
+        start = time.perf_counter()
+        requests = forge_requests(original_message, original_mac, len(secret), count)
+        forge_elapsed = time.perf_counter() - start
+
+        client = MACOracleClient(host, port, connections, window)
+        client_stats = await client.run(requests)
+    finally:
+        await server.stop()
+
+    return {
+        'forge_elapsed': forge_elapsed,
+        'forge_per_second': count / forge_elapsed if forge_elapsed > 0 else 0.0,
+        'client': client_stats,
+        'server': server.stats()
+    }
+
+
+def demo_mac_oracle(count: int = 1000, connections: int = 4, window: int = 32) -> Dict:
+    """运行本地MAC验证服务吞吐量测试并打印结果"""
+    print("=== 长度扩展攻击吞吐量测试 (本地MAC验证服务) ===")
+    print(f"请求数: {count}, 连接数: {connections}, 流水线窗口: {window}")
+
+    result = asyncio.run(run_oracle_benchmark(count, connections, window))
+
+    print(f"\n伪造请求构造: {result['forge_elapsed']:.4f} 秒 "
+          f"({result['forge_per_second']:.0f} 个/秒)")
+    print_stats("客户端 (往返延迟)", result['client'])
+    print_stats("服务端 (处理延迟)", result['server'])
+
+    if result['client']['accepted'] == result['client']['requests']:
+        print("\n⚠️  所有伪造请求均通过验证，SM3(secret || message) 不能作为MAC使用")
+
+    return result
+
+
+def serve_mac_oracle(host: str = '127.0.0.1', port: int = 9300,
+                     secret: bytes = b"super_secret_key_12345",
+                     sample_message: bytes = b"user=alice&role=user&balance=1000"):
+    """以独立进程运行MAC验证服务，退出时打印服务端统计"""
+    server = MACOracleServer(secret, host, port)
+
+    async def run():
+        bound_host, bound_port = await server.start()
+        print(f"MAC验证服务已启动: {bound_host}:{bound_port} (Ctrl-C 退出)")
+        print(f"示例消息: {sample_message.decode()}")
+        print(f"示例MAC: {server.compute_mac(sample_message)}")
+        print(f"密钥长度: {len(secret)} 字节")
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+    print_stats("服务端 (处理延迟)", server.stats())
+
+
+def attack_mac_oracle(host: str, port: int, original_message: bytes, original_mac: str,
+                      secret_length: int, count: int = 1000, connections: int = 4,
+                      window: int = 32) -> Dict:
+    """对已运行的MAC验证服务发起流水线伪造请求"""
+    start = time.perf_counter()
+    requests = forge_requests(original_message, original_mac, secret_length, count)
+    forge_elapsed = time.perf_counter() - start
+    print(f"伪造请求构造: {forge_elapsed:.4f} 秒 ({count / forge_elapsed:.0f} 个/秒)")
+
+    client = MACOracleClient(host, port, connections, window)
+    stats = asyncio.run(client.run(requests))
+    print_stats("客户端 (往返延迟)", stats)
+    return stats
+
+
+if __name__ == "__main__":
+    demo_mac_oracle()
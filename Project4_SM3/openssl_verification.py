@@ -5,44 +5,27 @@ OpenSSL对比验证脚本
 与OpenSSL的SM3实现进行对比验证，确保我们的实现正确
 """
 
-import subprocess
 import sys
 from sm3_algorithms import SM3Basic, SM3Optimized
 from length_extension_attack import demonstrate_length_extension_attack
+from openssl_backend import openssl_sm3_available, openssl_sm3_many, openssl_hmac_sm3_many
 
 
 def run_openssl_sm3(message: str) -> str:
     """使用OpenSSL计算SM3哈希"""
-    try:
-        result = subprocess.run(
-            ['openssl', 'dgst', '-sm3'],
-            input=message,
-            text=True,
-            capture_output=True,
-            check=True
-        )
-        # 输出格式: SM3(stdin)= hash_value
-        return result.stdout.strip().split('= ')[1]
-    except (subprocess.CalledProcessError, FileNotFoundError, IndexError) as e:
-        print(f"OpenSSL命令执行失败: {e}")
-        return None
+    data = message.encode('utf-8') if isinstance(message, str) else message
+    result = openssl_sm3_many([data])[0]
+    if result is None:
+        print("OpenSSL SM3计算失败")
+    return result
 
 
 def run_openssl_hmac_sm3(message: str, key: str) -> str:
     """使用OpenSSL计算HMAC-SM3"""
-    try:
-        result = subprocess.run(
-            ['openssl', 'dgst', '-sm3', '-hmac', key],
-            input=message,
-            text=True,
-            capture_output=True,
-            check=True
-        )
-        # 输出格式: SM3(stdin)= hash_value
-        return result.stdout.strip().split('= ')[1]
-    except (subprocess.CalledProcessError, FileNotFoundError, IndexError) as e:
-        print(f"OpenSSL HMAC命令执行失败: {e}")
-        return None
+    result = openssl_hmac_sm3_many([(key.encode('utf-8'), message.encode('utf-8'))])[0]
+    if result is None:
+        print("OpenSSL HMAC-SM3计算失败")
+    return result
 
 
 def compare_sm3_implementations():
@@ -67,18 +50,18 @@ def compare_sm3_implementations():
     sm3_basic = SM3Basic()
     sm3_optimized = SM3Optimized()
     
+    # 一次性批量获取OpenSSL结果
+    openssl_results = openssl_sm3_many(v.encode('utf-8') for v in test_vectors)
+    
     all_passed = True
     
-    for i, test_input in enumerate(test_vectors, 1):
+    for i, (test_input, openssl_result) in enumerate(zip(test_vectors, openssl_results), 1):
         print(f"\n测试 {i}: {repr(test_input[:30])}{('...' if len(test_input) > 30 else '')} ({len(test_input)} 字符)")
         
         # 我们的实现
         our_basic = sm3_basic.hash(test_input.encode('utf-8'))
         our_optimized = sm3_optimized.hash(test_input.encode('utf-8'))
         
-        # OpenSSL实现
-        openssl_result = run_openssl_sm3(test_input)
-        
         if openssl_result is None:
             print("⚠️  OpenSSL不可用，跳过对比")
             continue
@@ -141,17 +124,19 @@ def compare_hmac_implementations():
         ("short", "The quick brown fox jumps over the lazy dog"),
     ]
     
+    # 一次性批量获取OpenSSL结果
+    openssl_results = openssl_hmac_sm3_many(
+        (key.encode('utf-8'), message.encode('utf-8')) for key, message in test_cases
+    )
+    
     all_passed = True
     
-    for i, (key, message) in enumerate(test_cases, 1):
+    for i, ((key, message), openssl_hmac) in enumerate(zip(test_cases, openssl_results), 1):
         print(f"\n测试 {i}: 密钥='{key[:20]}{'...' if len(key) > 20 else ''}', 消息='{message[:30]}{'...' if len(message) > 30 else ''}'")
         
         # 我们的HMAC实现
         our_hmac = hmac_sm3(key.encode('utf-8'), message.encode('utf-8'))
         
-        # OpenSSL HMAC实现
-        openssl_hmac = run_openssl_hmac_sm3(message, key)
-        
         if openssl_hmac is None:
             print("⚠️  OpenSSL HMAC不可用，跳过对比")
             continue
@@ -233,8 +218,7 @@ def comprehensive_verification():
     print("=" * 60)
     
     # 检查OpenSSL可用性
-    openssl_available = run_openssl_sm3("test") is not None
-    if not openssl_available:
+    if not openssl_sm3_available():
         print("❌ OpenSSL不可用或不支持SM3算法")
         print("   请确保安装了支持SM3的OpenSSL版本")
         return False
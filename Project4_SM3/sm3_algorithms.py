@@ -7,7 +7,7 @@ SM3算法实现模块
 
 import struct
 import time
-from typing import List, Tuple, Optional
+from typing import Iterable, List, Tuple, Optional
 from abc import ABC, abstractmethod
 
 
@@ -135,6 +135,30 @@ class SM3Base(ABC):
             (e ^ v[4]) & 0xFFFFFFFF, (f ^ v[5]) & 0xFFFFFFFF,
             (g ^ v[6]) & 0xFFFFFFFF, (h ^ v[7]) & 0xFFFFFFFF
         ]
+    
+    def compress_block(self, v: List[int], block: bytes) -> List[int]:
+        """压缩一个64字节分组（子类可替换为自己的压缩函数）"""
+        return self.compress(v, list(struct.unpack('>16I', block)))
+    
+    def hash_stream(self, chunks: Iterable[bytes]) -> str:
+        """按块流式计算SM3，只缓存不足一个分组的尾部，内存占用与输入总长度无关"""
+        v = self.IV.copy()
+        buffer = b''
+        length = 0
+        
+        for chunk in chunks:
+            length += len(chunk)
+            buffer += chunk
+            full = len(buffer) - len(buffer) % 64
+            for i in range(0, full, 64):
+                v = self.compress_block(v, buffer[i:i + 64])
+            buffer = buffer[full:]
+        
+        tail = buffer + b'\x80' + b'\x00' * ((55 - len(buffer)) % 64) + struct.pack('>Q', length * 8)
+        for i in range(0, len(tail), 64):
+            v = self.compress_block(v, tail[i:i + 64])
+        
+        return ''.join(f'{word:08x}' for word in v)
 
 
 class SM3Basic(SM3Base):
@@ -290,6 +314,10 @@ class SM3Optimized(SM3Base):
         
         return ''.join(f'{word:08x}' for word in v)
     
+    def compress_block(self, v: List[int], block: bytes) -> List[int]:
+        """压缩一个64字节分组（供按分组更新的流式哈希使用）"""
+        return self._optimized_compress(v, list(struct.unpack('>16I', block)))
+    
     def _optimized_compress(self, v: List[int], b: List[int]) -> List[int]:
         """优化的压缩函数"""
         w = self._optimized_message_expansion(b)
@@ -338,6 +366,20 @@ class SM3Optimized(SM3Base):
         return w
 
 
+# 已注册的SM3实现，差分测试会对所有实现逐一对比
+SM3_IMPLEMENTATIONS = {
+    'basic': SM3Basic,
+    'optimized': SM3Optimized,
+}
+
+
+def register_implementation(name: str, cls: type):
+    """注册新的SM3实现（需继承SM3Base）"""
+    if not issubclass(cls, SM3Base):
+        raise TypeError(f"{cls.__name__} 必须继承 SM3Base")
+    SM3_IMPLEMENTATIONS[name] = cls
+
+
 class SM3Benchmark:
     """SM3性能基准测试"""
     
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+SM3随机差分模糊测试
+
+生成集中在分组边界附近（55/56/63/64/119/120...字节）的随机消息，
+在多个进程中对比所有已注册的SM3实现以及OpenSSL参考实现（可用时），
+发现不一致时对输入进行最小化并保存
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from sm3_algorithms import SM3_IMPLEMENTATIONS
+from openssl_backend import get_backend
+
+
+# 每个分组内需要重点覆盖的偏移：填充恰好放得下/放不下长度字段、分组恰好填满
+BOUNDARY_OFFSETS = (0, 1, 54, 55, 56, 57, 62, 63)
+
+# 每批生成的消息数（参考实现按批调用）
+BATCH_SIZE = 256
+
+
+def random_message(rng: random.Random, max_len: int) -> bytes:
+    """生成随机消息，约80%的长度落在分组边界附近"""
+    if rng.random() < 0.8:
+        blocks = rng.randint(0, max(0, max_len // 64))
+        length = blocks * 64 + rng.choice(BOUNDARY_OFFSETS)
+        length = min(length, max_len)
+    else:
+        length = rng.randint(0, max_len)
+
+    # 混合全零、全0xFF和随机字节，覆盖进位/掩码相关的边界情况
+    pattern = rng.random()
+    if pattern < 0.1:
+        return bytes(length)
+    if pattern < 0.2:
+        return b'\xff' * length
+    return rng.getrandbits(8 * length).to_bytes(length, 'big') if length else b''
+
+
+def compute_digests(message: bytes, implementations: Dict[str, object],
+                    reference: Optional[str] = None) -> Dict[str, str]:
+    """计算各实现的摘要"""
+    digests = {name: impl.hash(message) for name, impl in implementations.items()}
+    if reference is not None:
+        digests['openssl'] = reference
+    return digests
+
+
+def is_mismatch(digests: Dict[str, str]) -> bool:
+    """各实现结果是否不一致"""
+    return len(set(digests.values())) > 1
+
+
+def minimize(message: bytes, still_fails: Callable[[bytes], bool]) -> bytes:
+    """最小化失败输入：先删除尽可能多的字节，再把剩余字节尽量置零"""
+    # 先按整个分组删除（保持长度对64取模不变），再逐步减半块大小删除片段
+    # （简化的delta debugging）
+    chunks = [64] + [c for c in (32, 16, 8, 4, 2, 1) if c < len(message)]
+    for chunk in chunks:
+        i = 0
+        while i < len(message):
+            candidate = message[:i] + message[i + chunk:]
+            if still_fails(candidate):
+                message = candidate
+            else:
+                i += chunk
+
+    # 长度已最小，尝试简化字节值
+    data = bytearray(message)
+    for i in range(len(data)):
+        if data[i] != 0:
+            original = data[i]
+            data[i] = 0
+            if not still_fails(bytes(data)):
+                data[i] = original
+    return bytes(data)
+
+
+def _fuzz_worker(task: Tuple[int, int, int, Dict[str, type], bool]) -> Tuple[int, List[bytes]]:
+    """工作进程：用给定种子生成并检查count条消息，返回 (检查数, 失败输入)"""
+    seed, count, max_len, classes, use_reference = task
+    rng = random.Random(seed)
+    implementations = {name: cls() for name, cls in classes.items()}
+    backend = get_backend() if use_reference else None
+
+    failures = []
+    checked = 0
+    while checked < count:
+        batch = [random_message(rng, max_len) for _ in range(min(BATCH_SIZE, count - checked))]
+        references = backend.sm3_many(batch) if backend else [None] * len(batch)
+
+        for message, reference in zip(batch, references):
+            if is_mismatch(compute_digests(message, implementations, reference)):
+                failures.append(message)
+        checked += len(batch)
+
+    return checked, failures
+
+
+def save_failure(out_dir: str, original: bytes, minimized: bytes, digests: Dict[str, str]) -> str:
+    """保存最小化后的失败输入及各实现的摘要，返回文件路径前缀"""
+    os.makedirs(out_dir, exist_ok=True)
+    fingerprint = hashlib.sha256(minimized).hexdigest()[:12]
+    name = f"sm3_mismatch_{len(minimized)}_{fingerprint}"
+    prefix = os.path.join(out_dir, name)
+
+    with open(prefix + '.bin', 'wb') as f:
+        f.write(minimized)
+    with open(prefix + '.json', 'w') as f:
+        json.dump({
+            'length': len(minimized),
+            'original_length': len(original),
+            'message_hex': minimized.hex(),
+            'digests': digests
+        }, f, indent=2)
+
+    return prefix
+
+
+def run_fuzz(count: int = 100000, jobs: Optional[int] = None, seed: Optional[int] = None,
+             max_len: int = 320, out_dir: str = 'fuzz_failures',
+             use_reference: bool = True, chunk_size: int = 2000,
+             max_minimize: int = 20) -> Dict:
+    """运行差分模糊测试并打印进度，最多最小化并保存max_minimize个失败输入"""
+    jobs = jobs or os.cpu_count() or 1
+    seed = seed if seed is not None else random.SystemRandom().randrange(2**32)
+    classes = dict(SM3_IMPLEMENTATIONS)
+
+    reference_available = use_reference and get_backend() is not None
+    names = list(classes) + (['openssl'] if reference_available else [])
+
+    print("=== SM3差分模糊测试 ===")
+    print(f"对比实现: {', '.join(names)}")
+    print(f"消息数: {count}, 进程数: {jobs}, 种子: {seed}, 最大长度: {max_len} 字节")
+    if use_reference and not reference_available:
+        print("⚠️  OpenSSL参考实现不可用，仅对比内部实现")
+
+    # 每个任务使用由主种子派生的独立种子，便于复现
+    tasks = []
+    for index, start in enumerate(range(0, count, chunk_size)):
+        task_seed = seed * 1000003 + index
+        tasks.append((task_seed, min(chunk_size, count - start), max_len, classes, reference_available))
+
+    failures: List[bytes] = []
+    checked = 0
+    start_time = time.perf_counter()
+
+    with multiprocessing.Pool(jobs) as pool:
+        for task_checked, task_failures in pool.imap_unordered(_fuzz_worker, tasks):
+            checked += task_checked
+            failures.extend(task_failures)
+            elapsed = time.perf_counter() - start_time
+            print(f"\r已检查 {checked}/{count} ({checked / elapsed:.0f} 条/秒), "
+                  f"不一致 {len(failures)}", end='', flush=True)
+
+    elapsed = time.perf_counter() - start_time
+    print()
+
+    # 最小化并保存失败输入（按最小化结果去重）
+    implementations = {name: cls() for name, cls in classes.items()}
+    backend = get_backend() if reference_available else None
+
+    def digests_for(message: bytes) -> Dict[str, str]:
+        reference = backend.sm3(message) if backend else None
+        return compute_digests(message, implementations, reference)
+
+    saved = {}
+    for message in failures[:max_minimize]:
+        minimized = minimize(message, lambda m: is_mismatch(digests_for(m)))
+        if minimized not in saved:
+            saved[minimized] = save_failure(out_dir, message, minimized, digests_for(minimized))
+            print(f"❌ 不一致输入 ({len(minimized)} 字节) 已保存: {saved[minimized]}.bin")
+
+    if len(failures) > max_minimize:
+        print(f"另有 {len(failures) - max_minimize} 个不一致输入未做最小化")
+    if not failures:
+        print("✅ 所有实现结果一致")
+
+    return {
+        'checked': checked,
+        'elapsed': elapsed,
+        'messages_per_second': checked / elapsed if elapsed > 0 else 0.0,
+        'seed': seed,
+        'failures': len(failures),
+        'saved': list(saved.values())
+    }
+
+
+if __name__ == "__main__":
+    run_fuzz()
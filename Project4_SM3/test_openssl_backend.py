@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+OpenSSL SM3/HMAC-SM3 后端测试
+
+library 与 cli 两种模式都与纯Python SM3/HMAC-SM3 对比（差分验证的基准），
+OpenSSL不支持SM3时跳过对应模式
+"""
+
+import unittest
+from openssl_backend import OpenSSLSM3Backend, _library_sm3_available, openssl_cli_available
+from sm3_algorithms import SM3Basic
+
+
+MESSAGES = [b'', b'abc', b'abcd' * 16, bytes(range(256)) * 3]
+
+# 空密钥、短密钥、恰好一个分组的密钥和超过分组长度（先哈希）的密钥
+KEYS = [b'', b'key', bytes(range(64)), b'k' * 100]
+
+
+def python_hmac_sm3(key: bytes, message: bytes) -> str:
+    """纯Python HMAC-SM3 (RFC 2104)"""
+    sm3 = SM3Basic()
+    if len(key) > 64:
+        key = bytes.fromhex(sm3.hash(key))
+    key = key.ljust(64, b'\x00')
+    inner = bytes.fromhex(sm3.hash(bytes(x ^ 0x36 for x in key) + message))
+    return sm3.hash(bytes(x ^ 0x5c for x in key) + inner)
+
+
+class TestOpenSSLBackend(unittest.TestCase):
+    """两种后端模式与纯Python实现一致"""
+
+    def check_backend(self, backend: OpenSSLSM3Backend):
+        sm3 = SM3Basic()
+        self.assertEqual(backend.sm3_many(MESSAGES), [sm3.hash(m) for m in MESSAGES])
+
+        items = [(key, message) for key in KEYS for message in MESSAGES]
+        self.assertEqual(backend.hmac_sm3_many(items), [python_hmac_sm3(k, m) for k, m in items])
+        self.assertEqual(backend.hmac_sm3(b'abc', b''), python_hmac_sm3(b'', b'abc'))
+
+    @unittest.skipUnless(_library_sm3_available(), "hashlib的OpenSSL不支持SM3")
+    def test_library_mode(self):
+        """进程内libcrypto模式"""
+        self.check_backend(OpenSSLSM3Backend('library'))
+
+    @unittest.skipUnless(openssl_cli_available(), "openssl命令行不可用或不支持SM3")
+    def test_cli_mode(self):
+        """批量命令行模式（包括空HMAC密钥的映射和跨批次的结果顺序）"""
+        self.check_backend(OpenSSLSM3Backend('cli', batch_size=3))
+
+
+if __name__ == "__main__":
+    unittest.main()
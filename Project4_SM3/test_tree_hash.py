@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+目录树哈希测试
+
+在临时目录中检查新增/变化/删除文件的识别、只按大小和修改时间判断是否重算、
+清单的Merkle根以及流式（分块）哈希
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import tree_hash
+from tree_hash import hash_tree, load_manifest, compute_merkle_root, MANIFEST_NAME
+from sm3_algorithms import SM3Basic
+
+
+class TestTreeHash(unittest.TestCase):
+    """目录树哈希与增量重算"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix='sm3_tree_')
+        self.sm3 = SM3Basic()
+        self.write('a.txt', b'alpha')
+        self.write('sub/b.bin', bytes(range(256)) * 5)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, *name.split('/'))
+
+    def write(self, name: str, data: bytes, mtime_ns: int = 1_000_000_000_000_000_000):
+        os.makedirs(os.path.dirname(self.path(name)), exist_ok=True)
+        with open(self.path(name), 'wb') as f:
+            f.write(data)
+        os.utime(self.path(name), ns=(mtime_ns, mtime_ns))
+
+    def run_tree(self, **kwargs):
+        return hash_tree(self.root, jobs=1, **kwargs)
+
+    def test_initial_scan(self):
+        """首次运行：全部为新增，摘要与Merkle根和清单一致"""
+        result = self.run_tree()
+        self.assertEqual(result['added'], ['a.txt', 'sub/b.bin'])
+        self.assertEqual(result['changed'] + result['removed'] + result['reused'], [])
+
+        digests = {entry['path']: entry['sm3'] for entry in result['files']}
+        self.assertEqual(digests['a.txt'], self.sm3.hash(b'alpha'))
+        self.assertEqual(digests['sub/b.bin'], self.sm3.hash(bytes(range(256)) * 5))
+
+        manifest = load_manifest(os.path.join(self.root, MANIFEST_NAME))
+        self.assertEqual(sorted(manifest), ['a.txt', 'sub/b.bin'])
+        self.assertEqual(result['merkle_root'], compute_merkle_root(result['files']))
+
+    def test_incremental_changes(self):
+        """增量运行：复用、内容变化、仅修改时间变化、删除和新增"""
+        first = self.run_tree()
+
+        second = self.run_tree()
+        self.assertEqual(second['reused'], ['a.txt', 'sub/b.bin'])
+        self.assertEqual(second['hashed_bytes'], 0)
+        self.assertEqual(second['merkle_root'], first['merkle_root'])
+
+        # 大小不变、内容和修改时间变化
+        self.write('a.txt', b'ALPHA', mtime_ns=2_000_000_000_000_000_000)
+        third = self.run_tree()
+        self.assertEqual(third['changed'], ['a.txt'])
+        self.assertNotEqual(third['merkle_root'], first['merkle_root'])
+
+        # 只有修改时间变化: 重新计算，但摘要和根哈希不变
+        os.utime(self.path('a.txt'), ns=(3_000_000_000_000_000_000,) * 2)
+        fourth = self.run_tree()
+        self.assertEqual(fourth['changed'], ['a.txt'])
+        self.assertEqual(fourth['merkle_root'], third['merkle_root'])
+
+        # 内容变化但大小和修改时间都不变时不会被发现（只按元数据判断）
+        self.write('a.txt', b'alpha', mtime_ns=3_000_000_000_000_000_000)
+        self.assertEqual(self.run_tree()['reused'], ['a.txt', 'sub/b.bin'])
+
+        os.remove(self.path('sub/b.bin'))
+        self.write('c.txt', b'gamma')
+        fifth = self.run_tree()
+        self.assertEqual(fifth['removed'], ['sub/b.bin'])
+        self.assertEqual(fifth['added'], ['c.txt'])
+        self.assertEqual([entry['path'] for entry in fifth['files']], ['a.txt', 'c.txt'])
+
+    def test_manifest_excluded(self):
+        """自定义清单路径时，目录中的默认清单也不作为数据"""
+        default_root = self.run_tree()['merkle_root']
+        other = self.root + '.json'
+        try:
+            result = self.run_tree(manifest_path=other)
+        finally:
+            os.remove(other)
+        self.assertEqual(result['added'], ['a.txt', 'sub/b.bin'])
+        self.assertEqual(result['merkle_root'], default_root)
+
+    def test_chunked_hashing(self):
+        """分块读取跨越分组边界时结果与整体哈希一致"""
+        data = os.urandom(1000)
+        self.write('big.bin', data)
+        saved = tree_hash.CHUNK_SIZE
+        tree_hash.CHUNK_SIZE = 100
+        try:
+            result = self.run_tree()
+        finally:
+            tree_hash.CHUNK_SIZE = saved
+        digests = {entry['path']: entry['sm3'] for entry in result['files']}
+        self.assertEqual(digests['big.bin'], self.sm3.hash(data))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+目录树SM3哈希模块
+
+并行计算目录下所有文件的SM3，生成包含路径、大小、修改时间和摘要的清单文件，
+再次运行时只重新计算大小或修改时间发生变化的文件，并基于清单构建Merkle树根哈希
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from sm3_algorithms import SM3_IMPLEMENTATIONS
+
+
+MANIFEST_NAME = '.sm3_manifest.json'
+MANIFEST_VERSION = 1
+
+# 流式哈希时每次读取的字节数
+CHUNK_SIZE = 1024 * 1024
+
+
+def scan_tree(root: str, exclude: Tuple[str, ...] = ()) -> Dict[str, Tuple[int, int]]:
+    """遍历目录，返回 {相对路径: (大小, 修改时间ns)}，路径统一使用'/'分隔"""
+    entries = {}
+    excluded = {os.path.abspath(path) for path in exclude}
+
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            full_path = os.path.join(dirpath, filename)
+            if os.path.abspath(full_path) in excluded or not os.path.isfile(full_path):
+                continue
+            stat = os.stat(full_path)
+            relative = os.path.relpath(full_path, root).replace(os.sep, '/')
+            entries[relative] = (stat.st_size, stat.st_mtime_ns)
+
+    return entries
+
+
+def load_manifest(path: str) -> Dict[str, Dict]:
+    """读取清单，返回 {相对路径: 条目}；不存在或格式不符时返回空字典"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return {entry['path']: entry for entry in manifest.get('files', [])}
+
+
+def save_manifest(path: str, root: str, implementation: str, files: List[Dict],
+                  merkle_root: Optional[str]):
+    """写入清单（先写临时文件再替换，避免中断时留下损坏的清单）"""
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'root': os.path.abspath(root),
+        'implementation': implementation,
+        'merkle_root': merkle_root,
+        'files': files
+    }
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def _hash_file(task: Tuple[str, str]) -> str:
+    """工作进程：按块流式计算单个文件的SM3（不把整个文件读入内存）"""
+    path, implementation = task
+    with open(path, 'rb') as f:
+        return SM3_IMPLEMENTATIONS[implementation]().hash_stream(iter(lambda: f.read(CHUNK_SIZE), b''))
+
+
+def manifest_leaf(entry: Dict) -> str:
+    """Merkle树叶子数据：路径、大小和摘要（不含修改时间，根哈希只反映内容）"""
+    return f"{entry['path']}\t{entry['size']}\t{entry['sm3']}"
+
+
+def compute_merkle_root(files: List[Dict]) -> Optional[str]:
+    """基于清单条目（按路径排序）构建Merkle树，返回根哈希"""
+    if not files:
+        return None
+
+    from merkle_tree import MerkleTree
+
+    tree = MerkleTree()
+    return tree.build_tree([manifest_leaf(entry) for entry in files])
+
+
+def hash_tree(root: str, manifest_path: Optional[str] = None, jobs: Optional[int] = None,
+              implementation: str = 'basic') -> Dict:
+    """
+    计算目录树的SM3清单和Merkle根
+
+    返回:
+    - 清单条目、Merkle根、新增/变化/删除/复用的文件列表及耗时
+    """
+    if not os.path.isdir(root):
+        raise NotADirectoryError(f"'{root}' 不是目录")
+
+    default_manifest = os.path.join(root, MANIFEST_NAME)
+    manifest_path = manifest_path or default_manifest
+    start_time = time.perf_counter()
+
+    # 默认位置的清单即使不是本次使用的清单也不作为数据（否则每次重写都会改变Merkle根）
+    current = scan_tree(root, exclude=(manifest_path, manifest_path + '.tmp',
+                                       default_manifest, default_manifest + '.tmp'))
+    previous = load_manifest(manifest_path)
+
+    # 清单中的实现与本次不同也无需重算：所有实现的结果相同
+    added, changed, reused = [], [], []
+    for path, (size, mtime_ns) in current.items():
+        entry = previous.get(path)
+        if entry is None:
+            added.append(path)
+        elif entry['size'] != size or entry['mtime_ns'] != mtime_ns:
+            changed.append(path)
+        else:
+            reused.append(path)
+    removed = sorted(set(previous) - set(current))
+
+    to_hash = added + changed
+    tasks = [(os.path.join(root, *path.split('/')), implementation) for path in to_hash]
+
+    if jobs == 1 or len(tasks) <= 1:
+        digests = [_hash_file(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            chunksize = max(1, len(tasks) // ((jobs or os.cpu_count() or 1) * 4))
+            digests = list(executor.map(_hash_file, tasks, chunksize=chunksize))
+    hash_time = time.perf_counter() - start_time
+
+    new_digests = dict(zip(to_hash, digests))
+    files = []
+    for path, (size, mtime_ns) in current.items():
+        digest = new_digests[path] if path in new_digests else previous[path]['sm3']
+        files.append({'path': path, 'size': size, 'mtime_ns': mtime_ns, 'sm3': digest})
+    files.sort(key=lambda entry: entry['path'])
+
+    merkle_root = compute_merkle_root(files)
+    save_manifest(manifest_path, root, implementation, files, merkle_root)
+
+    return {
+        'manifest': manifest_path,
+        'files': files,
+        'merkle_root': merkle_root,
+        'added': added,
+        'changed': changed,
+        'removed': removed,
+        'reused': reused,
+        'hashed_bytes': sum(current[path][0] for path in to_hash),
+        'hash_time': hash_time,
+        'elapsed': time.perf_counter() - start_time
+    }
+
+
+def print_tree_result(result: Dict, max_listed: int = 20):
+    """打印目录树哈希结果"""
+    print(f"文件数: {len(result['files'])}")
+    print(f"新增: {len(result['added'])}, 变化: {len(result['changed'])}, "
+          f"删除: {len(result['removed'])}, 未变化(复用): {len(result['reused'])}")
+
+    for label, paths in (('新增', result['added']), ('变化', result['changed']),
+                         ('删除', result['removed'])):
+        for path in paths[:max_listed]:
+            print(f"  [{label}] {path}")
+        if len(paths) > max_listed:
+            print(f"  ... 另有 {len(paths) - max_listed} 个{label}文件")
+
+    hashed_mb = result['hashed_bytes'] / (1024 * 1024)
+    print(f"重新计算: {hashed_mb:.2f} MB, 用时 {result['hash_time']:.3f} 秒")
+    print(f"Merkle根: {result['merkle_root']}")
+    print(f"清单: {result['manifest']}")
+    print(f"总用时: {result['elapsed']:.3f} 秒")
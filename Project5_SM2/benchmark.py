@@ -2,195 +2,512 @@
 """
 SM2算法性能基准测试
 对比基础实现和优化实现的性能差异
+
+- 计时使用 time.perf_counter_ns，每项先预热再逐次计时，报告 mean/std/min/p50/p95/p99（秒）
+- 冷启动（全新实例、清空基点表与上下文缓存）与热缓存分开测量
+- 覆盖域运算、点运算、标量乘法、签名、验证与批量验证
+- 结果保存为JSON，可与基线文件（sm2_benchmark_results.json）对比，超过容差即视为性能回退
+- profile_operations 在 SM2Curve.profile() 下各执行一次典型操作，统计模逆/模乘/点加/倍点次数
+- matplotlib只在绘图时导入
 """
 
 import time
-import statistics
-from typing import List, Dict, Tuple
-from sm2_algorithms import SM2Basic, SM2Optimized
-import matplotlib.pyplot as plt
 import json
+import random
+import hashlib
+import platform
+import statistics
+from typing import Callable, Dict, List, Optional
+from sm2_algorithms import SM2Basic, SM2Optimized, SM2Curve, batch_inverse
+from sm3_hash import SM3, OPENSSL_SM3, SM3_BACKEND
+import shared_modules  # noqa: F401  (Project4_SM3加入模块搜索路径)
+from latency_stats import percentile
+import sm2_field
+
+
+# 参与回退检查的统计量（新格式的p50，以及旧格式结果中的平均值）
+GATED_STATS = ('p50', 'basic_avg', 'optimized_avg')
+
+
+def summarize(samples_ns: List[float]) -> Dict:
+    """把纳秒样本汇总为以秒为单位的统计"""
+    seconds = [sample / 1e9 for sample in samples_ns]
+    return {
+        'iterations': len(seconds),
+        'mean': statistics.mean(seconds),
+        'std': statistics.stdev(seconds) if len(seconds) > 1 else 0.0,
+        'min': min(seconds),
+        'p50': percentile(seconds, 50),
+        'p95': percentile(seconds, 95),
+        'p99': percentile(seconds, 99)
+    }
+
+
+def measure(func: Callable[[], object], iterations: int, warmup: int = 3, ops: int = 1) -> Dict:
+    """预热warmup次后逐次计时func，ops为每次调用包含的操作数（样本按单次操作折算）"""
+    for _ in range(warmup):
+        func()
+    
+    clock = time.perf_counter_ns
+    samples = []
+    for _ in range(iterations):
+        start = clock()
+        func()
+        samples.append((clock() - start) / ops)
+    return summarize(samples)
+
+
+def measure_cold(make: Callable[[], Callable[[], object]], iterations: int) -> Dict:
+    """冷启动计时：每次清空基点固定基表并用make()创建全新实例，只计时第一次调用"""
+    clock = time.perf_counter_ns
+    saved_table = SM2Curve._base_table
+    samples = []
+    try:
+        for _ in range(iterations):
+            SM2Curve._base_table = None
+            func = make()
+            start = clock()
+            func()
+            samples.append(clock() - start)
+    finally:
+        SM2Curve._base_table = saved_table
+    return summarize(samples)
+
+
+def _flatten(results: Dict, prefix: str = '') -> Dict[str, float]:
+    """展开嵌套结果，只保留参与回退检查的统计量"""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(_flatten(value, path))
+        elif key in GATED_STATS and isinstance(value, (int, float)) and value > 0:
+            flat[path] = value
+    return flat
+
+
+def compare_results(current: Dict, baseline: Dict, tolerance: float = 0.25) -> List[Dict]:
+    """与基线对比，返回耗时超过 baseline * (1 + tolerance) 的项目"""
+    current_flat = _flatten(current)
+    baseline_flat = _flatten(baseline)
+    regressions = []
+    for path in sorted(current_flat.keys() & baseline_flat.keys()):
+        ratio = current_flat[path] / baseline_flat[path]
+        if ratio > 1 + tolerance:
+            regressions.append({'metric': path, 'baseline': baseline_flat[path],
+                                'current': current_flat[path], 'ratio': ratio})
+    return regressions
+
+
+def _format_time(seconds: float) -> str:
+    """格式化耗时（自动选择时间单位）"""
+    if seconds < 1e-3:
+        return f"{seconds*1e6:9.3f} us"
+    return f"{seconds*1e3:9.3f} ms"
+
+
+def _format_stats(stats: Dict) -> str:
+    """单行打印 p50/p95/p99"""
+    return (f"p50 {_format_time(stats['p50'])}, p95 {_format_time(stats['p95'])}, "
+            f"p99 {_format_time(stats['p99'])}")
 
 
 class SM2Benchmark:
     """SM2性能基准测试类"""
     
-    def __init__(self):
+    def __init__(self, warmup: int = 3, seed: int = 1):
         self.sm2_basic = SM2Basic()
         self.sm2_optimized = SM2Optimized()
+        self.warmup = warmup
+        self.rng = random.Random(seed)
         self.results = {}
     
-    def benchmark_keypair_generation(self, iterations: int = 100) -> Dict:
-        """基准测试密钥对生成"""
-        print(f"基准测试: 密钥对生成 (迭代次数: {iterations})")
-        
-        # 基础版本
-        basic_times = []
-        for _ in range(iterations):
-            start_time = time.time()
-            self.sm2_basic.generate_keypair()
-            basic_times.append(time.time() - start_time)
-        
-        # 优化版本
-        optimized_times = []
-        for _ in range(iterations):
-            start_time = time.time()
-            self.sm2_optimized.generate_keypair()
-            optimized_times.append(time.time() - start_time)
-        
-        basic_avg = statistics.mean(basic_times)
-        optimized_avg = statistics.mean(optimized_times)
-        speedup = basic_avg / optimized_avg if optimized_avg > 0 else 0
-        
+    def _compare(self, name: str, basic: Dict, optimized: Dict, extra: Optional[Dict] = None) -> Dict:
+        """基础/优化版本对比结果（保留旧格式的 *_avg/*_std 字段）"""
+        speedup = basic['mean'] / optimized['mean'] if optimized['mean'] > 0 else 0
         result = {
-            'basic_avg': basic_avg,
-            'optimized_avg': optimized_avg,
+            'basic_avg': basic['mean'],
+            'optimized_avg': optimized['mean'],
             'speedup': speedup,
-            'basic_std': statistics.stdev(basic_times),
-            'optimized_std': statistics.stdev(optimized_times)
+            'basic_std': basic['std'],
+            'optimized_std': optimized['std'],
+            'basic': basic,
+            'optimized': optimized
         }
+        result.update(extra or {})
         
-        print(f"  基础版本平均时间: {basic_avg*1000:.2f} ms")
-        print(f"  优化版本平均时间: {optimized_avg*1000:.2f} ms")
+        print(f"  基础版本: {_format_stats(basic)}")
+        print(f"  优化版本: {_format_stats(optimized)}")
+        for key, stats in (extra or {}).items():
+            print(f"  {key}: {_format_stats(stats)}")
         print(f"  性能提升: {speedup:.2f}x")
+        return result
+    
+    def _scalars(self, count: int) -> List[int]:
+        n = self.sm2_optimized.curve.n
+        return [self.rng.randrange(1, n) for _ in range(count)]
+    
+    def benchmark_field_operations(self, iterations: int = 20, batch: int = 500) -> Dict:
+        """基准测试素数域运算（每个样本为batch次运算的平均值）"""
+        print(f"基准测试: 域运算 (样本数: {iterations}, 每样本 {batch} 次)")
+        
+        curve = self.sm2_optimized.curve
+        p = curve.p
+        values = [self.rng.randrange(1, p) for _ in range(batch)]
+        pairs = list(zip(values, values[1:] + values[:1]))
+        products = [a * b for a, b in pairs]
+        squares = [(a * a) % p for a in values[:50]]
+        
+        def mul():
+            for a, b in pairs:
+                (a * b) % p
+        
+        def add():
+            for a, b in pairs:
+                (a + b) % p
+        
+        def inverse():
+            for a in values[:50]:
+                pow(a, -1, p)
+        
+        def batch_inv():
+            batch_inverse(values, p)
+        
+        def sqrt():
+            for a in squares:
+                curve.sqrt(a)
+        
+        def reducer(func):
+            def run():
+                for x in products:
+                    func(x)
+            return run
+        
+        operations = {
+            'mul_mod': (mul, batch),
+            'add_mod': (add, batch),
+            'inverse': (inverse, 50),
+            'batch_inverse': (batch_inv, batch),
+            'sqrt': (sqrt, len(squares)),
+            'reduce_mod': (reducer(sm2_field.reduce_mod), batch),
+            'reduce_solinas': (reducer(sm2_field.reduce_solinas), batch),
+        }
+        
+        result = {}
+        for name, (func, ops) in operations.items():
+            result[name] = measure(func, iterations, self.warmup, ops)
+            print(f"  {name:<16} {_format_stats(result[name])}")
+        return result
+    
+    def benchmark_point_operations(self, iterations: int = 20, batch: int = 100) -> Dict:
+        """基准测试点运算（仿射与Jacobian坐标）"""
+        print(f"基准测试: 点运算 (样本数: {iterations}, 每样本 {batch} 次)")
+        
+        curve = self.sm2_optimized.curve
+        points = [curve.base_multiply(k) for k in self._scalars(batch + 1)]
+        jacobian = [curve.jacobian_double(curve.to_jacobian(P)) for P in points]
+        pairs = list(zip(points, points[1:]))
+        jacobian_pairs = list(zip(jacobian, jacobian[1:]))
+        
+        def affine_add():
+            for P, Q in pairs:
+                curve.point_add(P, Q)
+        
+        def affine_double():
+            for P in points[:batch]:
+                curve.point_double(P)
+        
+        def jacobian_add():
+            for J1, J2 in jacobian_pairs:
+                curve.jacobian_add(J1, J2)
+        
+        def mixed_add():
+            for J, (_, Q) in zip(jacobian, pairs):
+                curve.jacobian_add_mixed(J, Q)
+        
+        def jacobian_double():
+            for J in jacobian[:batch]:
+                curve.jacobian_double(J)
+        
+        def to_affine():
+            for J in jacobian[:batch]:
+                curve.from_jacobian(J)
+        
+        def batch_to_affine():
+            curve.batch_from_jacobian(jacobian[:batch])
+        
+        operations = {
+            'affine_add': affine_add,
+            'affine_double': affine_double,
+            'jacobian_add': jacobian_add,
+            'jacobian_add_mixed': mixed_add,
+            'jacobian_double': jacobian_double,
+            'from_jacobian': to_affine,
+            'batch_from_jacobian': batch_to_affine,
+        }
+        
+        result = {}
+        for name, func in operations.items():
+            result[name] = measure(func, iterations, self.warmup, batch)
+            print(f"  {name:<20} {_format_stats(result[name])}")
+        return result
+    
+    def benchmark_keypair_generation(self, iterations: int = 100) -> Dict:
+        """基准测试密钥对生成"""
+        print(f"基准测试: 密钥对生成 (迭代次数: {iterations})")
         
+        basic = measure(self.sm2_basic.generate_keypair, iterations, self.warmup)
+        optimized = measure(self.sm2_optimized.generate_keypair, iterations, self.warmup)
+        # 批量生成（每块共用一次模逆），按单个密钥对折算
+        bulk = measure(lambda: list(self.sm2_optimized.generate_keypairs(64)),
+                       max(1, iterations // 10), 1, 64)
+        # 冷启动：第一次调用包含基点固定基表的构建
+        cold = measure_cold(lambda: SM2Optimized().generate_keypair, 3)
+        
+        result = self._compare('keypair_generation', basic, optimized,
+                               {'optimized_cold': cold, 'bulk': bulk})
+        result['bulk_avg'] = bulk['mean']
         return result
     
     def benchmark_signing(self, iterations: int = 50) -> Dict:
         """基准测试数字签名"""
         print(f"基准测试: 数字签名 (迭代次数: {iterations})")
         
-        # 准备测试数据
         message = b"Benchmark message for SM2 signing performance test"
+        basic_private, _ = self.sm2_basic.generate_keypair()
+        opt_private, _ = self.sm2_optimized.generate_keypair()
         
-        # 生成密钥对
-        basic_private, basic_public = self.sm2_basic.generate_keypair()
-        opt_private, opt_public = self.sm2_optimized.generate_keypair()
+        basic = measure(lambda: self.sm2_basic.sign(basic_private, message), iterations, self.warmup)
+        optimized = measure(lambda: self.sm2_optimized.sign(opt_private, message), iterations, self.warmup)
         
-        # 基础版本签名测试
-        basic_times = []
-        for _ in range(iterations):
-            start_time = time.time()
-            self.sm2_basic.sign(basic_private, message)
-            basic_times.append(time.time() - start_time)
-        
-        # 优化版本签名测试
-        optimized_times = []
-        for _ in range(iterations):
-            start_time = time.time()
-            self.sm2_optimized.sign(opt_private, message)
-            optimized_times.append(time.time() - start_time)
+        # 冷启动：全新实例（无基点表、无Za上下文）的第一次签名
+        def cold_sign():
+            sm2 = SM2Optimized()
+            return lambda: sm2.sign(opt_private, message)
         
-        basic_avg = statistics.mean(basic_times)
-        optimized_avg = statistics.mean(optimized_times)
-        speedup = basic_avg / optimized_avg if optimized_avg > 0 else 0
+        cold = measure_cold(cold_sign, 3)
         
-        result = {
-            'basic_avg': basic_avg,
-            'optimized_avg': optimized_avg,
-            'speedup': speedup,
-            'basic_std': statistics.stdev(basic_times),
-            'optimized_std': statistics.stdev(optimized_times)
-        }
+        with self.sm2_optimized.signing_key(opt_private, background=False) as key:
+            key.fill()
+            signing_key = measure(lambda: key.sign(message), iterations, 0)
         
-        print(f"  基础版本平均时间: {basic_avg*1000:.2f} ms")
-        print(f"  优化版本平均时间: {optimized_avg*1000:.2f} ms")
-        print(f"  性能提升: {speedup:.2f}x")
-        
-        return result
+        return self._compare('signing', basic, optimized,
+                             {'optimized_cold': cold, 'signing_key_pool': signing_key})
     
     def benchmark_verification(self, iterations: int = 50) -> Dict:
         """基准测试签名验证"""
         print(f"基准测试: 签名验证 (迭代次数: {iterations})")
         
-        # 准备测试数据
         message = b"Benchmark message for SM2 verification performance test"
-        
-        # 生成密钥对和签名
         basic_private, basic_public = self.sm2_basic.generate_keypair()
         basic_signature = self.sm2_basic.sign(basic_private, message)
-        
         opt_private, opt_public = self.sm2_optimized.generate_keypair()
         opt_signature = self.sm2_optimized.sign(opt_private, message)
         
-        # 基础版本验证测试
-        basic_times = []
-        for _ in range(iterations):
-            start_time = time.time()
-            self.sm2_basic.verify(basic_public, message, basic_signature)
-            basic_times.append(time.time() - start_time)
+        basic = measure(lambda: self.sm2_basic.verify(basic_public, message, basic_signature),
+                        iterations, self.warmup)
         
-        # 优化版本验证测试
-        optimized_times = []
-        for _ in range(iterations):
-            start_time = time.time()
-            self.sm2_optimized.verify(opt_public, message, opt_signature)
-            optimized_times.append(time.time() - start_time)
+        # 热缓存：同一公钥反复验证（预热后已建立窗口表与上下文）
+        warm_sm2 = SM2Optimized()
+        warm = measure(lambda: warm_sm2.verify(opt_public, message, opt_signature),
+                       iterations, warm_sm2.precompute_cache.build_threshold + self.warmup)
         
-        basic_avg = statistics.mean(basic_times)
-        optimized_avg = statistics.mean(optimized_times)
-        speedup = basic_avg / optimized_avg if optimized_avg > 0 else 0
+        # 每次验证都是新公钥（不命中缓存）
+        keys = [self.sm2_optimized.generate_keypair() for _ in range(iterations + self.warmup)]
+        signed = iter([(P, self.sm2_optimized.sign(d, message)) for d, P in keys])
         
-        result = {
-            'basic_avg': basic_avg,
-            'optimized_avg': optimized_avg,
-            'speedup': speedup,
-            'basic_std': statistics.stdev(basic_times),
-            'optimized_std': statistics.stdev(optimized_times)
-        }
+        def verify_next():
+            public_key, signature = next(signed)
+            return self.sm2_optimized.verify(public_key, message, signature)
         
-        print(f"  基础版本平均时间: {basic_avg*1000:.2f} ms")
-        print(f"  优化版本平均时间: {optimized_avg*1000:.2f} ms")
-        print(f"  性能提升: {speedup:.2f}x")
+        optimized = measure(verify_next, iterations, self.warmup)
+        
+        def cold_verify():
+            sm2 = SM2Optimized()
+            return lambda: sm2.verify(opt_public, message, opt_signature)
+        
+        cold = measure_cold(cold_verify, 3)
         
+        return self._compare('verification', basic, optimized,
+                             {'optimized_cold': cold, 'optimized_warm_key': warm})
+    
+    def benchmark_batch_verification(self, iterations: int = 5, batch: int = 64, keys: int = 8) -> Dict:
+        """基准测试批量验证（按单个签名折算），公钥从少量热点公钥中选取"""
+        print(f"基准测试: 批量验证 (样本数: {iterations}, 每批 {batch} 个签名, {keys} 个公钥)")
+        
+        sm2 = self.sm2_optimized
+        keypairs = [sm2.generate_keypair() for _ in range(keys)]
+        user_id = b'1234567812345678'
+        items = []
+        for i in range(batch):
+            private_key, public_key = keypairs[i % keys]
+            message = b"batch message %d" % i
+            items.append((public_key, message, sm2.sign(private_key, message), user_id))
+        
+        single = measure(lambda: [sm2.verify(P, m, sig, uid) for P, m, sig, uid in items],
+                         iterations, 1, batch)
+        batched = measure(lambda: sm2.verify_batch(items), iterations, 1, batch)
+        
+        result = {'single': single, 'batch': batched,
+                  'speedup': single['mean'] / batched['mean'] if batched['mean'] > 0 else 0}
+        print(f"  逐个验证: {_format_stats(single)}")
+        print(f"  批量验证: {_format_stats(batched)}")
+        print(f"  性能提升: {result['speedup']:.2f}x")
         return result
     
     def benchmark_scalar_multiplication(self, iterations: int = 20) -> Dict:
         """基准测试椭圆曲线标量乘法"""
         print(f"基准测试: 椭圆曲线标量乘法 (迭代次数: {iterations})")
         
-        # 准备测试数据
-        test_scalars = [
-            0x123456789ABCDEF0123456789ABCDEF0123456789ABCDEF0123456789ABCDEF0,
-            0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFF7203DF6B21C6052B53BBF40939D54123,
-            0x9876543210FEDCBA9876543210FEDCBA9876543210FEDCBA9876543210FEDCBA
-        ]
-        
-        basic_curve = self.sm2_basic.curve
-        opt_curve = self.sm2_optimized.curve
-        
-        # 基础版本测试
-        basic_times = []
-        for scalar in test_scalars:
-            for _ in range(iterations):
-                start_time = time.time()
-                basic_curve.point_multiply(scalar, basic_curve.G)
-                basic_times.append(time.time() - start_time)
-        
-        # 优化版本测试（预先计算）
-        self.sm2_optimized.precompute_points(opt_curve.G)
-        optimized_times = []
-        for scalar in test_scalars:
-            for _ in range(iterations):
-                start_time = time.time()
-                self.sm2_optimized.optimized_point_multiply(scalar, opt_curve.G)
-                optimized_times.append(time.time() - start_time)
-        
-        basic_avg = statistics.mean(basic_times)
-        optimized_avg = statistics.mean(optimized_times)
-        speedup = basic_avg / optimized_avg if optimized_avg > 0 else 0
+        curve = self.sm2_optimized.curve
+        curve.base_table()
+        G = curve.G
+        P = curve.base_multiply(0x123456789ABCDEF)
+        scalars = self._scalars(iterations + self.warmup)
+        
+        def cycling(func):
+            values = iter(scalars * 2)
+            return lambda: func(next(values))
+        
+        basic = measure(cycling(lambda k: curve.point_multiply(k, G)), iterations, self.warmup)
+        optimized = measure(cycling(curve.base_multiply), iterations, self.warmup)
+        extra = {
+            'wnaf': measure(cycling(lambda k: curve.point_multiply_wnaf(k, P)), iterations, self.warmup),
+            'ladder': measure(cycling(lambda k: curve.point_multiply_ladder(k, P)), iterations, self.warmup),
+            'multi_scalar': measure(cycling(lambda k: curve.multi_scalar_multiply([(k, G), (k ^ 0xFFFF, P)])),
+                                    iterations, self.warmup),
+            'base_table_build': measure_cold(lambda: SM2Curve().base_table, 3),
+        }
+        return self._compare('scalar_multiplication', basic, optimized, extra)
+    
+    def benchmark_hash_backends(self, iterations: int = 200) -> Dict:
+        """基准测试SM2使用的哈希后端（SHA-256占位实现与SM3）对签名/验证的影响"""
+        print(f"基准测试: 哈希后端 (迭代次数: {iterations})")
         
-        result = {
-            'basic_avg': basic_avg,
-            'optimized_avg': optimized_avg,
-            'speedup': speedup,
-            'basic_std': statistics.stdev(basic_times),
-            'optimized_std': statistics.stdev(optimized_times)
+        backends = {'sha256': hashlib.sha256, 'sm3-python': SM3}
+        if OPENSSL_SM3:
+            backends['sm3-openssl'] = lambda data=b'': hashlib.new('sm3', data)
+        
+        message = b"Benchmark message for SM2 signing performance test"
+        za_block = bytes(210)  # Za输入约为 2 + 16 + 6*32 字节
+        result = {}
+        
+        for name, factory in backends.items():
+            sm2 = SM2Optimized(hash_factory=factory)
+            private_key, public_key = sm2.generate_keypair()
+            signature = sm2.sign(private_key, message)
+            
+            def hash_za_and_e():
+                factory(za_block).digest()
+                factory(za_block[:32] + message).digest()
+            
+            # 不使用上下文缓存，每次都重新计算Za
+            def sign_uncached():
+                e = sm2.sm3_hash(sm2.za_value(b'1234567812345678', public_key) + message)
+                sm2.sign_digest(private_key, int.from_bytes(e, 'big'))
+            
+            result[name] = {
+                'hash': measure(hash_za_and_e, iterations, self.warmup),
+                'sign': measure(sign_uncached, iterations, self.warmup),
+                'verify': measure(lambda: sm2.verify(public_key, message, signature), iterations, self.warmup)
+            }
+            for label, stats in result[name].items():
+                print(f"  {name + ' ' + label:<20} {_format_stats(stats)}")
+        
+        return result
+    
+    def benchmark_constant_time(self, iterations: int = 20) -> Dict:
+        """基准测试Montgomery阶梯（恒定时间）与变时间标量乘法、签名的开销"""
+        print(f"基准测试: 恒定时间标量乘法 (迭代次数: {iterations})")
+        
+        curve = self.sm2_optimized.curve
+        curve.base_table()
+        P = curve.point_multiply(0x123456789ABCDEF, curve.G)
+        scalars = iter(self._scalars(iterations + self.warmup) * 4)
+        
+        methods = {
+            'double_and_add': lambda: curve.point_multiply(next(scalars), P),
+            'wnaf': lambda: curve.point_multiply_wnaf(next(scalars), P),
+            'base_table': lambda: curve.base_multiply(next(scalars)),
+            'ladder': lambda: curve.point_multiply_ladder(next(scalars), P),
         }
         
-        print(f"  基础版本平均时间: {basic_avg*1000:.2f} ms")
-        print(f"  优化版本平均时间: {optimized_avg*1000:.2f} ms")
-        print(f"  性能提升: {speedup:.2f}x")
+        result = {}
+        for name, func in methods.items():
+            result[name] = measure(func, iterations, self.warmup)
+            print(f"  {name:<20} {_format_stats(result[name])}")
+        
+        message = b"Benchmark message for SM2 signing performance test"
+        for label, sm2 in (('sign_variable_time', self.sm2_optimized),
+                           ('sign_constant_time', SM2Optimized(constant_time=True))):
+            private_key, _ = sm2.generate_keypair()
+            result[label] = measure(lambda: sm2.sign(private_key, message), iterations, self.warmup)
+            print(f"  {label:<20} {_format_stats(result[label])}")
+        
+        result['ladder_vs_base_table'] = result['ladder']['p50'] / result['base_table']['p50']
+        result['sign_overhead'] = result['sign_constant_time']['p50'] / result['sign_variable_time']['p50']
+        print(f"  阶梯/固定基表: {result['ladder_vs_base_table']:.2f}x, "
+              f"恒定时间签名开销: {result['sign_overhead']:.2f}x")
+        
+        return result
+    
+    def profile_operations(self) -> Dict:
+        """在运算剖析下各执行一次典型操作，统计模逆、模乘（估算）、点加与倍点次数
+        
+        计数包装会拖慢运算，因此与计时基准分开运行，结果不参与回退检查
+        """
+        print("运算计数: 每项执行一次")
+        
+        curve = self.sm2_optimized.curve
+        message = b"Benchmark message for SM2 operation counts"
+        private_key, public_key = self.sm2_optimized.generate_keypair()
+        signature = self.sm2_optimized.sign(private_key, message)
+        P = curve.point_multiply(0x123456789ABCDEF, curve.G)
+        k = self._scalars(1)[0]
+        
+        warm_sm2 = SM2Optimized()
+        for _ in range(warm_sm2.precompute_cache.build_threshold + 1):
+            warm_sm2.verify(public_key, message, signature)
+        
+        items = []
+        for i in range(16):
+            d, Q = self.sm2_optimized.generate_keypair()
+            m = b"batch message %d" % i
+            items.append((Q, m, self.sm2_optimized.sign(d, m), b'1234567812345678'))
+        
+        def base_table_build():
+            saved = SM2Curve._base_table
+            SM2Curve._base_table = None
+            try:
+                curve.base_table()
+            finally:
+                SM2Curve._base_table = saved
+        
+        scenarios = {
+            'keygen': lambda: self.sm2_optimized.generate_keypair(),
+            'sign': lambda: self.sm2_optimized.sign(private_key, message),
+            'sign_constant_time': lambda: SM2Optimized(constant_time=True).sign(private_key, message),
+            'verify': lambda: SM2Optimized().verify(public_key, message, signature),
+            'verify_warm_key': lambda: warm_sm2.verify(public_key, message, signature),
+            'verify_batch_16': lambda: self.sm2_optimized.verify_batch(items),
+            'basic_verify': lambda: self.sm2_basic.verify(public_key, message, signature),
+            'double_and_add': lambda: curve.point_multiply(k, P),
+            'wnaf': lambda: curve.point_multiply_wnaf(k, P),
+            'ladder': lambda: curve.point_multiply_ladder(k, P),
+            'base_table_build': base_table_build,
+        }
+        
+        result = {}
+        print(f"  {'操作':<20} {'模逆':>6} {'模乘(估算)':>10} {'点加':>6} {'倍点':>6} {'耗时(ms)':>10}")
+        for name, func in scenarios.items():
+            with SM2Curve.profile() as prof:
+                start = time.perf_counter_ns()
+                func()
+                elapsed = time.perf_counter_ns() - start
+            result[name] = prof.report()
+            result[name]['total_ms'] = elapsed / 1e6
+            print(f"  {name:<20} {prof.inversions:>6} {prof.multiplications:>10} "
+                  f"{prof.additions:>6} {prof.doublings:>6} {elapsed / 1e6:>10.3f}")
         
         return result
     
@@ -201,22 +518,38 @@ class SM2Benchmark:
         
         results = {}
         
-        # 1. 密钥对生成
+        # 1. 域运算与点运算
+        results['field'] = self.benchmark_field_operations(20)
+        print()
+        results['point'] = self.benchmark_point_operations(20)
+        print()
+        
+        # 2. 密钥对生成
         results['keypair_generation'] = self.benchmark_keypair_generation(100)
         print()
         
-        # 2. 数字签名
+        # 3. 数字签名
         results['signing'] = self.benchmark_signing(50)
         print()
         
-        # 3. 签名验证
+        # 4. 签名验证与批量验证
         results['verification'] = self.benchmark_verification(50)
         print()
+        results['batch_verification'] = self.benchmark_batch_verification(5)
+        print()
         
-        # 4. 椭圆曲线标量乘法
+        # 5. 椭圆曲线标量乘法
         results['scalar_multiplication'] = self.benchmark_scalar_multiplication(20)
         print()
         
+        # 6. 哈希后端
+        results['hash_backends'] = self.benchmark_hash_backends(200)
+        print()
+        
+        # 7. 恒定时间标量乘法
+        results['constant_time'] = self.benchmark_constant_time(20)
+        print()
+        
         # 保存结果
         self.results = results
         
@@ -256,15 +589,44 @@ class SM2Benchmark:
             print("-" * 60)
             print(f"几何平均性能提升: {geometric_mean_speedup:.2f}x")
     
+    def environment(self) -> Dict:
+        """运行环境信息（随结果一起保存，便于判断基线是否可比）"""
+        return {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'sm3_backend': SM3_BACKEND,
+            'warmup': self.warmup,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+        }
+    
     def save_results(self, filename: str = "sm2_benchmark_results.json"):
         """保存测试结果到文件"""
+        data = dict(self.results)
+        data['environment'] = self.environment()
         with open(filename, 'w') as f:
-            json.dump(self.results, f, indent=2)
+            json.dump(data, f, indent=2)
         print(f"结果已保存到: {filename}")
     
+    def compare_with(self, filename: str = "sm2_benchmark_results.json", tolerance: float = 0.25) -> List[Dict]:
+        """与基线结果文件对比并打印性能回退项目"""
+        with open(filename) as f:
+            baseline = json.load(f)
+        
+        regressions = compare_results(self.results, baseline, tolerance)
+        print(f"与基线对比: {filename} (容差 {tolerance:.0%})")
+        if not regressions:
+            print("  ✅ 未发现性能回退")
+        for item in regressions:
+            print(f"  ❌ {item['metric']}: {_format_time(item['baseline']).strip()} -> "
+                  f"{_format_time(item['current']).strip()} ({item['ratio']:.2f}x)")
+        return regressions
+    
     def plot_results(self, save_plot: bool = True):
         """绘制性能对比图表"""
         try:
+            import matplotlib.pyplot as plt
+            
             operations = ['keypair_generation', 'signing', 'verification', 'scalar_multiplication']
             operation_names = ['密钥生成', '数字签名', '签名验证', '标量乘法']
             
@@ -314,7 +676,7 @@ class SM2Benchmark:
                 print("性能对比图表已保存到: sm2_performance_comparison.png")
             
             plt.show()
-            
+        
         except ImportError:
             print("警告: matplotlib未安装，无法生成图表")
         except Exception as e:
@@ -353,7 +715,7 @@ def memory_usage_test():
         print(f"基础版本内存使用: {basic_usage:.2f} MB")
         print(f"优化版本额外内存: {optimized_usage:.2f} MB")
         print(f"总内存使用: {optimized_memory:.2f} MB")
-        
+    
     except ImportError:
         print("警告: psutil未安装，无法进行内存测试")
 
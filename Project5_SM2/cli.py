@@ -7,8 +7,10 @@ SM2算法CLI工具
 import argparse
 import sys
 import json
+import time
 from pathlib import Path
 from sm2_algorithms import SM2Basic, SM2Optimized, Point
+import sm2_encoding
 from security_analysis import SM2SecurityAnalysis, SatoshiSignatureForgery
 from benchmark import SM2Benchmark
 
@@ -24,6 +26,9 @@ class SM2CLI:
         """生成密钥对"""
         print("🔑 生成SM2密钥对")
         
+        if args.count > 1:
+            return self._keygen_bulk(args)
+        
         if args.optimized:
             private_key, public_key = self.sm2_optimized.generate_keypair()
             version = "优化版本"
@@ -35,8 +40,14 @@ class SM2CLI:
         print(f"私钥: {private_key:064x}")
         print(f"公钥X: {public_key.x:064x}")
         print(f"公钥Y: {public_key.y:064x}")
-        
-        if args.output:
+        print(f"压缩公钥: {sm2_encoding.encode_public_key(public_key).hex()}")
+        
+        if args.output and args.format == 'raw':
+            # 私钥(32字节) || 压缩公钥(33字节)
+            with open(args.output, 'wb') as f:
+                f.write(sm2_encoding.encode_keypair(private_key, public_key))
+            print(f"密钥已保存到: {args.output} (二进制, 65 字节)")
+        elif args.output:
             key_data = {
                 'private_key': f"{private_key:064x}",
                 'public_key': {
@@ -50,17 +61,43 @@ class SM2CLI:
                 json.dump(key_data, f, indent=2)
             print(f"密钥已保存到: {args.output}")
     
+    def _keygen_bulk(self, args):
+        """批量生成密钥对并流式写入文件（raw: 每个65字节; json: JSONL每行一个）"""
+        if not args.output:
+            raise ValueError("批量生成密钥对时需要指定输出文件 -o")
+        
+        fmt = 'raw' if args.format == 'raw' else 'jsonl'
+        print(f"数量: {args.count}, 进程数: {args.jobs}, 格式: {fmt}")
+        
+        keypairs = self.sm2_optimized.generate_keypairs(args.count, args.jobs)
+        step = max(1, args.count // 20)
+        start = time.perf_counter()
+        
+        def progress():
+            for index, keypair in enumerate(keypairs, 1):
+                yield keypair
+                if index % step == 0 or index == args.count:
+                    elapsed = time.perf_counter() - start
+                    print(f"\r  进度: {index}/{args.count} ({index * 100 // args.count}%), "
+                          f"{index / elapsed:.0f} 个/秒", end='', flush=True)
+        
+        with open(args.output, 'wb') as f:
+            count = sm2_encoding.write_keypairs(progress(), f, fmt)
+        elapsed = time.perf_counter() - start
+        
+        print()
+        print(f"已生成 {count} 个密钥对, 用时 {elapsed:.2f} 秒, {count / elapsed:.0f} 个/秒")
+        print(f"密钥已保存到: {args.output}")
+    
     def cmd_sign(self, args):
         """数字签名"""
         print("✍️ SM2数字签名")
         
+        if args.batch:
+            return self._sign_batch(args)
+        
         # 读取私钥
-        if args.key_file:
-            with open(args.key_file, 'r') as f:
-                key_data = json.load(f)
-            private_key = int(key_data['private_key'], 16)
-        else:
-            private_key = int(args.private_key, 16)
+        private_key = self._load_private_key(args)
         
         # 读取消息
         if args.message_file:
@@ -88,7 +125,15 @@ class SM2CLI:
         print(f"签名 r: {r:064x}")
         print(f"签名 s: {s:064x}")
         
-        if args.output:
+        if args.output and args.format in ('raw', 'der'):
+            if args.format == 'raw':
+                encoded = sm2_encoding.encode_signature_raw(signature)
+            else:
+                encoded = sm2_encoding.encode_signature_der(signature)
+            with open(args.output, 'wb') as f:
+                f.write(encoded)
+            print(f"签名已保存到: {args.output} ({args.format}, {len(encoded)} 字节)")
+        elif args.output:
             sig_data = {
                 'signature': {
                     'r': f"{r:064x}",
@@ -103,28 +148,53 @@ class SM2CLI:
                 json.dump(sig_data, f, indent=2)
             print(f"签名已保存到: {args.output}")
     
+    def _sign_batch(self, args):
+        """批量签名消息文件中的每条消息，签名逐个流式写入输出（raw/der 拼接，json 为JSONL）"""
+        private_key = self._load_private_key(args)
+        user_id = args.user_id.encode('utf-8') if args.user_id else b'1234567812345678'
+        fmt = 'jsonl' if args.format == 'json' else args.format
+        print(f"消息格式: {args.batch_format}, 进程数: {args.jobs}, 签名格式: {fmt}")
+        
+        start = time.perf_counter()
+        with open(args.batch, 'rb') as f:
+            messages = sm2_encoding.read_messages(f, args.batch_format)
+            signatures = self.sm2_optimized.sign_many(private_key, messages, user_id, args.jobs)
+            
+            if args.output:
+                with open(args.output, 'wb') as out:
+                    count = sm2_encoding.write_signatures(signatures, out, fmt)
+            else:
+                count = 0
+                for r, s in signatures:
+                    print(f"{r:064x}{s:064x}")
+                    count += 1
+        elapsed = time.perf_counter() - start
+        
+        print(f"已签名 {count} 条消息, 用时 {elapsed:.2f} 秒, "
+              f"{count / elapsed if elapsed > 0 else 0:.0f} 条/秒")
+        if args.output:
+            print(f"签名已保存到: {args.output}")
+    
     def cmd_verify(self, args):
         """验证签名"""
         print("🔍 SM2签名验证")
         
         # 读取公钥
-        if args.key_file:
-            with open(args.key_file, 'r') as f:
-                key_data = json.load(f)
-            public_key = Point(
-                int(key_data['public_key']['x'], 16),
-                int(key_data['public_key']['y'], 16)
-            )
-        else:
-            public_key = Point(
-                int(args.public_key_x, 16),
-                int(args.public_key_y, 16)
-            )
+        public_key = self._load_public_key(args)
         
-        # 读取签名
+        # 读取签名（JSON、64字节原始格式或DER）
+        sig_data = None
         if args.signature_file:
-            with open(args.signature_file, 'r') as f:
-                sig_data = json.load(f)
+            with open(args.signature_file, 'rb') as f:
+                raw = f.read()
+            if raw.lstrip().startswith(b'{'):
+                sig_data = json.loads(raw.decode('utf-8'))
+            elif len(raw) == sm2_encoding.RAW_SIGNATURE_SIZE:
+                r, s = sm2_encoding.decode_signature_raw(raw)
+            else:
+                r, s = sm2_encoding.decode_signature_der(raw)
+        
+        if sig_data is not None:
             r = int(sig_data['signature']['r'], 16)
             s = int(sig_data['signature']['s'], 16)
             if 'message' in sig_data and args.message_file is None and args.message is None:
@@ -139,7 +209,7 @@ class SM2CLI:
                     message = sig_data['message'].encode('utf-8')
             elif 'message' in sig_data and isinstance(sig_data['message'], str):
                 message = sig_data['message'].encode('utf-8')
-        else:
+        elif not args.signature_file:
             r = int(args.signature_r, 16)
             s = int(args.signature_s, 16)
         
@@ -172,28 +242,144 @@ class SM2CLI:
         
         return is_valid
     
+    def _read_key_file(self, path: str):
+        """读取密钥文件，返回 (私钥或None, 公钥)
+        
+        支持JSON、二进制密钥对（私钥 || 压缩公钥）和单独的SEC1公钥
+        """
+        with open(path, 'rb') as f:
+            raw = f.read()
+        
+        if raw.lstrip().startswith(b'{'):
+            key_data = json.loads(raw.decode('utf-8'))
+            public_key = Point(
+                int(key_data['public_key']['x'], 16),
+                int(key_data['public_key']['y'], 16)
+            )
+            private_key = int(key_data['private_key'], 16) if 'private_key' in key_data else None
+            return private_key, public_key
+        
+        if len(raw) == 33:
+            return None, sm2_encoding.decode_public_key(raw)
+        if len(raw) == 65 and raw[0] == 4:
+            # 65字节既可能是未压缩公钥也可能是密钥对，能解码为曲线上的点即视为公钥
+            try:
+                return None, sm2_encoding.decode_public_key(raw)
+            except ValueError:
+                pass
+        return sm2_encoding.decode_keypair(raw)
+    
+    def _load_public_key(self, args) -> Point:
+        """从密钥文件或命令行参数读取公钥"""
+        if args.key_file:
+            return self._read_key_file(args.key_file)[1]
+        return Point(int(args.public_key_x, 16), int(args.public_key_y, 16))
+    
+    def _load_private_key(self, args) -> int:
+        """从密钥文件或命令行参数读取私钥"""
+        if args.key_file:
+            private_key = self._read_key_file(args.key_file)[0]
+            if private_key is None:
+                raise ValueError("密钥文件中没有私钥")
+            return private_key
+        return int(args.private_key, 16)
+    
+    def cmd_encrypt(self, args):
+        """公钥加密"""
+        print("🔒 SM2公钥加密")
+        
+        public_key = self._load_public_key(args)
+        sm2 = self.sm2_optimized if args.optimized else self.sm2_basic
+        version = "优化版本" if args.optimized else "基础版本"
+        print(f"算法版本: {version}")
+        
+        if args.input:
+            # 文件分块流式加密
+            if not args.output:
+                raise ValueError("加密文件时需要指定输出文件 -o")
+            length = sm2.encrypt_file(public_key, args.input, args.output)
+            print(f"明文长度: {length} 字节")
+            print(f"密文已保存到: {args.output} (C1||C3||C2, {length + 97} 字节)")
+            return
+        
+        plaintext = args.message.encode('utf-8')
+        ciphertext = sm2.encrypt(public_key, plaintext)
+        print(f"明文长度: {len(plaintext)} 字节")
+        
+        if args.output:
+            with open(args.output, 'wb') as f:
+                f.write(ciphertext)
+            print(f"密文已保存到: {args.output} (C1||C3||C2, {len(ciphertext)} 字节)")
+        else:
+            print(f"密文(C1||C3||C2): {ciphertext.hex()}")
+    
+    def cmd_decrypt(self, args):
+        """私钥解密"""
+        print("🔓 SM2私钥解密")
+        
+        private_key = self._load_private_key(args)
+        sm2 = self.sm2_optimized if args.optimized else self.sm2_basic
+        version = "优化版本" if args.optimized else "基础版本"
+        print(f"算法版本: {version}")
+        
+        if args.input and args.output:
+            # 文件分块流式解密，校验通过后才生成输出文件
+            length = sm2.decrypt_file(private_key, args.input, args.output)
+            print(f"明文长度: {length} 字节")
+            print(f"明文已保存到: {args.output}")
+            return
+        
+        if args.input:
+            with open(args.input, 'rb') as f:
+                ciphertext = f.read()
+        else:
+            ciphertext = bytes.fromhex(args.ciphertext)
+        
+        plaintext = sm2.decrypt(private_key, ciphertext)
+        print(f"明文长度: {len(plaintext)} 字节")
+        
+        if args.output:
+            with open(args.output, 'wb') as f:
+                f.write(plaintext)
+            print(f"明文已保存到: {args.output}")
+        else:
+            print(f"明文: {plaintext.decode('utf-8', errors='replace')}")
+    
     def cmd_benchmark(self, args):
         """性能基准测试"""
         print("🚀 SM2性能基准测试")
         
-        benchmark = SM2Benchmark()
+        benchmark = SM2Benchmark(warmup=args.warmup)
         
         if args.operation == 'all':
             benchmark.run_comprehensive_benchmark()
-        elif args.operation == 'keygen':
-            benchmark.benchmark_keypair_generation(args.iterations)
-        elif args.operation == 'sign':
-            benchmark.benchmark_signing(args.iterations)
-        elif args.operation == 'verify':
-            benchmark.benchmark_verification(args.iterations)
-        elif args.operation == 'scalar':
-            benchmark.benchmark_scalar_multiplication(args.iterations)
+        else:
+            runners = {
+                'field': ('field', benchmark.benchmark_field_operations),
+                'point': ('point', benchmark.benchmark_point_operations),
+                'keygen': ('keypair_generation', benchmark.benchmark_keypair_generation),
+                'sign': ('signing', benchmark.benchmark_signing),
+                'verify': ('verification', benchmark.benchmark_verification),
+                'batch': ('batch_verification', benchmark.benchmark_batch_verification),
+                'scalar': ('scalar_multiplication', benchmark.benchmark_scalar_multiplication),
+            }
+            key, runner = runners[args.operation]
+            benchmark.results[key] = runner(args.iterations)
+        
+        if args.profile:
+            print()
+            benchmark.results['operation_counts'] = benchmark.profile_operations()
         
         if args.save_results:
             benchmark.save_results(args.save_results)
         
         if args.plot:
             benchmark.plot_results()
+        
+        if args.compare:
+            print()
+            if benchmark.compare_with(args.compare, args.tolerance):
+                sys.exit(1)
     
     def cmd_security(self, args):
         """安全分析"""
@@ -223,6 +409,24 @@ class SM2CLI:
             satoshi_forge = SatoshiSignatureForgery()
             satoshi_forge.demonstrate_forgery_attempt()
     
+    def cmd_service(self, args):
+        """SM2签名/验证服务（微批处理）与负载测试"""
+        print("🛰️ SM2签名/验证服务")
+        
+        from sm2_service import demo_service, serve_sm2, load_sm2_service
+        
+        batch_window = args.batch_window_ms / 1000
+        if args.serve:
+            private_key = self._load_private_key(args) if (args.key_file or args.private_key) \
+                else self.sm2_optimized.generate_keypair()[0]
+            serve_sm2(private_key, args.host, args.port, args.unix, args.workers, batch_window, args.max_batch)
+        elif args.connect:
+            load_sm2_service(args.host, args.port, args.unix, args.requests, args.mode,
+                             args.connections, args.window)
+        else:
+            demo_service(args.requests, args.mode, args.connections, args.window, args.workers,
+                         batch_window, args.max_batch)
+    
     def cmd_demo(self, args):
         """演示功能"""
         print("🎭 SM2算法演示")
@@ -256,6 +460,11 @@ def create_parser():
   # 验证签名
   python cli.py verify --key-file keys.json --signature-file signature.json
   
+  # 公钥加密/私钥解密（支持大文件流式处理）
+  python cli.py encrypt --key-file keys.json --message "Hello SM2" -o message.enc
+  python cli.py encrypt --key-file keys.json --input data.bin -o data.enc
+  python cli.py decrypt --key-file keys.json --input data.enc -o data.bin
+  
   # 性能测试
   python cli.py benchmark --operation all --plot
   
@@ -273,6 +482,11 @@ def create_parser():
     keygen_parser = subparsers.add_parser('keygen', help='生成密钥对')
     keygen_parser.add_argument('--optimized', action='store_true', help='使用优化版本')
     keygen_parser.add_argument('-o', '--output', help='输出文件路径')
+    keygen_parser.add_argument('--format', choices=['json', 'raw'], default='json',
+                               help='输出格式: json或raw(私钥32字节 || 压缩公钥33字节)')
+    keygen_parser.add_argument('--count', type=int, default=1,
+                               help='批量生成的数量（大于1时流式写入输出文件，json格式为每行一个的JSONL）')
+    keygen_parser.add_argument('--jobs', type=int, default=1, help='批量生成使用的进程数')
     
     # 数字签名
     sign_parser = subparsers.add_parser('sign', help='数字签名')
@@ -283,6 +497,12 @@ def create_parser():
     sign_parser.add_argument('--user-id', default='1234567812345678', help='用户ID')
     sign_parser.add_argument('--optimized', action='store_true', help='使用优化版本')
     sign_parser.add_argument('-o', '--output', help='输出文件路径')
+    sign_parser.add_argument('--format', choices=['json', 'raw', 'der'], default='json',
+                             help='签名输出格式: json、raw(r||s 64字节)或der')
+    sign_parser.add_argument('--batch', help='批量签名: 消息文件路径（输出逐个写入，json格式为JSONL）')
+    sign_parser.add_argument('--batch-format', choices=['lines', 'length-prefixed'], default='lines',
+                             help='批量消息格式: 每行一条或4字节大端长度前缀')
+    sign_parser.add_argument('--jobs', type=int, default=1, help='批量签名使用的进程数')
     
     # 签名验证
     verify_parser = subparsers.add_parser('verify', help='验证签名')
@@ -297,19 +517,62 @@ def create_parser():
     verify_parser.add_argument('--user-id', default='1234567812345678', help='用户ID')
     verify_parser.add_argument('--optimized', action='store_true', help='使用优化版本')
     
+    # 公钥加密
+    encrypt_parser = subparsers.add_parser('encrypt', help='公钥加密(C1||C3||C2)')
+    encrypt_parser.add_argument('--key-file', help='密钥文件路径')
+    encrypt_parser.add_argument('--public-key-x', help='公钥X坐标(十六进制)')
+    encrypt_parser.add_argument('--public-key-y', help='公钥Y坐标(十六进制)')
+    encrypt_input = encrypt_parser.add_mutually_exclusive_group(required=True)
+    encrypt_input.add_argument('--message', help='待加密消息')
+    encrypt_input.add_argument('--input', help='待加密文件路径（流式处理）')
+    encrypt_parser.add_argument('--optimized', action='store_true', help='使用优化版本')
+    encrypt_parser.add_argument('-o', '--output', help='密文输出文件路径')
+    
+    # 私钥解密
+    decrypt_parser = subparsers.add_parser('decrypt', help='私钥解密')
+    decrypt_parser.add_argument('--key-file', help='密钥文件路径')
+    decrypt_parser.add_argument('--private-key', help='私钥(十六进制)')
+    decrypt_input = decrypt_parser.add_mutually_exclusive_group(required=True)
+    decrypt_input.add_argument('--ciphertext', help='密文(十六进制)')
+    decrypt_input.add_argument('--input', help='密文文件路径')
+    decrypt_parser.add_argument('--optimized', action='store_true', help='使用优化版本')
+    decrypt_parser.add_argument('-o', '--output', help='明文输出文件路径')
+    
     # 性能测试
     benchmark_parser = subparsers.add_parser('benchmark', help='性能基准测试')
-    benchmark_parser.add_argument('--operation', choices=['all', 'keygen', 'sign', 'verify', 'scalar'], 
+    benchmark_parser.add_argument('--operation', choices=['all', 'field', 'point', 'keygen', 'sign', 'verify', 'batch', 'scalar'], 
                                  default='all', help='测试操作类型')
     benchmark_parser.add_argument('--iterations', type=int, default=50, help='测试迭代次数')
     benchmark_parser.add_argument('--save-results', help='保存结果文件路径')
     benchmark_parser.add_argument('--plot', action='store_true', help='生成性能图表')
+    benchmark_parser.add_argument('--warmup', type=int, default=3, help='每项计时前的预热次数')
+    benchmark_parser.add_argument('--compare', help='与基线结果文件对比，出现性能回退时返回非零退出码')
+    benchmark_parser.add_argument('--tolerance', type=float, default=0.25, help='允许的相对回退（默认0.25）')
+    benchmark_parser.add_argument('--profile', action='store_true', help='统计典型操作的模逆/模乘/点加/倍点次数')
     
     # 安全分析
     security_parser = subparsers.add_parser('security', help='安全分析')
     security_parser.add_argument('--test', choices=['all', 'k_reuse', 'invalid_curve', 'malleability', 'user_id', 'satoshi'],
                                 default='all', help='安全测试类型')
     
+    # 签名/验证服务
+    service_parser = subparsers.add_parser('service', help='SM2签名/验证服务与负载测试')
+    service_mode = service_parser.add_mutually_exclusive_group()
+    service_mode.add_argument('--serve', action='store_true', help='只运行服务')
+    service_mode.add_argument('--connect', action='store_true', help='只运行负载客户端，连接已运行的服务')
+    service_parser.add_argument('--host', default='127.0.0.1', help='服务地址')
+    service_parser.add_argument('--port', type=int, default=9400, help='服务端口')
+    service_parser.add_argument('--unix', help='Unix套接字路径（代替TCP）')
+    service_parser.add_argument('--key-file', help='签名密钥文件路径（--serve模式，默认随机生成）')
+    service_parser.add_argument('--private-key', help='签名私钥(十六进制)')
+    service_parser.add_argument('-n', '--requests', type=int, default=1000, help='请求数量')
+    service_parser.add_argument('--mode', choices=['sign', 'verify', 'mixed'], default='mixed', help='负载类型')
+    service_parser.add_argument('-c', '--connections', type=int, default=4, help='客户端连接数')
+    service_parser.add_argument('-w', '--window', type=int, default=32, help='每个连接的流水线窗口')
+    service_parser.add_argument('--workers', type=int, default=2, help='服务端工作进程数（0为单进程）')
+    service_parser.add_argument('--batch-window-ms', type=float, default=2.0, help='微批处理时间窗口（毫秒）')
+    service_parser.add_argument('--max-batch', type=int, default=256, help='最大批大小')
+    
     # 演示
     demo_parser = subparsers.add_parser('demo', help='演示功能')
     demo_parser.add_argument('--type', choices=['basic', 'security', 'performance'], 
@@ -336,10 +599,16 @@ def main():
             cli.cmd_sign(args)
         elif args.command == 'verify':
             cli.cmd_verify(args)
+        elif args.command == 'encrypt':
+            cli.cmd_encrypt(args)
+        elif args.command == 'decrypt':
+            cli.cmd_decrypt(args)
         elif args.command == 'benchmark':
             cli.cmd_benchmark(args)
         elif args.command == 'security':
             cli.cmd_security(args)
+        elif args.command == 'service':
+            cli.cmd_service(args)
         elif args.command == 'demo':
             cli.cmd_demo(args)
         else:
@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+"""
+与Project4_SM3共享的模块
+
+SM3压缩函数、延迟统计和流水线行协议客户端只在相邻的Project4_SM3目录中定义一次，
+导入本模块后即可直接 import 这些模块。Project4_SM3追加在 sys.path 末尾，
+同名模块（如 cli）仍优先使用本项目中的版本
+"""
+
+import os
+import sys
+
+
+PROJECT4_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Project4_SM3')
+
+if PROJECT4_DIR not in sys.path:
+    sys.path.append(PROJECT4_DIR)
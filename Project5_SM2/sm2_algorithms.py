@@ -4,11 +4,44 @@ SM2 椭圆曲线公钥密码算法实现
 包含基础版本和优化版本
 """
 
-import hashlib
+import hmac
+import os
 import secrets
-from typing import Tuple, Optional, Union
+import time
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Tuple, Optional, Union
 from dataclasses import dataclass
 import struct
+import queue
+import threading
+from collections import OrderedDict, deque
+from functools import wraps
+from itertools import islice
+from sm3_hash import new_sm3
+
+
+def batch_inverse(values: List[int], modulus: int) -> List[int]:
+    """批量模逆（Montgomery技巧）: 3(n-1)次乘法加一次模逆，值为0时抛出ValueError"""
+    if not values:
+        return []
+    
+    # prefix[i] = values[0] * ... * values[i]
+    prefix = []
+    acc = 1
+    for value in values:
+        acc = (acc * value) % modulus
+        prefix.append(acc)
+    
+    if acc == 0:
+        raise ValueError("批量模逆的输入中包含不可逆元素")
+    inv = pow(acc, -1, modulus)
+    
+    result = [0] * len(values)
+    for i in range(len(values) - 1, 0, -1):
+        result[i] = (inv * prefix[i - 1]) % modulus
+        inv = (inv * values[i]) % modulus
+    result[0] = inv
+    
+    return result
 
 
 @dataclass
@@ -89,30 +122,699 @@ class SM2Curve:
         
         return Point(x3, y3)
     
+    def sqrt(self, a: int) -> Optional[int]:
+        """模p平方根（p ≡ 3 mod 4 时 a^((p+1)/4) 即为平方根），a不是二次剩余时返回None"""
+        y = pow(a, (self.p + 1) >> 2, self.p)
+        return y if (y * y) % self.p == a % self.p else None
+    
+    def encode_point(self, P: Point, compressed: bool = False) -> bytes:
+        """SEC1点编码: 未压缩 04 || x || y，压缩 02/03 || x（按y的奇偶）"""
+        if compressed:
+            return bytes([2 | (P.y & 1)]) + P.x.to_bytes(32, 'big')
+        return b'\x04' + P.x.to_bytes(32, 'big') + P.y.to_bytes(32, 'big')
+    
+    def decode_point(self, data: bytes) -> Point:
+        """解码SEC1格式（压缩或未压缩）的点并检查其在曲线上"""
+        if len(data) == 33 and data[0] in (2, 3):
+            x = int.from_bytes(data[1:], 'big')
+            if x >= self.p:
+                raise ValueError("点不在曲线上")
+            y = self.sqrt((x * x * x + self.a * x + self.b) % self.p)
+            if y is None:
+                raise ValueError("点不在曲线上")
+            if (y & 1) != (data[0] & 1):
+                y = self.p - y
+            P = Point(x, y)
+            if P == self.O:
+                raise ValueError("点不在曲线上")
+            return P
+        
+        if len(data) != 65 or data[0] != 4:
+            raise ValueError("无效的点编码")
+        P = Point(int.from_bytes(data[1:33], 'big'), int.from_bytes(data[33:], 'big'))
+        if not (P.x < self.p and P.y < self.p) or P == self.O or not self.is_on_curve(P):
+            raise ValueError("点不在曲线上")
+        return P
+    
+    # Jacobian射影坐标: (X, Y, Z) 对应仿射点 (X/Z^2, Y/Z^3)，Z=0 表示无穷远点
+    INFINITY = (1, 1, 0)
+    
+    def to_jacobian(self, P: Point) -> Tuple[int, int, int]:
+        """仿射坐标转换为Jacobian坐标"""
+        if P == self.O:
+            return self.INFINITY
+        return (P.x, P.y, 1)
+    
+    def from_jacobian(self, J: Tuple[int, int, int]) -> Point:
+        """Jacobian坐标转换为仿射坐标（一次模逆）"""
+        X, Y, Z = J
+        if Z == 0:
+            return self.O
+        
+        p = self.p
+        z_inv = pow(Z, -1, p)
+        z_inv2 = (z_inv * z_inv) % p
+        return Point((X * z_inv2) % p, (Y * z_inv2 * z_inv) % p)
+    
+    def batch_from_jacobian(self, points: List[Tuple[int, int, int]]) -> List[Point]:
+        """批量将Jacobian点转换为仿射坐标（所有点共用一次模逆）"""
+        p = self.p
+        finite = [i for i, (_, _, Z) in enumerate(points) if Z]
+        inverses = batch_inverse([points[i][2] for i in finite], p)
+        
+        result = [self.O] * len(points)
+        for i, z_inv in zip(finite, inverses):
+            X, Y, _ = points[i]
+            z_inv2 = (z_inv * z_inv) % p
+            result[i] = Point((X * z_inv2) % p, (Y * z_inv2 * z_inv) % p)
+        
+        return result
+    
+    def jacobian_double(self, J: Tuple[int, int, int]) -> Tuple[int, int, int]:
+        """Jacobian坐标倍点（无模逆，利用 a = -3: 3X^2 + aZ^4 = 3(X - Z^2)(X + Z^2)）"""
+        X1, Y1, Z1 = J
+        if Z1 == 0 or Y1 == 0:
+            return self.INFINITY
+        
+        p = self.p
+        delta = (Z1 * Z1) % p
+        gamma = (Y1 * Y1) % p
+        beta = (X1 * gamma) % p
+        alpha = (3 * (X1 - delta) * (X1 + delta)) % p
+        
+        X3 = (alpha * alpha - 8 * beta) % p
+        Z3 = ((Y1 + Z1) * (Y1 + Z1) - gamma - delta) % p
+        Y3 = (alpha * (4 * beta - X3) - 8 * gamma * gamma) % p
+        
+        return (X3, Y3, Z3)
+    
+    def jacobian_add(self, J1: Tuple[int, int, int], J2: Tuple[int, int, int]) -> Tuple[int, int, int]:
+        """Jacobian坐标点加法（无模逆）"""
+        X1, Y1, Z1 = J1
+        X2, Y2, Z2 = J2
+        if Z1 == 0:
+            return J2
+        if Z2 == 0:
+            return J1
+        
+        p = self.p
+        Z1Z1 = (Z1 * Z1) % p
+        Z2Z2 = (Z2 * Z2) % p
+        U1 = (X1 * Z2Z2) % p
+        U2 = (X2 * Z1Z1) % p
+        S1 = (Y1 * Z2 * Z2Z2) % p
+        S2 = (Y2 * Z1 * Z1Z1) % p
+        
+        H = (U2 - U1) % p
+        r = (S2 - S1) % p
+        if H == 0:
+            # 同一点时退化为倍点，互为相反点时结果为无穷远点
+            return self.jacobian_double(J1) if r == 0 else self.INFINITY
+        
+        HH = (H * H) % p
+        HHH = (H * HH) % p
+        V = (U1 * HH) % p
+        
+        X3 = (r * r - HHH - 2 * V) % p
+        Y3 = (r * (V - X3) - S1 * HHH) % p
+        Z3 = (Z1 * Z2 * H) % p
+        
+        return (X3, Y3, Z3)
+    
+    def jacobian_add_mixed(self, J1: Tuple[int, int, int], Q: Point) -> Tuple[int, int, int]:
+        """Jacobian点与仿射点相加（Z2 = 1，无模逆）"""
+        if Q == self.O:
+            return J1
+        X1, Y1, Z1 = J1
+        if Z1 == 0:
+            return (Q.x, Q.y, 1)
+        
+        p = self.p
+        Z1Z1 = (Z1 * Z1) % p
+        U2 = (Q.x * Z1Z1) % p
+        S2 = (Q.y * Z1 * Z1Z1) % p
+        
+        H = (U2 - X1) % p
+        r = (S2 - Y1) % p
+        if H == 0:
+            return self.jacobian_double(J1) if r == 0 else self.INFINITY
+        
+        HH = (H * H) % p
+        HHH = (H * HH) % p
+        V = (X1 * HH) % p
+        
+        X3 = (r * r - HHH - 2 * V) % p
+        Y3 = (r * (V - X3) - Y1 * HHH) % p
+        Z3 = (Z1 * H) % p
+        
+        return (X3, Y3, Z3)
+    
     def point_multiply(self, k: int, P: Point) -> Point:
-        """标量乘法 k*P"""
+        """标量乘法 k*P（Jacobian坐标，仅在最后做一次模逆）"""
         if k == 0:
             return self.O
         if k == 1:
             return P
         
-        result = self.O
-        addend = P
+        result = self.INFINITY
+        
+        # 从高位到低位的倍点-加法，加法使用混合坐标
+        for bit in bin(k)[2:]:
+            result = self.jacobian_double(result)
+            if bit == '1':
+                result = self.jacobian_add_mixed(result, P)
+        
+        return self.from_jacobian(result)
+    
+    def point_multiply_ladder(self, k: int, P: Point) -> Point:
+        """Montgomery阶梯标量乘法 k*P（Jacobian坐标），用于秘密标量
+        
+        标量先变换为 k + n 或 k + 2n，使最高位固定为第256位，每一位都恰好执行一次
+        点加和一次倍点，运算序列与k的取值无关（CPython大整数运算本身并非严格恒定时间）
+        """
+        if P == self.O:
+            return self.O
+        
+        n = self.n
+        k = k % n + n
+        k += n * (1 - (k >> 256))
         
-        while k:
+        J = self.to_jacobian(P)
+        R = [J, self.jacobian_double(J)]
+        for i in range(255, -1, -1):
+            bit = (k >> i) & 1
+            R[1 - bit] = self.jacobian_add(R[0], R[1])
+            R[bit] = self.jacobian_double(R[bit])
+        
+        return self.from_jacobian(R[0])
+    
+    def jacobian_negate(self, J: Tuple[int, int, int]) -> Tuple[int, int, int]:
+        """Jacobian坐标取负"""
+        X, Y, Z = J
+        return (X, (-Y) % self.p, Z)
+    
+    @staticmethod
+    def wnaf(k: int, width: int = 5) -> List[int]:
+        """宽度为width的NAF表示（低位在前），非零位均为奇数且 |d| < 2^(width-1)"""
+        digits = []
+        window = 1 << width
+        half = window >> 1
+        
+        while k > 0:
             if k & 1:
-                result = self.point_add(result, addend)
-            addend = self.point_double(addend)
+                d = k & (window - 1)
+                if d >= half:
+                    d -= window
+                k -= d
+            else:
+                d = 0
+            digits.append(d)
             k >>= 1
         
+        return digits
+    
+    def odd_multiples(self, P: Point, width: int = 5) -> List[Tuple[int, int, int]]:
+        """计算奇数倍点表 [P, 3P, 5P, ..., (2^(width-1) - 1)P]（Jacobian坐标）"""
+        J = self.to_jacobian(P)
+        twice = self.jacobian_double(J)
+        table = [J]
+        for _ in range((1 << (width - 2)) - 1):
+            table.append(self.jacobian_add(table[-1], twice))
+        return table
+    
+    def odd_multiples_affine(self, points: List[Point], width: int = 5) -> List[Tuple[List[Point], List[Point]]]:
+        """为多个点计算仿射坐标的奇数倍点表及其相反点表（所有表共用一次批量模逆）"""
+        size = 1 << (width - 2)
+        flat = self.batch_from_jacobian([J for P in points for J in self.odd_multiples(P, width)])
+        
+        tables = []
+        for i in range(0, len(flat), size):
+            table = flat[i:i + size]
+            tables.append((table, [Point(Q.x, (-Q.y) % self.p) for Q in table]))
+        return tables
+    
+    def point_multiply_wnaf(self, k: int, P: Point, width: int = 5) -> Point:
+        """wNAF变基点标量乘法 k*P（每次调用构建小的奇数倍点表，加法次数约为 256/(width+1)）"""
+        if k == 0 or P == self.O:
+            return self.O
+        
+        # 奇数倍点表转换为仿射坐标后可使用混合加法
+        table, negated = self.odd_multiples_affine([P], width)[0]
+        result = self.INFINITY
+        
+        for d in reversed(self.wnaf(k, width)):
+            result = self.jacobian_double(result)
+            if d > 0:
+                result = self.jacobian_add_mixed(result, table[d >> 1])
+            elif d < 0:
+                result = self.jacobian_add_mixed(result, negated[(-d) >> 1])
+        
+        return self.from_jacobian(result)
+    
+    def multi_scalar_multiply(self, pairs: List[Tuple[int, Point]], width: int = 5) -> Point:
+        """多标量乘法 k1*P1 + k2*P2 + ...（交错wNAF，所有点共享同一条倍点链）
+        
+        基点G的固定基表已构建时，G的项直接查表累加，不参与倍点链
+        """
+        return self.from_jacobian(self.multi_scalar_multiply_jacobian(pairs, width))
+    
+    def multi_scalar_multiply_jacobian(self, pairs: List[Tuple[int, Point]],
+                                       width: int = 5) -> Tuple[int, int, int]:
+        """多标量乘法，结果为Jacobian坐标"""
+        result = self.INFINITY
+        scalars = []
+        points = []
+        
+        for k, P in pairs:
+            if k == 0 or P == self.O:
+                continue
+            if P == self.G and SM2Curve._base_table is not None:
+                result = self.jacobian_add(result, SM2Curve._base_table.multiply_jacobian(k))
+            else:
+                scalars.append(self.wnaf(k, width))
+                points.append(P)
+        
+        if points:
+            terms = list(zip(scalars, self.odd_multiples_affine(points, width)))
+            result = self.jacobian_add(result, self.interleaved_wnaf_jacobian(terms))
+        
+        return result
+    
+    def interleaved_wnaf_jacobian(self, terms: List[Tuple[List[int], Tuple[List[Point], List[Point]]]]
+                                  ) -> Tuple[int, int, int]:
+        """交错wNAF，terms为 (wNAF数字, (奇数倍点表, 相反点表)) 列表，倍点表已转换为仿射坐标"""
+        acc = self.INFINITY
+        for i in range(max(len(digits) for digits, _ in terms) - 1, -1, -1):
+            acc = self.jacobian_double(acc)
+            for digits, (table, negated) in terms:
+                d = digits[i] if i < len(digits) else 0
+                if d > 0:
+                    acc = self.jacobian_add_mixed(acc, table[d >> 1])
+                elif d < 0:
+                    acc = self.jacobian_add_mixed(acc, negated[(-d) >> 1])
+        return acc
+    
+    # 基点G的固定基预计算表，所有曲线实例共享，首次使用时构建
+    _base_table = None
+    
+    def base_table(self) -> 'FixedBaseTable':
+        """获取基点G的固定基预计算表"""
+        if SM2Curve._base_table is None:
+            SM2Curve._base_table = FixedBaseTable(self, self.G)
+        return SM2Curve._base_table
+    
+    def base_multiply(self, k: int) -> Point:
+        """基点标量乘法 k*G（固定基窗口表，无倍点）"""
+        return self.base_table().multiply(k)
+    
+    @staticmethod
+    def profile() -> 'OperationProfile':
+        """运算计数与计时（上下文管理器）: with SM2Curve.profile() as prof: ..."""
+        return OperationProfile()
+
+
+class FixedBaseTable:
+    """固定基点窗口预计算表
+    
+    将标量按window_bits位分窗，第i行存储 j * 2^(w*i) * P (j = 1 .. 2^w - 1)，
+    k*P 只需每个非零窗口一次混合加法，不需要倍点
+    """
+    
+    def __init__(self, curve: SM2Curve, point: Point, window_bits: int = 8, scalar_bits: int = 256):
+        self.curve = curve
+        self.point = point
+        self.window_bits = window_bits
+        self.windows = (scalar_bits + window_bits - 1) // window_bits
+        self.table = self._build()
+    
+    def _build(self) -> List[List[Point]]:
+        """构建预计算表"""
+        curve = self.curve
+        rows = []
+        base = curve.to_jacobian(self.point)
+        
+        for _ in range(self.windows):
+            row = []
+            current = base
+            for _ in range((1 << self.window_bits) - 1):
+                row.append(current)
+                current = curve.jacobian_add(current, base)
+            rows.append(row)
+            
+            # 循环结束时 current = 2^w * base，即下一行的基点
+            base = current
+        
+        # 整张表一次批量模逆转换为仿射坐标
+        size = len(rows[0])
+        flat = curve.batch_from_jacobian([J for row in rows for J in row])
+        return [flat[i:i + size] for i in range(0, len(flat), size)]
+    
+    def multiply(self, k: int) -> Point:
+        """计算 k*P"""
+        return self.curve.from_jacobian(self.multiply_jacobian(k))
+    
+    def multiply_jacobian(self, k: int) -> Tuple[int, int, int]:
+        """计算 k*P，结果为Jacobian坐标"""
+        if k >> (self.window_bits * self.windows):
+            k %= self.curve.n
+        
+        curve = self.curve
+        mask = (1 << self.window_bits) - 1
+        result = curve.INFINITY
+        
+        for row in self.table:
+            digit = k & mask
+            if digit:
+                result = curve.jacobian_add_mixed(result, row[digit - 1])
+            k >>= self.window_bits
+        
         return result
 
 
+# 被剖析的运算及其每次调用的 (模逆次数, 模乘次数)。模乘按完整公式估算（平方计为一次乘法，
+# 小常数倍和无穷远点等提前返回的情况不单独区分）；None 表示只统计调用次数与耗时的标量乘法引擎。
+# 与输入规模有关的代价用函数表示，参数为调用的位置参数（方法包含self）
+_PROFILED_OPERATIONS = {
+    SM2Curve: {
+        'point_add': (1, 3),
+        'point_double': (1, 4),
+        'from_jacobian': (1, 4),
+        'batch_from_jacobian': lambda args: (0, 4 * len(args[1])),
+        'jacobian_double': (0, 8),
+        'jacobian_add': (0, 16),
+        'jacobian_add_mixed': (0, 11),
+        'point_multiply': None,
+        'point_multiply_ladder': None,
+        'point_multiply_wnaf': None,
+        'multi_scalar_multiply_jacobian': None,
+        'base_multiply': None,
+    },
+    FixedBaseTable: {
+        '_build': None,
+        'multiply_jacobian': None,
+    },
+}
+
+# 模块级的批量模逆（batch_from_jacobian、批量验证与随机数池均通过它求逆）
+_PROFILED_FUNCTIONS = {
+    'batch_inverse': lambda args: (1, 3 * (len(args[0]) - 1)) if args[0] else (0, 0),
+}
+
+
+class OperationProfile:
+    """曲线运算剖析器（上下文管理器）
+    
+    进入时把SM2Curve、FixedBaseTable的点运算/标量乘法方法和batch_inverse替换为计数包装，
+    退出时恢复原方法，因此未启用时没有任何额外开销。计数对所有曲线实例生效，不能嵌套，
+    也不包括进程池子进程中的运算。耗时为包含内部调用的累计时间，且包含包装本身的开销，
+    只适合相对比较
+    """
+    
+    _active: Optional['OperationProfile'] = None
+    
+    def __init__(self):
+        self.calls: Dict[str, int] = {}
+        self.elapsed_ns: Dict[str, int] = {}
+        self.inversions = 0
+        self.multiplications = 0
+        self._saved: List[Tuple[object, str, object]] = []
+    
+    def _wrap(self, name: str, func: Callable, cost) -> Callable:
+        """生成计数包装"""
+        calls = self.calls
+        elapsed_ns = self.elapsed_ns
+        clock = time.perf_counter_ns
+        calls[name] = 0
+        elapsed_ns[name] = 0
+        
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if cost is not None:
+                inversions, multiplications = cost(args) if callable(cost) else cost
+                self.inversions += inversions
+                self.multiplications += multiplications
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed_ns[name] += clock() - start
+                calls[name] += 1
+        
+        return wrapper
+    
+    def __enter__(self) -> 'OperationProfile':
+        if OperationProfile._active is not None:
+            raise RuntimeError("运算剖析不能嵌套")
+        OperationProfile._active = self
+        
+        for cls, operations in _PROFILED_OPERATIONS.items():
+            for name, cost in operations.items():
+                original = cls.__dict__[name]
+                label = name if cls is SM2Curve else f"{cls.__name__}.{name.lstrip('_')}"
+                self._saved.append((cls, name, original))
+                setattr(cls, name, self._wrap(label, original, cost))
+        
+        module = globals()
+        for name, cost in _PROFILED_FUNCTIONS.items():
+            self._saved.append((None, name, module[name]))
+            module[name] = self._wrap(name, module[name], cost)
+        
+        return self
+    
+    def __exit__(self, *exc):
+        module = globals()
+        for cls, name, original in reversed(self._saved):
+            if cls is None:
+                module[name] = original
+            else:
+                setattr(cls, name, original)
+        self._saved.clear()
+        OperationProfile._active = None
+    
+    @property
+    def additions(self) -> int:
+        """点加次数（仿射、Jacobian与混合坐标）"""
+        return sum(self.calls.get(name, 0) for name in ('point_add', 'jacobian_add', 'jacobian_add_mixed'))
+    
+    @property
+    def doublings(self) -> int:
+        """倍点次数"""
+        return sum(self.calls.get(name, 0) for name in ('point_double', 'jacobian_double'))
+    
+    def report(self) -> Dict:
+        """汇总为可序列化的字典（只包含被调用过的运算）"""
+        return {
+            'inversions': self.inversions,
+            'multiplications': self.multiplications,
+            'additions': self.additions,
+            'doublings': self.doublings,
+            'operations': {name: {'calls': count, 'total_ms': self.elapsed_ns[name] / 1e6}
+                           for name, count in self.calls.items() if count}
+        }
+
+
+class SM2Context:
+    """签名/验证上下文：缓存公钥、Za以及吸收Za之后的哈希中间状态
+    
+    同一身份的重复操作只需复制中间状态并哈希消息本身
+    """
+    
+    def __init__(self, sm2: 'SM2Optimized', public_key: Point, user_id: bytes = b'1234567812345678'):
+        self.sm2 = sm2
+        self.public_key = public_key
+        self.user_id = user_id
+        self.za = sm2.za_value(user_id, public_key)
+        self._midstate = sm2.new_hash(self.za)
+    
+    def digest(self, message: bytes) -> int:
+        """计算 e = H(Za || M)"""
+        h = self._midstate.copy()
+        h.update(message)
+        return int.from_bytes(h.digest(), 'big')
+    
+    def verify(self, message: bytes, signature: Tuple[int, int]) -> bool:
+        """使用上下文中的公钥验证签名"""
+        return self.sm2.verify_digest(self.public_key, self.digest(message), signature)
+
+
+class KDFStream:
+    """SM3密钥派生函数 KDF(Z, klen) 的流式密钥流
+    
+    Ha_i = H(Z || ct_i)，Z只哈希一次后复制中间状态；按需生成并与数据逐块异或，
+    不需要一次性生成与明文等长的完整密钥流
+    """
+    
+    def __init__(self, z: bytes, hash_factory: Callable):
+        self._base = hash_factory(z)
+        self._counter = 1
+        self._buffer = b''
+        # 已生成的密钥流是否全为0（标准要求此时重新选择k）
+        self.all_zero = True
+    
+    def read(self, length: int) -> bytes:
+        """取出接下来length字节的密钥流"""
+        needed = length - len(self._buffer)
+        if needed > 0:
+            blocks = [self._buffer]
+            for _ in range((needed + 31) // 32):
+                h = self._base.copy()
+                h.update(self._counter.to_bytes(4, 'big'))
+                blocks.append(h.digest())
+                self._counter += 1
+            self._buffer = b''.join(blocks)
+        
+        keystream, self._buffer = self._buffer[:length], self._buffer[length:]
+        if self.all_zero and keystream.strip(b'\x00'):
+            self.all_zero = False
+        return keystream
+    
+    def xor(self, data: bytes) -> bytes:
+        """数据与密钥流异或（按大整数一次完成）"""
+        if not data:
+            return b''
+        keystream = self.read(len(data))
+        return (int.from_bytes(data, 'big') ^ int.from_bytes(keystream, 'big')).to_bytes(len(data), 'big')
+
+
+class PrecomputationCache:
+    """按公钥缓存固定基窗口表的有界LRU缓存
+    
+    公钥被请求build_threshold次后才构建窗口表，避免为只出现一次的公钥付出建表开销；
+    表的总内存（估算值）超出预算时淘汰最久未使用的表
+    """
+    
+    # 每个预计算点的内存估算（Point对象及两个256位整数），单位字节
+    POINT_BYTES = 300
+    
+    def __init__(self, curve: SM2Curve, max_bytes: int = 32 * 1024 * 1024,
+                 build_threshold: int = 4, window_bits: int = 4, max_tracked: int = 4096):
+        self.curve = curve
+        self.max_bytes = max_bytes
+        self.build_threshold = build_threshold
+        self.window_bits = window_bits
+        self.max_tracked = max_tracked
+        self._tables: 'OrderedDict[Tuple[int, int], FixedBaseTable]' = OrderedDict()
+        # 尚未建表的公钥被请求的次数（同样按LRU限制条目数）
+        self._counts: 'OrderedDict[Tuple[int, int], int]' = OrderedDict()
+        self.memory_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+        self.evictions = 0
+    
+    def __len__(self) -> int:
+        return len(self._tables)
+    
+    def __contains__(self, point: Point) -> bool:
+        return (point.x, point.y) in self._tables
+    
+    def table_bytes(self, table: FixedBaseTable) -> int:
+        """估算单张窗口表占用的内存"""
+        return table.windows * ((1 << table.window_bits) - 1) * self.POINT_BYTES
+    
+    def peek(self, point: Point) -> Optional[FixedBaseTable]:
+        """查询窗口表，不更新LRU顺序和统计"""
+        return self._tables.get((point.x, point.y))
+    
+    def get(self, point: Point) -> Optional[FixedBaseTable]:
+        """查询公钥的窗口表；未命中时计数，达到阈值后建表"""
+        key = (point.x, point.y)
+        table = self._tables.get(key)
+        if table is not None:
+            self._tables.move_to_end(key)
+            self.hits += 1
+            return table
+        
+        self.misses += 1
+        count = self._counts.pop(key, 0) + 1
+        if count >= self.build_threshold:
+            return self.put(point)
+        
+        self._counts[key] = count
+        if len(self._counts) > self.max_tracked:
+            self._counts.popitem(last=False)
+        return None
+    
+    def put(self, point: Point, scalar_bits: int = 256) -> FixedBaseTable:
+        """立即为公钥构建窗口表并放入缓存"""
+        key = (point.x, point.y)
+        if key in self._tables:
+            self._remove(key)
+        
+        table = FixedBaseTable(self.curve, point, self.window_bits, scalar_bits)
+        self._tables[key] = table
+        self.memory_bytes += self.table_bytes(table)
+        self.builds += 1
+        
+        # 超出内存预算时淘汰最久未使用的表（至少保留刚构建的表）
+        while self.memory_bytes > self.max_bytes and len(self._tables) > 1:
+            self._remove(next(iter(self._tables)))
+            self.evictions += 1
+        
+        return table
+    
+    def _remove(self, key: Tuple[int, int]):
+        table = self._tables.pop(key)
+        self.memory_bytes -= self.table_bytes(table)
+    
+    def clear(self):
+        """清空缓存（保留统计计数）"""
+        self._tables.clear()
+        self._counts.clear()
+        self.memory_bytes = 0
+    
+    def stats(self) -> dict:
+        """命中/未命中/淘汰等统计"""
+        lookups = self.hits + self.misses
+        return {
+            'tables': len(self._tables),
+            'memory_bytes': self.memory_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'builds': self.builds,
+            'evictions': self.evictions
+        }
+
+
+def _verify_batch_chunk(task: Tuple[List[Tuple[Point, bytes, Tuple[int, int], bytes]], Callable]) -> List[bool]:
+    """工作进程：批量验证一组签名"""
+    items, hash_factory = task
+    return SM2Optimized(hash_factory=hash_factory).verify_batch(items)
+
+
+def _generate_keypairs_chunk(task: Tuple[int, bool]) -> List[Tuple[int, Point]]:
+    """工作进程：生成一块密钥对（基点固定基表在每个进程中只构建一次）"""
+    size, constant_time = task
+    return SM2Optimized(constant_time=constant_time)._keypairs_chunk(size)
+
+
+# 批量签名工作进程中的签名密钥（由 _init_signing_worker 在每个进程中创建一次）
+_signing_worker_key: Optional['SigningKey'] = None
+
+
+def _init_signing_worker(private_key: int, user_id: bytes, hash_factory: Callable, constant_time: bool):
+    """工作进程初始化：缓存Za、哈希中间状态与 (1 + d)^-1"""
+    global _signing_worker_key
+    sm2 = SM2Optimized(hash_factory=hash_factory, constant_time=constant_time)
+    _signing_worker_key = SigningKey(private_key, sm2, user_id, pool_size=0, background=False)
+
+
+def _sign_many_chunk(messages: List[bytes]) -> List[Tuple[int, int]]:
+    """工作进程：签名一组消息"""
+    return list(_signing_worker_key.sign_many(messages, len(messages)))
+
+
 class SM2Basic:
     """SM2基础实现"""
     
-    def __init__(self):
+    def __init__(self, hash_factory: Optional[Callable] = None, constant_time: bool = False):
         self.curve = SM2Curve()
+        # 哈希对象工厂（如 hashlib.sha256），默认使用可用的最快SM3实现
+        self.hash_factory = hash_factory or new_sm3
+        # 为True时涉及秘密标量（私钥、随机数k）的点乘使用Montgomery阶梯
+        self.constant_time = constant_time
     
     def generate_keypair(self) -> Tuple[int, Point]:
         """生成密钥对
@@ -123,14 +825,17 @@ class SM2Basic:
         private_key = secrets.randbelow(self.curve.n - 1) + 1
         
         # 计算公钥
-        public_key = self.curve.point_multiply(private_key, self.curve.G)
+        public_key = self._multiply_base(private_key)
         
         return private_key, public_key
     
+    def new_hash(self, data: bytes = b''):
+        """创建哈希对象（支持update/copy/digest），Za之后的中间状态可复制复用"""
+        return self.hash_factory(data)
+    
     def sm3_hash(self, data: bytes) -> bytes:
-        """SM3哈希函数 (简化版本，实际应该使用标准SM3)"""
-        # 这里使用SHA256作为替代，在实际应用中应该使用SM3
-        return hashlib.sha256(data).digest()
+        """SM3哈希函数"""
+        return self.new_hash(data).digest()
     
     def za_value(self, user_id: bytes, public_key: Point) -> bytes:
         """计算用户身份标识的杂凑值Za"""
@@ -164,7 +869,7 @@ class SM2Basic:
             (r, s): 签名值
         """
         # 计算公钥
-        public_key = self.curve.point_multiply(private_key, self.curve.G)
+        public_key = self._multiply_base(private_key)
         
         # 计算Za值
         za = self.za_value(user_id, public_key)
@@ -178,7 +883,7 @@ class SM2Basic:
             k = secrets.randbelow(self.curve.n - 1) + 1
             
             # 计算椭圆曲线点(x1, y1) = [k]G
-            point = self.curve.point_multiply(k, self.curve.G)
+            point = self._multiply_base(k)
             
             # 计算r
             r = (e + point.x) % self.curve.n
@@ -222,10 +927,8 @@ class SM2Basic:
         if t == 0:
             return False
         
-        # 计算椭圆曲线点(x1', y1') = [s]G + [t]PA
-        point1 = self.curve.point_multiply(s, self.curve.G)
-        point2 = self.curve.point_multiply(t, public_key)
-        point = self.curve.point_add(point1, point2)
+        # 计算椭圆曲线点(x1', y1') = [s]G + [t]PA（两项共享倍点链）
+        point = self.curve.multi_scalar_multiply([(s, self.curve.G), (t, public_key)])
         
         # 计算R
         R = (e + point.x) % self.curve.n
@@ -233,89 +936,296 @@ class SM2Basic:
         return R == r
 
 
-class SM2Optimized(SM2Basic):
-    """SM2优化实现"""
+    def _multiply_base(self, k: int) -> Point:
+        """计算 k*G（k为秘密标量）"""
+        if self.constant_time:
+            return self.curve.point_multiply_ladder(k, self.curve.G)
+        return self.curve.point_multiply(k, self.curve.G)
     
-    def __init__(self):
-        super().__init__()
-        self._precomputed_points = {}
+    def _multiply_point(self, k: int, P: Point, reuse: bool = False) -> Point:
+        """计算 k*P（k为秘密标量），reuse表示P可能被反复使用（如加密接收方公钥）"""
+        if self.constant_time:
+            return self.curve.point_multiply_ladder(k, P)
+        return self.curve.point_multiply(k, P)
     
-    def precompute_points(self, point: Point, max_bits: int = 256):
-        """预计算点的倍数以加速标量乘法"""
-        key = (point.x, point.y)
-        if key in self._precomputed_points:
-            return
+    def kdf(self, z: bytes, klen: int) -> bytes:
+        """密钥派生函数 KDF(Z, klen)"""
+        return KDFStream(z, self.new_hash).read(klen)
+    
+    def _encryption_point(self, public_key: Point) -> Tuple[bytes, bytes, bytes]:
+        """选取随机k，返回 (C1编码, x2, y2)"""
+        if public_key == self.curve.O or not self.curve.is_on_curve(public_key):
+            raise ValueError("无效的公钥")
         
-        precomputed = [self.curve.O] * max_bits
-        current = point
+        k = secrets.randbelow(self.curve.n - 1) + 1
+        C1 = self._multiply_base(k)
+        shared = self._multiply_point(k, public_key, reuse=True)
+        return (self.curve.encode_point(C1), shared.x.to_bytes(32, 'big'),
+                shared.y.to_bytes(32, 'big'))
+    
+    def encrypt(self, public_key: Point, plaintext: bytes) -> bytes:
+        """公钥加密，返回 C1 || C3 || C2"""
+        while True:
+            c1, x2, y2 = self._encryption_point(public_key)
+            keystream = KDFStream(x2 + y2, self.new_hash)
+            c2 = keystream.xor(plaintext)
+            if plaintext and keystream.all_zero:
+                continue
+            
+            c3 = self.new_hash(x2 + plaintext + y2).digest()
+            return c1 + c3 + c2
+    
+    def _decryption_keys(self, private_key: int, c1: bytes) -> Tuple[bytes, bytes]:
+        """由C1计算 (x2, y2)"""
+        shared = self._multiply_point(private_key, self.curve.decode_point(c1))
+        return shared.x.to_bytes(32, 'big'), shared.y.to_bytes(32, 'big')
+    
+    def decrypt(self, private_key: int, ciphertext: bytes) -> bytes:
+        """私钥解密 C1 || C3 || C2，校验失败时抛出ValueError"""
+        digest_size = self.new_hash().digest_size
+        if len(ciphertext) < 65 + digest_size:
+            raise ValueError("密文长度不足")
         
-        for i in range(max_bits):
-            precomputed[i] = current
-            current = self.curve.point_double(current)
+        c1, c3, c2 = ciphertext[:65], ciphertext[65:65 + digest_size], ciphertext[65 + digest_size:]
+        x2, y2 = self._decryption_keys(private_key, c1)
         
-        self._precomputed_points[key] = precomputed
-    
-    def optimized_point_multiply(self, k: int, P: Point) -> Point:
-        """优化的标量乘法"""
-        key = (P.x, P.y)
+        keystream = KDFStream(x2 + y2, self.new_hash)
+        plaintext = keystream.xor(c2)
+        if c2 and keystream.all_zero:
+            raise ValueError("KDF输出全为0")
         
-        # 如果没有预计算，使用普通方法
-        if key not in self._precomputed_points:
-            return self.curve.point_multiply(k, P)
+        if not hmac.compare_digest(self.new_hash(x2 + plaintext + y2).digest(), c3):
+            raise ValueError("密文校验失败(C3不匹配)")
+        return plaintext
+    
+    def encrypt_stream(self, public_key: Point, source: BinaryIO, dest: BinaryIO,
+                       chunk_size: int = 1 << 16) -> int:
+        """流式加密: 分块读取明文并写出 C1 || C3 || C2，返回明文长度
         
-        precomputed = self._precomputed_points[key]
-        result = self.curve.O
+        C3在C2之前，需要dest可定位（先写占位再回填）；
+        密钥流全为0时需要重新开始，source也需可定位
+        """
+        source_start = source.tell()
+        dest_start = dest.tell()
         
-        bit_index = 0
-        while k > 0:
-            if k & 1:
-                if bit_index < len(precomputed):
-                    result = self.curve.point_add(result, precomputed[bit_index])
-                else:
-                    # 超出预计算范围，使用普通方法
-                    remaining = k << bit_index
-                    remaining_point = self.curve.point_multiply(remaining, P)
-                    result = self.curve.point_add(result, remaining_point)
+        while True:
+            c1, x2, y2 = self._encryption_point(public_key)
+            keystream = KDFStream(x2 + y2, self.new_hash)
+            c3_hash = self.new_hash(x2)
+            digest_size = c3_hash.digest_size
+            
+            dest.write(c1 + b'\x00' * digest_size)
+            length = 0
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
                     break
-            k >>= 1
-            bit_index += 1
+                c3_hash.update(chunk)
+                dest.write(keystream.xor(chunk))
+                length += len(chunk)
+            
+            if length and keystream.all_zero:
+                source.seek(source_start)
+                dest.seek(dest_start)
+                dest.truncate()
+                continue
+            
+            c3_hash.update(y2)
+            end = dest.tell()
+            dest.seek(dest_start + len(c1))
+            dest.write(c3_hash.digest())
+            dest.seek(end)
+            return length
+    
+    def decrypt_stream(self, private_key: int, source: BinaryIO, dest: BinaryIO,
+                       chunk_size: int = 1 << 16) -> int:
+        """流式解密，返回明文长度
         
-        return result
+        明文在校验C3之前就已写入dest，校验失败时抛出ValueError，调用方应丢弃输出
+        """
+        c1 = source.read(65)
+        if len(c1) != 65:
+            raise ValueError("密文长度不足")
+        x2, y2 = self._decryption_keys(private_key, c1)
+        
+        c3_hash = self.new_hash(x2)
+        c3 = source.read(c3_hash.digest_size)
+        if len(c3) != c3_hash.digest_size:
+            raise ValueError("密文长度不足")
+        
+        keystream = KDFStream(x2 + y2, self.new_hash)
+        length = 0
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            plaintext = keystream.xor(chunk)
+            c3_hash.update(plaintext)
+            dest.write(plaintext)
+            length += len(chunk)
+        
+        if length and keystream.all_zero:
+            raise ValueError("KDF输出全为0")
+        c3_hash.update(y2)
+        if not hmac.compare_digest(c3_hash.digest(), c3):
+            raise ValueError("密文校验失败(C3不匹配)")
+        return length
+    
+    def encrypt_file(self, public_key: Point, input_path: str, output_path: str,
+                     chunk_size: int = 1 << 16) -> int:
+        """加密文件，返回明文长度"""
+        with open(input_path, 'rb') as source, open(output_path, 'wb') as dest:
+            return self.encrypt_stream(public_key, source, dest, chunk_size)
+    
+    def decrypt_file(self, private_key: int, input_path: str, output_path: str,
+                     chunk_size: int = 1 << 16) -> int:
+        """解密文件，先写入临时文件，校验通过后才替换为输出文件"""
+        temp_path = output_path + '.tmp'
+        try:
+            with open(input_path, 'rb') as source, open(temp_path, 'wb') as dest:
+                length = self.decrypt_stream(private_key, source, dest, chunk_size)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        os.replace(temp_path, output_path)
+        return length
+
+
+class SM2Optimized(SM2Basic):
+    """SM2优化实现"""
+    
+    def __init__(self, cache_bytes: int = 32 * 1024 * 1024, build_threshold: int = 4,
+                 max_contexts: int = 1024, hash_factory: Optional[Callable] = None,
+                 constant_time: bool = False):
+        super().__init__(hash_factory, constant_time)
+        # 频繁出现的公钥才会建表，偶尔出现的公钥使用wNAF
+        self.precompute_cache = PrecomputationCache(self.curve, cache_bytes, build_threshold)
+        # (user_id, 公钥) -> SM2Context，私钥 -> 公钥，均为有界LRU
+        self.max_contexts = max_contexts
+        self._contexts: 'OrderedDict[Tuple[bytes, int, int], SM2Context]' = OrderedDict()
+        self._public_keys: 'OrderedDict[int, Point]' = OrderedDict()
+    
+    def context(self, public_key: Point, user_id: bytes = b'1234567812345678') -> SM2Context:
+        """获取（或创建并缓存）身份对应的上下文"""
+        key = (user_id, public_key.x, public_key.y)
+        ctx = self._contexts.get(key)
+        if ctx is not None:
+            self._contexts.move_to_end(key)
+            return ctx
+        
+        ctx = self._contexts[key] = SM2Context(self, public_key, user_id)
+        if len(self._contexts) > self.max_contexts:
+            self._contexts.popitem(last=False)
+        return ctx
+    
+    def public_key_of(self, private_key: int) -> Point:
+        """由私钥计算公钥（结果缓存）"""
+        public_key = self._public_keys.get(private_key)
+        if public_key is not None:
+            self._public_keys.move_to_end(private_key)
+            return public_key
+        
+        public_key = self._public_keys[private_key] = self._multiply_base(private_key)
+        if len(self._public_keys) > self.max_contexts:
+            self._public_keys.popitem(last=False)
+        return public_key
+    
+    def precompute_points(self, point: Point, max_bits: int = 256) -> FixedBaseTable:
+        """为点立即构建窗口预计算表（覆盖max_bits位标量）"""
+        table = self.precompute_cache.peek(point)
+        if table is not None and table.window_bits * table.windows >= max_bits:
+            return table
+        return self.precompute_cache.put(point, max_bits)
+    
+    def _multiply_jacobian(self, k: int, P: Point, table: Optional[FixedBaseTable]) -> Tuple[int, int, int]:
+        """有覆盖k的预计算表时查表，否则使用wNAF"""
+        if table is not None and k.bit_length() <= table.window_bits * table.windows:
+            return table.multiply_jacobian(k)
+        return self.curve.multi_scalar_multiply_jacobian([(k, P)])
+    
+    def optimized_point_multiply(self, k: int, P: Point) -> Point:
+        """优化的标量乘法（不计入缓存统计，也不触发建表）"""
+        table = self.precompute_cache.peek(P)
+        return self.curve.from_jacobian(self._multiply_jacobian(k, P, table))
+    
+    def _multiply_base(self, k: int) -> Point:
+        """k*G 使用基点固定基表（恒定时间模式下使用Montgomery阶梯）"""
+        if self.constant_time:
+            return self.curve.point_multiply_ladder(k, self.curve.G)
+        return self.curve.base_multiply(k)
+    
+    def _multiply_point(self, k: int, P: Point, reuse: bool = False) -> Point:
+        """反复使用的点（如接收方公钥）查询窗口表缓存，其余使用wNAF"""
+        if self.constant_time:
+            return self.curve.point_multiply_ladder(k, P)
+        table = self.precompute_cache.get(P) if reuse else None
+        return self.curve.from_jacobian(self._multiply_jacobian(k, P, table))
     
     def generate_keypair(self) -> Tuple[int, Point]:
         """优化的密钥对生成"""
-        # 预计算基点G的倍数
-        self.precompute_points(self.curve.G)
-        
         # 生成私钥
         private_key = secrets.randbelow(self.curve.n - 1) + 1
         
-        # 使用优化的点乘计算公钥
-        public_key = self.optimized_point_multiply(private_key, self.curve.G)
+        # 使用基点固定基表计算公钥
+        public_key = self._multiply_base(private_key)
         
         return private_key, public_key
     
-    def sign(self, private_key: int, message: bytes, user_id: bytes = b'1234567812345678') -> Tuple[int, int]:
-        """优化的数字签名"""
-        # 预计算基点G的倍数
-        self.precompute_points(self.curve.G)
+    def _keypairs_chunk(self, size: int) -> List[Tuple[int, Point]]:
+        """生成一块密钥对，公钥以Jacobian坐标计算后共用一次模逆转换为仿射坐标"""
+        n = self.curve.n
+        # 私钥取值范围 [1, n-2]
+        private_keys = [secrets.randbelow(n - 2) + 1 for _ in range(size)]
+        if self.constant_time:
+            return [(d, self._multiply_base(d)) for d in private_keys]
         
-        # 计算公钥（使用优化的点乘）
-        public_key = self.optimized_point_multiply(private_key, self.curve.G)
+        table = self.curve.base_table()
+        public_keys = self.curve.batch_from_jacobian([table.multiply_jacobian(d) for d in private_keys])
+        return list(zip(private_keys, public_keys))
+    
+    def generate_keypairs(self, count: int, workers: Optional[int] = None,
+                          chunk_size: int = 1024) -> Iterator[Tuple[int, Point]]:
+        """批量生成密钥对（按块产出的生成器，适合直接流式写入文件）
+        Args:
+            count: 密钥对数量
+            workers: 大于1时按块分发到多个进程，在途的块数不超过 2 * workers
+            chunk_size: 每块的密钥对数量（每块一次模逆）
+        """
+        sizes = (min(chunk_size, count - i) for i in range(0, count, chunk_size))
         
-        # 计算Za值
-        za = self.za_value(user_id, public_key)
+        if workers is not None and workers > 1 and count > chunk_size:
+            from concurrent.futures import ProcessPoolExecutor
+            
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                pending = deque()
+                for size in sizes:
+                    pending.append(executor.submit(_generate_keypairs_chunk, (size, self.constant_time)))
+                    if len(pending) >= workers * 2:
+                        yield from pending.popleft().result()
+                while pending:
+                    yield from pending.popleft().result()
+            return
         
-        # 计算消息摘要
-        M_prime = za + message
-        e = int.from_bytes(self.sm3_hash(M_prime), 'big')
+        for size in sizes:
+            yield from self._keypairs_chunk(size)
+    
+    def sign(self, private_key: int, message: bytes, user_id: bytes = b'1234567812345678') -> Tuple[int, int]:
+        """优化的数字签名"""
+        # 公钥、Za及其哈希中间状态均从缓存的上下文获取
+        ctx = self.context(self.public_key_of(private_key), user_id)
+        return self.sign_digest(private_key, ctx.digest(message))
+    
+    def sign_digest(self, private_key: int, e: int) -> Tuple[int, int]:
+        """对已计算的消息摘要 e = H(Za || M) 签名"""
+        d_inv = pow(1 + private_key, -1, self.curve.n)
         
         while True:
             # 生成随机数k
             k = secrets.randbelow(self.curve.n - 1) + 1
             
-            # 使用优化的点乘计算椭圆曲线点
-            point = self.optimized_point_multiply(k, self.curve.G)
+            # 使用基点固定基表计算椭圆曲线点
+            point = self._multiply_base(k)
             
             # 计算r
             r = (e + point.x) % self.curve.n
@@ -323,47 +1233,294 @@ class SM2Optimized(SM2Basic):
                 continue
             
             # 计算s
-            d_inv = pow(1 + private_key, -1, self.curve.n)
             s = (d_inv * (k - r * private_key)) % self.curve.n
             if s == 0:
                 continue
             
             return r, s
     
+    def sign_many(self, private_key: int, messages: Iterable[bytes], user_id: bytes = b'1234567812345678',
+                  workers: Optional[int] = None, chunk_size: int = 256) -> Iterator[Tuple[int, int]]:
+        """批量签名消息流（生成器，按输入顺序产出签名）
+        Args:
+            private_key: 私钥
+            messages: 消息的可迭代对象（按块读取，不整体载入内存）
+            user_id: 用户标识
+            workers: 大于1时按块分发到多个进程，每个进程只计算一次Za，在途的块数不超过 2 * workers
+            chunk_size: 每块的消息数量
+        """
+        if workers is not None and workers > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            
+            messages = iter(messages)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_signing_worker,
+                                     initargs=(private_key, user_id, self.hash_factory,
+                                               self.constant_time)) as executor:
+                pending = deque()
+                while True:
+                    chunk = list(islice(messages, chunk_size))
+                    if not chunk:
+                        break
+                    pending.append(executor.submit(_sign_many_chunk, chunk))
+                    if len(pending) >= workers * 2:
+                        yield from pending.popleft().result()
+                while pending:
+                    yield from pending.popleft().result()
+            return
+        
+        key = SigningKey(private_key, self, user_id, pool_size=0, background=False)
+        yield from key.sign_many(messages, chunk_size)
+    
+    def signing_key(self, private_key: int, user_id: bytes = b'1234567812345678',
+                    pool_size: int = 64, background: bool = True) -> 'SigningKey':
+        """创建长期使用的签名密钥对象"""
+        return SigningKey(private_key, self, user_id, pool_size, background)
+    
     def verify(self, public_key: Point, message: bytes, signature: Tuple[int, int], 
                user_id: bytes = b'1234567812345678') -> bool:
         """优化的签名验证"""
+        return self.context(public_key, user_id).verify(message, signature)
+    
+    def verify_digest(self, public_key: Point, e: int, signature: Tuple[int, int]) -> bool:
+        """使用已计算的消息摘要 e = H(Za || M) 验证签名"""
         r, s = signature
         
         # 检查签名格式
         if not (1 <= r < self.curve.n and 1 <= s < self.curve.n):
             return False
         
-        # 预计算基点G和公钥的倍数
-        self.precompute_points(self.curve.G)
-        self.precompute_points(public_key)
-        
-        # 计算Za值
-        za = self.za_value(user_id, public_key)
-        
-        # 计算消息摘要
-        M_prime = za + message
-        e = int.from_bytes(self.sm3_hash(M_prime), 'big')
-        
         # 计算t
         t = (r + s) % self.curve.n
         if t == 0:
             return False
         
-        # 使用优化的点乘计算椭圆曲线点
-        point1 = self.optimized_point_multiply(s, self.curve.G)
-        point2 = self.optimized_point_multiply(t, public_key)
-        point = self.curve.point_add(point1, point2)
+        # [s]G + [t]PA: 基点G使用固定基表，常用公钥查缓存的窗口表，其余公钥使用wNAF
+        point = self.curve.from_jacobian(self._verify_point_jacobian(s, t, public_key))
         
         # 计算R
         R = (e + point.x) % self.curve.n
         
         return R == r
+    
+    def _verify_point_jacobian(self, s: int, t: int, public_key: Point) -> Tuple[int, int, int]:
+        """计算 [s]G + [t]PA（Jacobian坐标）"""
+        base = self.curve.base_table().multiply_jacobian(s)
+        table = self.precompute_cache.get(public_key)
+        return self.curve.jacobian_add(base, self._multiply_jacobian(t, public_key, table))
+    
+    def verify_batch(self, items: List[Tuple[Point, bytes, Tuple[int, int], bytes]],
+                     workers: Optional[int] = None) -> List[bool]:
+        """批量验证签名
+        Args:
+            items: (public_key, message, signature, user_id) 列表
+            workers: 大于1时按块分发到多个进程
+        Returns:
+            每个签名的验证结果
+        """
+        if workers is not None and workers > 1 and len(items) > workers:
+            from concurrent.futures import ProcessPoolExecutor
+            
+            chunk_size = (len(items) + workers * 4 - 1) // (workers * 4)
+            tasks = [(items[i:i + chunk_size], self.hash_factory) for i in range(0, len(items), chunk_size)]
+            results = []
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for chunk in executor.map(_verify_batch_chunk, tasks):
+                    results.extend(chunk)
+            return results
+        
+        curve = self.curve
+        n = curve.n
+        base_table = curve.base_table()
+        
+        pending = []
+        results = [False] * len(items)
+        # 没有窗口表的公钥 -> 在批内的序号，这些公钥的奇数倍点表一起构建
+        wnaf_keys: 'OrderedDict[Tuple[int, int], Point]' = OrderedDict()
+        
+        for index, (public_key, message, signature, user_id) in enumerate(items):
+            r, s = signature
+            if not (1 <= r < n and 1 <= s < n):
+                continue
+            t = (r + s) % n
+            if t == 0:
+                continue
+            
+            # 同一公钥和用户标识共享上下文，Za只计算一次
+            e = self.context(public_key, user_id).digest(message)
+            
+            table = self.precompute_cache.get(public_key)
+            if table is not None and t.bit_length() > table.window_bits * table.windows:
+                table = None
+            if table is None and public_key != curve.O:
+                wnaf_keys.setdefault((public_key.x, public_key.y), public_key)
+            pending.append((index, e, r, s, t, public_key, table))
+        
+        # 所有公钥的奇数倍点表共用一次批量模逆，而不是每个签名各做一次
+        key_tables = dict(zip(wnaf_keys, curve.odd_multiples_affine(list(wnaf_keys.values()))))
+        
+        points = []
+        for _, _, _, s, t, public_key, table in pending:
+            if table is not None:
+                term = table.multiply_jacobian(t)
+            elif public_key == curve.O:
+                term = curve.INFINITY
+            else:
+                key_table = key_tables[(public_key.x, public_key.y)]
+                term = curve.interleaved_wnaf_jacobian([(curve.wnaf(t), key_table)])
+            points.append(curve.jacobian_add(base_table.multiply_jacobian(s), term))
+        
+        # 所有结果点一起转换为仿射坐标
+        points = curve.batch_from_jacobian(points)
+        for (index, e, r, _, _, _, _), point in zip(pending, points):
+            results[index] = (e + point.x) % n == r
+        
+        return results
+
+
+class SigningKey:
+    """长期使用的签名密钥
+    
+    缓存 (1 + d)^-1、公钥和Za上下文，并由后台线程预先生成 (k, (k*G).x) 随机数池，
+    在线签名只需取出一对随机数和几次模乘；池为空时回退为现场计算
+    """
+    
+    def __init__(self, private_key: int, sm2: Optional['SM2Optimized'] = None,
+                 user_id: bytes = b'1234567812345678', pool_size: int = 64, background: bool = True):
+        self.sm2 = sm2 or SM2Optimized()
+        n = self.sm2.curve.n
+        if not 1 <= private_key < n - 1:
+            raise ValueError("私钥不在有效范围 [1, n-2] 内")
+        
+        self.private_key = private_key
+        self.public_key = self.sm2.public_key_of(private_key)
+        self.context = self.sm2.context(self.public_key, user_id)
+        self.d_inv = pow(1 + private_key, -1, n)
+        
+        self.pool_hits = 0
+        self.pool_misses = 0
+        self._pool: 'queue.Queue[Tuple[int, int]]' = queue.Queue(maxsize=pool_size)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        
+        if background and pool_size > 0:
+            self._thread = threading.Thread(target=self._refill, name='sm2-nonce-pool', daemon=True)
+            self._thread.start()
+    
+    def _new_nonce(self) -> Tuple[int, int]:
+        """生成一对 (k, (k*G).x)"""
+        curve = self.sm2.curve
+        k = secrets.randbelow(curve.n - 1) + 1
+        return k, self.sm2._multiply_base(k).x
+    
+    def _new_nonces(self, count: int) -> List[Tuple[int, int]]:
+        """批量生成 (k, (k*G).x)，所有点共用一次模逆"""
+        sm2 = self.sm2
+        n = sm2.curve.n
+        nonces = [secrets.randbelow(n - 1) + 1 for _ in range(count)]
+        if sm2.constant_time:
+            return [(k, sm2._multiply_base(k).x) for k in nonces]
+        
+        table = sm2.curve.base_table()
+        points = sm2.curve.batch_from_jacobian([table.multiply_jacobian(k) for k in nonces])
+        return [(k, point.x) for k, point in zip(nonces, points)]
+    
+    def _refill(self):
+        """后台线程：保持随机数池填满"""
+        while not self._stop.is_set():
+            nonce = self._new_nonce()
+            while not self._stop.is_set():
+                try:
+                    self._pool.put(nonce, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+    
+    def fill(self, count: Optional[int] = None) -> int:
+        """在当前线程中向随机数池补充最多count个随机数，返回实际补充的数量"""
+        added = 0
+        while count is None or added < count:
+            try:
+                self._pool.put_nowait(self._new_nonce())
+            except queue.Full:
+                break
+            added += 1
+        return added
+    
+    def pool_size(self) -> int:
+        """随机数池中当前可用的数量"""
+        return self._pool.qsize()
+    
+    def _next_nonce(self) -> Tuple[int, int]:
+        try:
+            nonce = self._pool.get_nowait()
+            self.pool_hits += 1
+            return nonce
+        except queue.Empty:
+            self.pool_misses += 1
+            return self._new_nonce()
+    
+    def sign(self, message: bytes) -> Tuple[int, int]:
+        """签名消息"""
+        return self.sign_digest(self.context.digest(message))
+    
+    def sign_digest(self, e: int) -> Tuple[int, int]:
+        """对已计算的消息摘要签名: s = (1 + d)^-1 * (k + r) - r mod n"""
+        n = self.sm2.curve.n
+        while True:
+            k, x1 = self._next_nonce()
+            
+            r = (e + x1) % n
+            if r == 0 or r + k == n:
+                continue
+            
+            s = (self.d_inv * (k + r) - r) % n
+            if s == 0:
+                continue
+            
+            return r, s
+    
+    def sign_many(self, messages: Iterable[bytes], chunk_size: int = 256) -> Iterator[Tuple[int, int]]:
+        """按块签名消息流（每块的随机数点共用一次模逆），按输入顺序逐个产出签名"""
+        n = self.sm2.curve.n
+        d_inv = self.d_inv
+        digest = self.context.digest
+        messages = iter(messages)
+        
+        while True:
+            chunk = list(islice(messages, chunk_size))
+            if not chunk:
+                return
+            
+            for message, (k, x1) in zip(chunk, self._new_nonces(len(chunk))):
+                e = digest(message)
+                r = (e + x1) % n
+                s = (d_inv * (k + r) - r) % n
+                if r == 0 or r + k == n or s == 0:
+                    yield self.sign_digest(e)
+                else:
+                    yield r, s
+    
+    def verify(self, message: bytes, signature: Tuple[int, int]) -> bool:
+        """使用对应公钥验证签名"""
+        return self.context.verify(message, signature)
+    
+    def close(self):
+        """停止后台线程并丢弃未使用的随机数"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        while True:
+            try:
+                self._pool.get_nowait()
+            except queue.Empty:
+                break
+    
+    def __enter__(self) -> 'SigningKey':
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
 
 
 def demo():
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+SM2密钥与签名的紧凑二进制编码
+
+- 公钥: SEC1压缩格式 02/03 || x（33字节）或未压缩格式 04 || x || y（65字节）
+- 私钥: 32字节大端整数
+- 签名: 原始格式 r || s（64字节）或DER格式 SEQUENCE { INTEGER r, INTEGER s }
+- 批量编解码: 定长格式直接拼接，DER格式依次拼接（自带长度）
+- 密钥对流: raw（每个65字节拼接）或 jsonl（每行一个JSON对象），逐个读写不整体载入内存
+- 消息流: 按行或4字节大端长度前缀分隔；签名流: raw / der / jsonl
+
+大量签名的存储与解析以原始64字节格式最快，DER用于与其他实现互通
+"""
+
+import json
+import struct
+from typing import BinaryIO, Iterable, Iterator, List, Tuple
+from sm2_algorithms import SM2Curve, Point
+
+
+_CURVE = SM2Curve()
+
+PRIVATE_KEY_SIZE = 32
+RAW_SIGNATURE_SIZE = 64
+
+
+def point_size(compressed: bool = True) -> int:
+    """单个公钥编码的字节数"""
+    return 33 if compressed else 65
+
+
+def encode_public_key(public_key: Point, compressed: bool = True) -> bytes:
+    """编码公钥"""
+    return _CURVE.encode_point(public_key, compressed)
+
+
+def decode_public_key(data: bytes) -> Point:
+    """解码公钥（自动识别压缩/未压缩格式），无效时抛出ValueError"""
+    return _CURVE.decode_point(bytes(data))
+
+
+def encode_private_key(private_key: int) -> bytes:
+    """编码私钥为32字节"""
+    return private_key.to_bytes(PRIVATE_KEY_SIZE, 'big')
+
+
+def decode_private_key(data: bytes) -> int:
+    """解码32字节私钥"""
+    if len(data) != PRIVATE_KEY_SIZE:
+        raise ValueError("私钥长度必须为32字节")
+    private_key = int.from_bytes(data, 'big')
+    if not 1 <= private_key < _CURVE.n - 1:
+        raise ValueError("私钥不在有效范围内")
+    return private_key
+
+
+def encode_signature_raw(signature: Tuple[int, int]) -> bytes:
+    """签名编码为 r || s（64字节）"""
+    r, s = signature
+    return r.to_bytes(32, 'big') + s.to_bytes(32, 'big')
+
+
+def decode_signature_raw(data: bytes) -> Tuple[int, int]:
+    """解码64字节 r || s 签名"""
+    if len(data) != RAW_SIGNATURE_SIZE:
+        raise ValueError("原始签名长度必须为64字节")
+    return int.from_bytes(data[:32], 'big'), int.from_bytes(data[32:], 'big')
+
+
+def _der_integer(value: int) -> bytes:
+    """DER INTEGER（非负整数，最高位为1时补0x00）"""
+    body = value.to_bytes(value.bit_length() // 8 + 1, 'big')
+    return b'\x02' + bytes([len(body)]) + body
+
+
+def encode_signature_der(signature: Tuple[int, int]) -> bytes:
+    """签名编码为DER SEQUENCE { INTEGER r, INTEGER s }"""
+    r, s = signature
+    if r < 0 or s < 0:
+        raise ValueError("签名值不能为负")
+    body = _der_integer(r) + _der_integer(s)
+    return b'\x30' + bytes([len(body)]) + body
+
+
+def _parse_der_integer(data: bytes, offset: int) -> Tuple[int, int]:
+    """解析DER INTEGER，返回 (值, 下一个偏移)"""
+    if offset + 2 > len(data) or data[offset] != 0x02:
+        raise ValueError("DER签名格式错误: 需要INTEGER")
+    length = data[offset + 1]
+    start = offset + 2
+    end = start + length
+    if length == 0 or length > 33 or end > len(data):
+        raise ValueError("DER签名格式错误: INTEGER长度无效")
+    if data[start] & 0x80:
+        raise ValueError("DER签名格式错误: 负整数")
+    if length > 1 and data[start] == 0 and not data[start + 1] & 0x80:
+        raise ValueError("DER签名格式错误: 非最简编码")
+    return int.from_bytes(data[start:end], 'big'), end
+
+
+def _parse_der_signature(data: bytes, offset: int = 0) -> Tuple[Tuple[int, int], int]:
+    """从offset开始解析一个DER签名，返回 ((r, s), 下一个偏移)"""
+    if offset + 2 > len(data) or data[offset] != 0x30:
+        raise ValueError("DER签名格式错误: 需要SEQUENCE")
+    length = data[offset + 1]
+    if length & 0x80:
+        raise ValueError("DER签名格式错误: SEQUENCE长度无效")
+    end = offset + 2 + length
+    if end > len(data):
+        raise ValueError("DER签名格式错误: 数据截断")
+
+    r, position = _parse_der_integer(data, offset + 2)
+    s, position = _parse_der_integer(data, position)
+    if position != end:
+        raise ValueError("DER签名格式错误: SEQUENCE长度不符")
+    return (r, s), end
+
+
+def decode_signature_der(data: bytes) -> Tuple[int, int]:
+    """解码DER签名（严格DER，不允许多余字节）"""
+    data = bytes(data)
+    signature, end = _parse_der_signature(data)
+    if end != len(data):
+        raise ValueError("DER签名格式错误: 存在多余字节")
+    return signature
+
+
+def encode_signatures(signatures: Iterable[Tuple[int, int]], fmt: str = 'raw') -> bytes:
+    """批量编码签名（raw: 每个64字节拼接；der: DER依次拼接）"""
+    if fmt == 'raw':
+        return b''.join(r.to_bytes(32, 'big') + s.to_bytes(32, 'big') for r, s in signatures)
+    if fmt == 'der':
+        return b''.join(encode_signature_der(signature) for signature in signatures)
+    raise ValueError(f"未知的签名格式: {fmt}")
+
+
+def decode_signatures(data: bytes, fmt: str = 'raw') -> List[Tuple[int, int]]:
+    """批量解码签名"""
+    data = bytes(data)
+    if fmt == 'raw':
+        if len(data) % RAW_SIGNATURE_SIZE:
+            raise ValueError("原始签名数据长度必须是64的整数倍")
+        from_bytes = int.from_bytes
+        return [(from_bytes(data[i:i + 32], 'big'), from_bytes(data[i + 32:i + 64], 'big'))
+                for i in range(0, len(data), RAW_SIGNATURE_SIZE)]
+    if fmt == 'der':
+        signatures = []
+        offset = 0
+        while offset < len(data):
+            signature, offset = _parse_der_signature(data, offset)
+            signatures.append(signature)
+        return signatures
+    raise ValueError(f"未知的签名格式: {fmt}")
+
+
+def encode_public_keys(public_keys: Iterable[Point], compressed: bool = True) -> bytes:
+    """批量编码公钥（定长拼接）"""
+    if compressed:
+        return b''.join(bytes([2 | (P.y & 1)]) + P.x.to_bytes(32, 'big') for P in public_keys)
+    return b''.join(b'\x04' + P.x.to_bytes(32, 'big') + P.y.to_bytes(32, 'big') for P in public_keys)
+
+
+def decode_public_keys(data: bytes, compressed: bool = True) -> List[Point]:
+    """批量解码公钥（每个公钥都会检查是否在曲线上）"""
+    data = bytes(data)
+    size = point_size(compressed)
+    if len(data) % size:
+        raise ValueError(f"公钥数据长度必须是{size}的整数倍")
+    return [_CURVE.decode_point(data[i:i + size]) for i in range(0, len(data), size)]
+
+
+def encode_keypair(private_key: int, public_key: Point) -> bytes:
+    """密钥对编码为 私钥(32字节) || 压缩公钥(33字节)"""
+    return encode_private_key(private_key) + encode_public_key(public_key)
+
+
+def decode_keypair(data: bytes) -> Tuple[int, Point]:
+    """解码 私钥 || 公钥（公钥可为压缩或未压缩格式）"""
+    if len(data) not in (PRIVATE_KEY_SIZE + 33, PRIVATE_KEY_SIZE + 65):
+        raise ValueError("密钥对数据长度无效")
+    return decode_private_key(data[:PRIVATE_KEY_SIZE]), decode_public_key(data[PRIVATE_KEY_SIZE:])
+
+
+KEYPAIR_SIZE = PRIVATE_KEY_SIZE + 33
+
+KEYPAIR_FORMATS = ('raw', 'jsonl')
+
+
+def write_keypairs(keypairs: Iterable[Tuple[int, Point]], stream: BinaryIO, fmt: str = 'raw') -> int:
+    """将密钥对逐个写入二进制流，返回写入的个数
+    
+    raw: 私钥 || 压缩公钥（每个65字节）; jsonl: 每行 {"private_key", "public_key": {"x", "y"}}
+    """
+    if fmt not in KEYPAIR_FORMATS:
+        raise ValueError(f"未知的密钥对格式: {fmt}")
+    
+    count = 0
+    for private_key, public_key in keypairs:
+        if fmt == 'raw':
+            stream.write(encode_keypair(private_key, public_key))
+        else:
+            stream.write(json.dumps({
+                'private_key': f"{private_key:064x}",
+                'public_key': {'x': f"{public_key.x:064x}", 'y': f"{public_key.y:064x}"}
+            }).encode('ascii') + b'\n')
+        count += 1
+    return count
+
+
+def read_keypairs(stream: BinaryIO, fmt: str = 'raw') -> Iterator[Tuple[int, Point]]:
+    """从二进制流逐个读取 write_keypairs 写入的密钥对"""
+    if fmt == 'raw':
+        while True:
+            data = stream.read(KEYPAIR_SIZE)
+            if not data:
+                return
+            if len(data) != KEYPAIR_SIZE:
+                raise ValueError("密钥对数据截断")
+            yield decode_keypair(data)
+    elif fmt == 'jsonl':
+        for line in stream:
+            if not line.strip():
+                continue
+            key_data = json.loads(line)
+            public_key = Point(int(key_data['public_key']['x'], 16), int(key_data['public_key']['y'], 16))
+            if not _CURVE.is_on_curve(public_key):
+                raise ValueError("公钥不在曲线上")
+            yield decode_private_key(bytes.fromhex(key_data['private_key'])), public_key
+    else:
+        raise ValueError(f"未知的密钥对格式: {fmt}")
+
+
+MESSAGE_FORMATS = ('lines', 'length-prefixed')
+
+SIGNATURE_STREAM_FORMATS = ('raw', 'der', 'jsonl')
+
+
+def read_messages(stream: BinaryIO, fmt: str = 'lines') -> Iterator[bytes]:
+    """从二进制流逐条读取消息
+    
+    lines: 每行一条（去掉行尾的 \\n 或 \\r\\n）; length-prefixed: 4字节大端长度 || 消息
+    """
+    if fmt == 'lines':
+        for line in stream:
+            if line.endswith(b'\n'):
+                line = line[:-2] if line.endswith(b'\r\n') else line[:-1]
+            yield line
+    elif fmt == 'length-prefixed':
+        while True:
+            header = stream.read(4)
+            if not header:
+                return
+            if len(header) != 4:
+                raise ValueError("消息长度前缀截断")
+            length, = struct.unpack('>I', header)
+            message = stream.read(length)
+            if len(message) != length:
+                raise ValueError("消息数据截断")
+            yield message
+    else:
+        raise ValueError(f"未知的消息格式: {fmt}")
+
+
+def write_messages(messages: Iterable[bytes], stream: BinaryIO) -> int:
+    """以4字节大端长度前缀格式写入消息，返回写入的条数"""
+    count = 0
+    for message in messages:
+        stream.write(struct.pack('>I', len(message)) + message)
+        count += 1
+    return count
+
+
+def write_signatures(signatures: Iterable[Tuple[int, int]], stream: BinaryIO, fmt: str = 'raw') -> int:
+    """将签名逐个写入二进制流（raw: r || s; der: DER依次拼接; jsonl: 每行 {"r", "s"}），返回写入的个数"""
+    if fmt not in SIGNATURE_STREAM_FORMATS:
+        raise ValueError(f"未知的签名格式: {fmt}")
+    
+    count = 0
+    for signature in signatures:
+        if fmt == 'raw':
+            stream.write(encode_signature_raw(signature))
+        elif fmt == 'der':
+            stream.write(encode_signature_der(signature))
+        else:
+            r, s = signature
+            stream.write(json.dumps({'r': f"{r:064x}", 's': f"{s:064x}"}).encode('ascii') + b'\n')
+        count += 1
+    return count
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+SM2素数域 Fp 的快速约减
+
+SM2的p是广义梅森素数:
+    p = 2^256 - 2^224 - 2^96 + 2^64 - 1
+因此 2^256 ≡ 2^224 + 2^96 - 2^64 + 1 (mod p)，512位的乘积可以只用移位和加减折叠回256位
+(Solinas约减)。本模块提供两种实现并与Python内置的 % 对比:
+- reduce_solinas: 在Python大整数上按256位折叠
+- reduce_limbs32: 按32位字（limb）展开折叠，对应C实现中常见的写法
+
+在CPython中大整数的 % 由C实现，单次调用的开销远低于若干次Python层面的移位/加减，
+基准测试表明两种Solinas实现都比 % 慢，因此SM2Curve中的曲线运算仍直接内联使用 % p。
+"""
+
+import random
+import time
+from typing import Callable, Dict, List
+
+
+P = 0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF00000000FFFFFFFFFFFFFFFF
+
+MASK256 = (1 << 256) - 1
+MASK32 = 0xFFFFFFFF
+
+
+def reduce_mod(x: int) -> int:
+    """通用约减（Python内置取模）"""
+    return x % P
+
+
+def reduce_solinas(x: int) -> int:
+    """Solinas约减，输入 0 <= x < 2^512"""
+    # 每次折叠: x = hi * 2^256 + lo ≡ lo + hi * (2^224 + 2^96 - 2^64 + 1)
+    while x >> 256:
+        hi = x >> 256
+        x = (x & MASK256) + (hi << 224) + (hi << 96) - (hi << 64) + hi
+
+    # 此时 0 <= x < 2^256 < 2p
+    if x >= P:
+        x -= P
+    return x
+
+
+# 2^256 ≡ 2^224 + 2^96 - 2^64 + 1: 第i个高位字分别加到第 i-8, i-8+3, i-8+7 字，从第 i-8+2 字减去
+_FOLD = ((0, 1), (2, -1), (3, 1), (7, 1))
+
+
+def reduce_limbs32(x: int) -> int:
+    """按32位字的Solinas约减，输入 0 <= x < 2^512"""
+    words: List[int] = [(x >> (32 * i)) & MASK32 for i in range(16)]
+
+    while len(words) > 8:
+        acc = words[:8] + [0] * (len(words) - 1)
+        for i in range(8, len(words)):
+            c = words[i]
+            if c:
+                for offset, sign in _FOLD:
+                    acc[i - 8 + offset] += sign * c
+
+        # 进位传播（带符号，>> 为向下取整）
+        words = []
+        carry = 0
+        for value in acc:
+            value += carry
+            words.append(value & MASK32)
+            carry = value >> 32
+        if carry:
+            words.append(carry)
+
+        # 去掉高位的0字
+        while len(words) > 8 and words[-1] == 0:
+            words.pop()
+        # 最高字为负数（借位）时，直接在整数上修正
+        if words[-1] < 0 or len(words) <= 8:
+            break
+
+    value = 0
+    for i in range(len(words) - 1, -1, -1):
+        value = (value << 32) + words[i]
+
+    while value < 0:
+        value += P
+    while value >= P:
+        value -= P
+    return value
+
+
+REDUCTIONS: Dict[str, Callable[[int], int]] = {
+    'mod': reduce_mod,
+    'solinas': reduce_solinas,
+    'limbs32': reduce_limbs32,
+}
+
+
+def benchmark_reduction(count: int = 20000, rounds: int = 3, seed: int = 1) -> Dict[str, float]:
+    """对随机域元素乘积测试各约减实现，返回每次约减的平均纳秒数（取多轮最小值）"""
+    rng = random.Random(seed)
+    products = [rng.randrange(P) * rng.randrange(P) for _ in range(count)]
+
+    results = {}
+    for name, func in REDUCTIONS.items():
+        best = None
+        for _ in range(rounds):
+            start = time.perf_counter_ns()
+            for value in products:
+                func(value)
+            elapsed = time.perf_counter_ns() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = best / count
+
+    return results
+
+
+def demo():
+    """打印约减实现的基准测试结果"""
+    print("=== SM2素数域约减基准测试 ===")
+    results = benchmark_reduction()
+    fastest = min(results, key=results.get)
+
+    for name, ns in results.items():
+        mark = " (最快)" if name == fastest else ""
+        print(f"{name:>8}: {ns:8.1f} ns/次, 相对 % : {ns / results['mod']:.2f}x{mark}")
+
+
+if __name__ == "__main__":
+    demo()
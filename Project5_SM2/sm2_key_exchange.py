@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+SM2密钥交换协议 (GM/T 0003.3)
+
+发起方A与响应方B各持有长期密钥对 (d, P) 和一对临时密钥 (r, R = [r]G):
+    x̄ = 2^w + (x & (2^w - 1)), w = 127
+    t = (d + x̄ * r) mod n
+    共享点 = [h*t](P_peer + [x̄_peer]R_peer) = [t]P_peer + [t*x̄_peer]R_peer
+    K = KDF(x || y || ZA || ZB, klen)
+可选的确认值 S = Hash(0x02/0x03 || y || Hash(x || ZA || ZB || x1 || y1 || x2 || y2))
+
+共享点作为两项多标量乘法计算（共享一条倍点链）；对端长期公钥的Za与窗口表
+均由SM2Optimized的缓存按对端复用，临时公钥使用基点固定基表生成。
+SM2Optimized(constant_time=True) 时涉及秘密标量的点乘改用Montgomery阶梯
+"""
+
+import hmac
+import secrets
+import time
+from typing import Dict, Optional, Tuple
+from sm2_algorithms import SM2Optimized, Point
+import shared_modules  # noqa: F401  (Project4_SM3加入模块搜索路径)
+from latency_stats import percentile
+
+
+DEFAULT_USER_ID = b'1234567812345678'
+
+# w = ceil(ceil(log2(n)) / 2) - 1
+W = 127
+
+
+def x_bar(x: int) -> int:
+    """x̄ = 2^w + (x & (2^w - 1))"""
+    return (1 << W) + (x & ((1 << W) - 1))
+
+
+class KeyExchangeParty:
+    """密钥交换参与方（长期密钥对及对端Za缓存）"""
+
+    def __init__(self, private_key: int, user_id: bytes = DEFAULT_USER_ID,
+                 sm2: Optional[SM2Optimized] = None):
+        self.sm2 = sm2 or SM2Optimized()
+        self.private_key = private_key
+        self.user_id = user_id
+        self.public_key = self.sm2.public_key_of(private_key)
+        self.za = self.sm2.context(self.public_key, user_id).za
+
+    def peer_za(self, public_key: Point, user_id: bytes = DEFAULT_USER_ID) -> bytes:
+        """对端的Za（按 (user_id, 公钥) 缓存）"""
+        return self.sm2.context(public_key, user_id).za
+
+    def initiate(self, peer_public_key: Point, peer_user_id: bytes = DEFAULT_USER_ID,
+                 klen: int = 16, confirm: bool = True) -> 'KeyExchangeSession':
+        """作为发起方A开始一次密钥交换，将 session.R 发送给B"""
+        return KeyExchangeSession(self, peer_public_key, peer_user_id, True, klen, confirm)
+
+    def respond(self, peer_public_key: Point, peer_R: Point, peer_user_id: bytes = DEFAULT_USER_ID,
+                klen: int = 16, confirm: bool = True) -> 'KeyExchangeSession':
+        """作为响应方B处理A的临时公钥，将 session.R 和 session.confirmation 发送给A"""
+        session = KeyExchangeSession(self, peer_public_key, peer_user_id, False, klen, confirm)
+        session._complete(peer_R)
+        return session
+
+
+class KeyExchangeSession:
+    """一次密钥交换会话"""
+
+    def __init__(self, party: KeyExchangeParty, peer_public_key: Point, peer_user_id: bytes,
+                 initiator: bool, klen: int, confirm: bool):
+        curve = party.sm2.curve
+        if peer_public_key == curve.O or not curve.is_on_curve(peer_public_key):
+            raise ValueError("对端公钥不在曲线上")
+
+        self.party = party
+        self.peer_public_key = peer_public_key
+        self.peer_za = party.peer_za(peer_public_key, peer_user_id)
+        self.initiator = initiator
+        self.klen = klen
+        self.confirm = confirm
+
+        self.r = secrets.randbelow(curve.n - 1) + 1
+        self.R = party.sm2._multiply_base(self.r)
+        self.t = (party.private_key + x_bar(self.R.x) * self.r) % curve.n
+
+        self.key: Optional[bytes] = None
+        # 本方发送给对端的确认值，以及期望收到的对端确认值
+        self.confirmation: Optional[bytes] = None
+        self._expected: Optional[bytes] = None
+
+    def _shared_point(self, peer_R: Point) -> Point:
+        """计算 [t](P_peer + [x̄_peer]R_peer)（h = 1）"""
+        sm2 = self.party.sm2
+        curve = sm2.curve
+        if peer_R == curve.O or not curve.is_on_curve(peer_R):
+            raise ValueError("对端临时公钥不在曲线上")
+
+        t = self.t
+        if sm2.constant_time:
+            # t为秘密标量: 先用公开的x̄计算 P_peer + [x̄]R_peer，再用Montgomery阶梯乘t
+            base = curve.point_add(self.peer_public_key, curve.point_multiply_wnaf(x_bar(peer_R.x), peer_R))
+            shared = curve.point_multiply_ladder(t, base)
+            if shared == curve.O:
+                raise ValueError("共享点为无穷远点，协商失败")
+            return shared
+
+        tx = (t * x_bar(peer_R.x)) % curve.n
+
+        # 对端长期公钥反复出现时使用缓存的窗口表，否则与临时公钥交错计算
+        table = sm2.precompute_cache.get(self.peer_public_key)
+        if table is not None:
+            J = curve.jacobian_add(table.multiply_jacobian(t),
+                                   curve.multi_scalar_multiply_jacobian([(tx, peer_R)]))
+        else:
+            J = curve.multi_scalar_multiply_jacobian([(t, self.peer_public_key), (tx, peer_R)])
+
+        shared = curve.from_jacobian(J)
+        if shared == curve.O:
+            raise ValueError("共享点为无穷远点，协商失败")
+        return shared
+
+    def _complete(self, peer_R: Point):
+        """计算共享密钥及双方确认值"""
+        sm2 = self.party.sm2
+        shared = self._shared_point(peer_R)
+
+        if self.initiator:
+            za, zb, R1, R2 = self.party.za, self.peer_za, self.R, peer_R
+        else:
+            za, zb, R1, R2 = self.peer_za, self.party.za, peer_R, self.R
+
+        x = shared.x.to_bytes(32, 'big')
+        y = shared.y.to_bytes(32, 'big')
+        self.key = sm2.kdf(x + y + za + zb, self.klen)
+
+        if self.confirm:
+            inner = sm2.new_hash(x + za + zb)
+            for coordinate in (R1.x, R1.y, R2.x, R2.y):
+                inner.update(coordinate.to_bytes(32, 'big'))
+            inner = inner.digest()
+            s_responder = sm2.new_hash(b'\x02' + y + inner).digest()
+            s_initiator = sm2.new_hash(b'\x03' + y + inner).digest()
+
+            if self.initiator:
+                self.confirmation, self._expected = s_initiator, s_responder
+            else:
+                self.confirmation, self._expected = s_responder, s_initiator
+
+    def finish(self, peer_R: Point, peer_confirmation: Optional[bytes] = None) -> bytes:
+        """发起方A: 处理B的临时公钥和确认值SB，返回共享密钥，将 session.confirmation 发送给B"""
+        if not self.initiator:
+            raise ValueError("finish 仅用于发起方")
+        self._complete(peer_R)
+        self._check(peer_confirmation)
+        return self.key
+
+    def verify_confirmation(self, peer_confirmation: Optional[bytes]) -> bytes:
+        """响应方B: 校验A的确认值SA，返回共享密钥"""
+        if self.initiator:
+            raise ValueError("verify_confirmation 仅用于响应方")
+        self._check(peer_confirmation)
+        return self.key
+
+    def _check(self, peer_confirmation: Optional[bytes]):
+        if not self.confirm:
+            return
+        if peer_confirmation is None or not hmac.compare_digest(peer_confirmation, self._expected):
+            self.key = None
+            raise ValueError("密钥确认失败")
+
+
+def handshake(alice: KeyExchangeParty, bob: KeyExchangeParty, klen: int = 16,
+              confirm: bool = True) -> Tuple[bytes, bytes]:
+    """在进程内完成一次完整的密钥交换，返回 (A的密钥, B的密钥)"""
+    session_a = alice.initiate(bob.public_key, bob.user_id, klen, confirm)
+    session_b = bob.respond(alice.public_key, session_a.R, alice.user_id, klen, confirm)
+    key_a = session_a.finish(session_b.R, session_b.confirmation)
+    key_b = session_b.verify_confirmation(session_a.confirmation)
+    return key_a, key_b
+
+
+def benchmark_key_exchange(count: int = 200, confirm: bool = True) -> Dict:
+    """与进程内的对端反复握手，测试每秒握手次数（首次握手包含Za和基点表等冷启动开销）"""
+    sm2_a = SM2Optimized()
+    sm2_b = SM2Optimized()
+    alice = KeyExchangeParty(sm2_a.generate_keypair()[0], b'ALICE123@YAHOO.COM', sm2_a)
+    bob = KeyExchangeParty(sm2_b.generate_keypair()[0], b'BILL456@YAHOO.COM', sm2_b)
+
+    start = time.perf_counter()
+    handshake(alice, bob, confirm=confirm)
+    first = time.perf_counter() - start
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(count):
+        handshake_start = time.perf_counter()
+        key_a, key_b = handshake(alice, bob, confirm=confirm)
+        latencies.append(time.perf_counter() - handshake_start)
+        if key_a != key_b:
+            raise RuntimeError("双方密钥不一致")
+    elapsed = time.perf_counter() - start
+
+    return {
+        'handshakes': count,
+        'elapsed': elapsed,
+        'handshakes_per_second': count / elapsed if elapsed > 0 else 0.0,
+        'first_handshake_ms': first * 1000,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'table_cache': sm2_a.precompute_cache.stats()
+    }
+
+
+def demo():
+    """SM2密钥交换演示与吞吐量测试"""
+    print("=== SM2密钥交换 (GM/T 0003.3) ===")
+    sm2 = SM2Optimized()
+    alice = KeyExchangeParty(sm2.generate_keypair()[0], b'ALICE123@YAHOO.COM')
+    bob = KeyExchangeParty(sm2.generate_keypair()[0], b'BILL456@YAHOO.COM')
+
+    key_a, key_b = handshake(alice, bob)
+    print(f"A的密钥: {key_a.hex()}")
+    print(f"B的密钥: {key_b.hex()}")
+    print(f"密钥一致: {'✅' if key_a == key_b else '❌'}")
+
+    for confirm in (True, False):
+        result = benchmark_key_exchange(200, confirm)
+        label = "带确认" if confirm else "不带确认"
+        print(f"\n握手吞吐量 ({label}): {result['handshakes_per_second']:.0f} 次/秒 "
+              f"(每次包含双方计算)")
+        print(f"首次握手: {result['first_handshake_ms']:.2f} ms, "
+              f"p50/p99: {result['p50_ms']:.2f} / {result['p99_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    demo()
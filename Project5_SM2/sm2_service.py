@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+SM2签名/验证服务
+
+在本地TCP或Unix套接字上启动基于asyncio的服务，时间窗口内到达的请求被合并为
+一次 sign_many / verify_batch 调用并在进程池中执行（每个工作进程只计算一次Za、
+(1 + d)^-1，并保留各自的公钥窗口表缓存），同时提供以流水线方式发送请求的
+负载生成客户端，报告吞吐量与 p50/p99 延迟
+
+协议（按行，ASCII，同一连接上的响应按请求顺序返回）:
+  请求: SIGN <message_hex>\\n
+        VERIFY <public_key_hex> <message_hex> <signature_hex>[ <user_id_hex>]\\n
+        PUBKEY\\n
+  响应: SIG <r || s 十六进制>\\n | OK\\n | FAIL\\n | KEY <压缩公钥十六进制>\\n | ERR\\n
+"""
+
+import asyncio
+import random
+import signal
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from sm2_algorithms import SM2Optimized, SigningKey, Point
+import sm2_encoding
+import shared_modules  # noqa: F401  (Project4_SM3加入模块搜索路径)
+from latency_stats import summarize_latencies, print_stats
+from line_client import PipelinedLineClient
+
+
+DEFAULT_USER_ID = b'1234567812345678'
+
+# 工作进程中的SM2实例与签名密钥（由 _init_worker 在每个进程中创建一次）
+_worker_sm2: Optional[SM2Optimized] = None
+_worker_key: Optional[SigningKey] = None
+
+
+def _init_worker(private_key: int, user_id: bytes, constant_time: bool):
+    """工作进程初始化"""
+    global _worker_sm2, _worker_key
+    _worker_sm2 = SM2Optimized(constant_time=constant_time)
+    _worker_key = SigningKey(private_key, _worker_sm2, user_id, pool_size=0, background=False)
+
+
+def _init_worker_process(private_key: int, user_id: bytes, constant_time: bool):
+    """进程池初始化：Ctrl-C 由主进程处理，工作进程随进程池关闭而退出"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _init_worker(private_key, user_id, constant_time)
+
+
+def _sign_batch(messages: List[bytes]) -> List[Tuple[int, int]]:
+    """工作进程：签名一批消息"""
+    return list(_worker_key.sign_many(messages, len(messages)))
+
+
+def _verify_batch(items: List[Tuple[Point, bytes, Tuple[int, int], bytes]]) -> List[bool]:
+    """工作进程：验证一批签名"""
+    return _worker_sm2.verify_batch(items)
+
+
+class MicroBatcher:
+    """把时间窗口内到达的请求合并为一次批量调用
+
+    第一个请求到达时开始计时，窗口结束或累计到max_batch个请求时立即提交
+    """
+
+    def __init__(self, run_batch: Callable[[List], Awaitable[List]], window: float = 0.002,
+                 max_batch: int = 256):
+        self.run_batch = run_batch
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self.batches = 0
+        self.items = 0
+        self._pending: List[Tuple[object, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def submit(self, item) -> asyncio.Future:
+        """加入一个请求，返回其结果的Future"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self.flush)
+        return future
+
+    def flush(self):
+        """立即提交当前累积的请求"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, []
+        self.batches += 1
+        self.items += len(batch)
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[object, asyncio.Future]]):
+        try:
+            results = await self.run_batch([item for item, _ in batch])
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+class SM2Server:
+    """对请求进行微批处理的SM2签名/验证服务"""
+
+    def __init__(self, private_key: int, host: str = '127.0.0.1', port: int = 0,
+                 unix_path: Optional[str] = None, workers: int = 2, batch_window: float = 0.002,
+                 max_batch: int = 256, user_id: bytes = DEFAULT_USER_ID, constant_time: bool = False):
+        """
+        Args:
+            unix_path: 指定时监听Unix套接字而不是TCP
+            workers: 工作进程数，0表示在事件循环所在进程中直接执行
+            batch_window: 微批处理的时间窗口（秒）
+        """
+        self.private_key = private_key
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.workers = workers
+        self.user_id = user_id
+        self.constant_time = constant_time
+        self.public_key = SM2Optimized().public_key_of(private_key)
+
+        self.sign_batcher = MicroBatcher(self._sign, batch_window, max_batch)
+        self.verify_batcher = MicroBatcher(self._verify, batch_window, max_batch)
+        self._executor = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[asyncio.Task] = set()
+        self.reset_stats()
+
+    def reset_stats(self):
+        """清空服务端统计"""
+        self.ok = 0
+        self.failed = 0
+        self.errors = 0
+        self.latencies: List[float] = []
+        self._first_request: Optional[float] = None
+        self._last_response: Optional[float] = None
+
+    async def _execute(self, func: Callable, batch: List):
+        if self._executor is None:
+            return func(batch)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, batch)
+
+    async def _sign(self, messages: List[bytes]) -> List[bytes]:
+        signatures = await self._execute(_sign_batch, messages)
+        return [b'SIG ' + sm2_encoding.encode_signature_raw(signature).hex().encode() + b'\n'
+                for signature in signatures]
+
+    async def _verify(self, items: List[Tuple[Point, bytes, Tuple[int, int], bytes]]) -> List[bytes]:
+        results = await self._execute(_verify_batch, items)
+        return [b'OK\n' if ok else b'FAIL\n' for ok in results]
+
+    async def start(self):
+        """启动工作进程和服务，返回实际监听的 (host, port) 或Unix套接字路径"""
+        if self.workers > 0:
+            from concurrent.futures import ProcessPoolExecutor
+
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker_process,
+                initargs=(self.private_key, self.user_id, self.constant_time))
+            # 在接受连接之前启动全部工作进程（fork出的子进程不会继承客户端连接），
+            # 同时完成基点表与Za等预热
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(loop.run_in_executor(self._executor, _verify_batch, [])
+                                   for _ in range(self.workers)))
+        else:
+            _init_worker(self.private_key, self.user_id, self.constant_time)
+
+        if self.unix_path:
+            self._server = await asyncio.start_unix_server(self._handle_client, self.unix_path)
+            return self.unix_path
+
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        self.host, self.port = self._server.sockets[0].getsockname()[:2]
+        return self.host, self.port
+
+    async def stop(self):
+        """停止服务（等待已建立的连接处理完毕）和工作进程"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._connections:
+            await asyncio.gather(*self._connections, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    async def serve_forever(self):
+        """启动服务并一直运行"""
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    def _dispatch(self, line: bytes) -> asyncio.Future:
+        """解析一行请求并交给对应的批处理器，格式错误时返回已完成的ERR"""
+        parts = line.split()
+        try:
+            if len(parts) == 2 and parts[0] == b'SIGN':
+                return self.sign_batcher.submit(bytes.fromhex(parts[1].decode()))
+
+            if len(parts) in (4, 5) and parts[0] == b'VERIFY':
+                public_key = sm2_encoding.decode_public_key(bytes.fromhex(parts[1].decode()))
+                message = bytes.fromhex(parts[2].decode())
+                signature = sm2_encoding.decode_signature_raw(bytes.fromhex(parts[3].decode()))
+                user_id = bytes.fromhex(parts[4].decode()) if len(parts) == 5 else self.user_id
+                return self.verify_batcher.submit((public_key, message, signature, user_id))
+
+            if parts == [b'PUBKEY']:
+                response = b'KEY ' + sm2_encoding.encode_public_key(self.public_key).hex().encode() + b'\n'
+            else:
+                response = b'ERR\n'
+        except ValueError:
+            response = b'ERR\n'
+
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(response)
+        return future
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """处理单个连接上的流水线请求，按请求顺序写回响应"""
+        responses: 'asyncio.Queue[Optional[Tuple[float, asyncio.Future]]]' = asyncio.Queue()
+
+        async def write_responses():
+            while True:
+                entry = await responses.get()
+                if entry is None:
+                    break
+                start, future = entry
+                try:
+                    response = await future
+                except Exception:
+                    response = b'ERR\n'
+
+                if response == b'ERR\n':
+                    self.errors += 1
+                elif response == b'FAIL\n':
+                    self.failed += 1
+                else:
+                    self.ok += 1
+
+                writer.write(response)
+                end = time.perf_counter()
+                self.latencies.append(end - start)
+                self._last_response = end
+                await writer.drain()
+
+        connection = asyncio.current_task()
+        self._connections.add(connection)
+        writer_task = asyncio.ensure_future(write_responses())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                start = time.perf_counter()
+                if self._first_request is None:
+                    self._first_request = start
+                responses.put_nowait((start, self._dispatch(line)))
+
+            responses.put_nowait(None)
+            await writer_task
+        except ConnectionError:
+            writer_task.cancel()
+        finally:
+            self._connections.discard(connection)
+            writer.close()
+
+    def stats(self) -> Dict:
+        """服务端统计（延迟为请求到达至响应写出，包含排队等待批处理的时间）"""
+        count = len(self.latencies)
+        elapsed = 0.0
+        if self._first_request is not None and self._last_response is not None:
+            elapsed = self._last_response - self._first_request
+        stats = summarize_latencies(count, elapsed, self.latencies)
+        batches = self.sign_batcher.batches + self.verify_batcher.batches
+        items = self.sign_batcher.items + self.verify_batcher.items
+        stats.update({'ok': self.ok, 'failed': self.failed, 'errors': self.errors,
+                      'batches': batches, 'mean_batch': items / batches if batches else 0.0})
+        return stats
+
+
+class SM2LoadClient(PipelinedLineClient):
+    """以流水线方式向SM2服务发送请求的负载生成客户端"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, unix_path: Optional[str] = None,
+                 connections: int = 4, window: int = 32):
+        super().__init__(host, port, connections, window, unix_path)
+
+    async def run(self, requests: List[bytes]) -> Dict:
+        """发送全部请求并返回客户端统计（延迟为往返时间）"""
+        stats, responses = await self.run_lines(requests)
+        stats['errors'] = sum(1 for line in responses if line == b'ERR\n')
+        stats['failed'] = sum(1 for line in responses if line == b'FAIL\n')
+        stats['ok'] = len(responses) - stats['errors'] - stats['failed']
+        return stats
+
+
+def make_requests(count: int, mode: str = 'mixed', keys: int = 8, seed: int = 1) -> List[bytes]:
+    """构造负载请求行
+
+    mode为 sign / verify / mixed（各一半）；验证请求使用少量热点公钥，便于服务端复用缓存
+    """
+    if mode not in ('sign', 'verify', 'mixed'):
+        raise ValueError(f"未知的负载类型: {mode}")
+
+    rng = random.Random(seed)
+    sm2 = SM2Optimized()
+    keypairs = list(sm2.generate_keypairs(keys))
+    encoded_keys = [sm2_encoding.encode_public_key(public_key).hex().encode() for _, public_key in keypairs]
+
+    requests = []
+    for i in range(count):
+        message = f"request {i} {rng.getrandbits(64):016x}".encode()
+        if mode == 'sign' or (mode == 'mixed' and i % 2 == 0):
+            requests.append(b'SIGN ' + message.hex().encode() + b'\n')
+            continue
+
+        index = rng.randrange(keys)
+        signature = sm2.sign(keypairs[index][0], message)
+        requests.append(b' '.join([b'VERIFY', encoded_keys[index], message.hex().encode(),
+                                   sm2_encoding.encode_signature_raw(signature).hex().encode()]) + b'\n')
+    return requests
+
+
+async def run_service_benchmark(count: int = 1000, mode: str = 'mixed', connections: int = 4,
+                                window: int = 32, workers: int = 2, batch_window: float = 0.002,
+                                max_batch: int = 256) -> Dict:
+    """在同一事件循环中启动服务端和负载客户端，测试吞吐量与延迟"""
+    requests = make_requests(count, mode)
+    private_key = SM2Optimized().generate_keypair()[0]
+    server = SM2Server(private_key, workers=workers, batch_window=batch_window, max_batch=max_batch)
+    host, port = await server.start()
+    print(f"SM2服务已启动: {host}:{port}")
+
+    try:
+        client = SM2LoadClient(host, port, connections=connections, window=window)
+        client_stats = await client.run(requests)
+    finally:
+        await server.stop()
+
+    return {'client': client_stats, 'server': server.stats()}
+
+
+def demo_service(count: int = 1000, mode: str = 'mixed', connections: int = 4, window: int = 32,
+                 workers: int = 2, batch_window: float = 0.002, max_batch: int = 256) -> Dict:
+    """运行本地SM2服务吞吐量测试并打印结果"""
+    print("=== SM2签名/验证服务吞吐量测试 ===")
+    print(f"请求数: {count}, 负载: {mode}, 连接数: {connections}, 流水线窗口: {window}")
+    print(f"工作进程: {workers}, 批处理窗口: {batch_window * 1000:.1f} ms, 最大批大小: {max_batch}")
+
+    result = asyncio.run(run_service_benchmark(count, mode, connections, window, workers,
+                                               batch_window, max_batch))
+    print_stats("客户端 (往返延迟)", result['client'])
+    print_stats("服务端 (处理延迟)", result['server'])
+    return result
+
+
+def serve_sm2(private_key: int, host: str = '127.0.0.1', port: int = 9400,
+              unix_path: Optional[str] = None, workers: int = 2, batch_window: float = 0.002,
+              max_batch: int = 256):
+    """以独立进程运行SM2服务，退出时打印服务端统计"""
+    server = SM2Server(private_key, host, port, unix_path, workers, batch_window, max_batch)
+
+    async def run():
+        address = await server.start()
+        print(f"SM2服务已启动: {address} (Ctrl-C 退出)")
+        print(f"签名公钥: {sm2_encoding.encode_public_key(server.public_key).hex()}")
+        try:
+            await server.serve_forever()
+        finally:
+            await server.stop()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+    print_stats("服务端 (处理延迟)", server.stats())
+
+
+def load_sm2_service(host: str = '127.0.0.1', port: int = 9400, unix_path: Optional[str] = None,
+                     count: int = 1000, mode: str = 'mixed', connections: int = 4,
+                     window: int = 32) -> Dict:
+    """对已运行的SM2服务发起流水线负载"""
+    requests = make_requests(count, mode)
+    client = SM2LoadClient(host, port, unix_path, connections, window)
+    stats = asyncio.run(client.run(requests))
+    print_stats("客户端 (往返延迟)", stats)
+    return stats
+
+
+if __name__ == "__main__":
+    demo_service()
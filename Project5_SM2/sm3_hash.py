@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+SM2使用的SM3杂凑函数
+
+提供与hashlib对象相同接口（update/copy/digest/hexdigest）的流式SM3，
+new_sm3() 优先使用OpenSSL（hashlib 'sm3'），不可用时回退到纯Python实现。
+两种实现都支持 copy()，签名/验证可以复用吸收Za之后的中间状态。
+纯Python实现的压缩函数来自Project4_SM3的 SM3Optimized（见 shared_modules），不另行实现。
+"""
+
+import hashlib
+import struct
+
+import shared_modules  # noqa: F401  (Project4_SM3加入模块搜索路径)
+from sm3_algorithms import SM3Base, SM3Optimized
+
+
+_COMPRESSOR = SM3Optimized()
+
+
+class SM3:
+    """纯Python流式SM3（接口与hashlib对象一致）"""
+
+    name = 'sm3'
+    digest_size = 32
+    block_size = 64
+
+    def __init__(self, data: bytes = b''):
+        self._state = list(SM3Base.IV)
+        self._buffer = b''
+        self._length = 0
+        if data:
+            self.update(data)
+
+    def update(self, data: bytes):
+        """追加数据，只缓存不足一个分组的尾部"""
+        data = bytes(data)
+        self._length += len(data)
+        buffer = self._buffer + data
+
+        full = len(buffer) - len(buffer) % 64
+        state = self._state
+        for i in range(0, full, 64):
+            state = _COMPRESSOR.compress_block(state, buffer[i:i + 64])
+        self._state = state
+        self._buffer = buffer[full:]
+
+    def copy(self) -> 'SM3':
+        """复制当前中间状态"""
+        other = SM3.__new__(SM3)
+        other._state = list(self._state)
+        other._buffer = self._buffer
+        other._length = self._length
+        return other
+
+    def digest(self) -> bytes:
+        """返回摘要（不改变当前状态）"""
+        bit_length = self._length * 8
+        tail = self._buffer + b'\x80' + b'\x00' * ((55 - len(self._buffer)) % 64)
+        tail += struct.pack('>Q', bit_length)
+
+        state = self._state
+        for i in range(0, len(tail), 64):
+            state = _COMPRESSOR.compress_block(state, tail[i:i + 64])
+        return struct.pack('>8I', *state)
+
+    def hexdigest(self) -> str:
+        return self.digest().hex()
+
+
+def _openssl_sm3_available() -> bool:
+    """hashlib是否链接了支持SM3的OpenSSL"""
+    try:
+        return hashlib.new('sm3', b'abc').hexdigest() == \
+            '66c7f0f462eeedd9d1f2d46bdc10e4e24167c4875cf2f7a2297da02b8f4ba8e0'
+    except ValueError:
+        return False
+
+
+OPENSSL_SM3 = _openssl_sm3_available()
+
+# 当前使用的SM3后端: 'openssl' 或 'python'
+SM3_BACKEND = 'openssl' if OPENSSL_SM3 else 'python'
+
+
+def new_sm3(data: bytes = b''):
+    """创建SM3哈希对象，优先使用OpenSSL"""
+    if OPENSSL_SM3:
+        return hashlib.new('sm3', data)
+    return SM3(data)
+
+
+def sm3(data: bytes) -> bytes:
+    """计算SM3摘要"""
+    return new_sm3(data).digest()
@@ -5,8 +5,19 @@ SM2算法测试套件
 """
 
 import unittest
+import asyncio
 import hashlib
-from sm2_algorithms import SM2Basic, SM2Optimized, Point, SM2Curve
+import io
+import json
+import sys
+from sm2_algorithms import SM2Basic, SM2Optimized, Point, SM2Curve, FixedBaseTable, batch_inverse, SigningKey, KDFStream
+import random
+import sm2_field
+import sm2_encoding
+from sm3_hash import SM3, new_sm3, sm3
+from sm2_key_exchange import KeyExchangeParty, handshake, x_bar
+from sm2_service import SM2Server, SM2LoadClient, MicroBatcher, make_requests
+from benchmark import measure, measure_cold, compare_results
 from security_analysis import SM2SecurityAnalysis, SatoshiSignatureForgery
 
 
@@ -58,6 +69,257 @@ class TestSM2Curve(unittest.TestCase):
             self.curve.point_multiply(k, Q)
         )
         self.assertEqual(left, right)
+    
+    def test_jacobian_operations(self):
+        """测试Jacobian坐标运算与仿射坐标运算一致"""
+        G = self.curve.G
+        P = self.curve.point_multiply(123, G)
+        J_G = self.curve.to_jacobian(G)
+        J_P = self.curve.to_jacobian(P)
+        
+        # 倍点
+        self.assertEqual(self.curve.from_jacobian(self.curve.jacobian_double(J_G)),
+                         self.curve.point_double(G))
+        
+        # Z != 1 的一般加法与混合加法
+        J_2P = self.curve.jacobian_double(J_P)
+        expected = self.curve.point_add(self.curve.point_double(P), G)
+        self.assertEqual(self.curve.from_jacobian(self.curve.jacobian_add(J_2P, J_G)), expected)
+        self.assertEqual(self.curve.from_jacobian(self.curve.jacobian_add_mixed(J_2P, G)), expected)
+        
+        # 特殊情况: P + P, P + (-P), 无穷远点
+        neg_P = Point(P.x, (-P.y) % self.curve.p)
+        self.assertEqual(self.curve.from_jacobian(self.curve.jacobian_add_mixed(J_P, P)),
+                         self.curve.point_double(P))
+        self.assertEqual(self.curve.from_jacobian(self.curve.jacobian_add_mixed(J_P, neg_P)),
+                         self.curve.O)
+        self.assertEqual(self.curve.from_jacobian(self.curve.jacobian_add(self.curve.INFINITY, J_P)), P)
+        self.assertEqual(self.curve.to_jacobian(self.curve.O), self.curve.INFINITY)
+    
+    def test_batch_inverse(self):
+        """测试批量模逆与批量仿射坐标转换"""
+        p = self.curve.p
+        values = [1, 2, 3, p - 1, 0x123456789ABCDEF, self.curve.Gx]
+        self.assertEqual(batch_inverse(values, p), [pow(v, -1, p) for v in values])
+        self.assertEqual(batch_inverse([5], p), [pow(5, -1, p)])
+        self.assertEqual(batch_inverse([], p), [])
+        with self.assertRaises(ValueError):
+            batch_inverse([3, 0, 5], p)
+        
+        G = self.curve.to_jacobian(self.curve.G)
+        points = [self.curve.jacobian_double(G), self.curve.INFINITY,
+                  self.curve.jacobian_add(self.curve.jacobian_double(G), G), G]
+        self.assertEqual(self.curve.batch_from_jacobian(points),
+                         [self.curve.from_jacobian(J) for J in points])
+        self.assertEqual(self.curve.batch_from_jacobian([]), [])
+    
+    def test_point_multiply_matches_affine(self):
+        """测试Jacobian标量乘法与仿射倍点-加法结果一致"""
+        G = self.curve.G
+        
+        for k in [2, 3, 7, 0xFFFF, self.curve.n - 1, 0x123456789ABCDEF0123456789ABCDEF]:
+            expected = self.curve.O
+            addend = G
+            scalar = k
+            while scalar:
+                if scalar & 1:
+                    expected = self.curve.point_add(expected, addend)
+                addend = self.curve.point_double(addend)
+                scalar >>= 1
+            
+            self.assertEqual(self.curve.point_multiply(k, G), expected)
+    
+    def test_wnaf_multiply(self):
+        """测试wNAF表示与变基点标量乘法"""
+        P = self.curve.point_multiply(987654321, self.curve.G)
+        
+        for width in (2, 4, 5, 6):
+            for k in [1, 2, 7, 0xFFFF, 0x123456789ABCDEF, self.curve.n - 1]:
+                digits = self.curve.wnaf(k, width)
+                
+                # 还原标量，非零位为奇数且任意width个相邻位中至多一个非零
+                self.assertEqual(sum(d << i for i, d in enumerate(digits)), k)
+                for i, d in enumerate(digits):
+                    if d:
+                        self.assertEqual(d % 2, 1)
+                        self.assertLess(abs(d), 1 << (width - 1))
+                        self.assertFalse(any(digits[i + 1:i + width]))
+                
+                self.assertEqual(self.curve.point_multiply_wnaf(k, P, width),
+                                 self.curve.point_multiply(k, P))
+        
+        self.assertEqual(self.curve.point_multiply_wnaf(0, P), self.curve.O)
+        self.assertEqual(self.curve.point_multiply_wnaf(self.curve.n, P), self.curve.O)
+    
+    def test_multi_scalar_multiply(self):
+        """测试多标量乘法（交错wNAF与固定基表两种路径）"""
+        G = self.curve.G
+        P = self.curve.point_multiply(987654321, G)
+        Q = self.curve.point_multiply(123456789, G)
+        s, t, u = 0x1234567890ABCDEF, self.curve.n - 3, 0xFFFF
+        
+        expected = self.curve.point_add(self.curve.point_multiply(s, G), self.curve.point_multiply(t, P))
+        expected3 = self.curve.point_add(expected, self.curve.point_multiply(u, Q))
+        
+        saved_table = SM2Curve._base_table
+        try:
+            SM2Curve._base_table = None
+            self.assertEqual(self.curve.multi_scalar_multiply([(s, G), (t, P)]), expected)
+            self.curve.base_table()
+            self.assertEqual(self.curve.multi_scalar_multiply([(s, G), (t, P)]), expected)
+        finally:
+            SM2Curve._base_table = saved_table
+        
+        self.assertEqual(self.curve.multi_scalar_multiply([(s, G), (t, P), (u, Q)]), expected3)
+        self.assertEqual(self.curve.multi_scalar_multiply([(0, G), (t, P)]),
+                         self.curve.point_multiply(t, P))
+        self.assertEqual(self.curve.multi_scalar_multiply([(5, P), (self.curve.n - 5, P)]), self.curve.O)
+        self.assertEqual(self.curve.multi_scalar_multiply([]), self.curve.O)
+    
+    def test_montgomery_ladder(self):
+        """测试Montgomery阶梯与变时间标量乘法结果一致（含边界标量）"""
+        n = self.curve.n
+        P = self.curve.point_multiply(987654321, self.curve.G)
+        
+        for k in [1, 2, 3, 0xFFFF, 0x123456789ABCDEF, n - 2, n - 1, n + 5, 1 << 255]:
+            for point in (self.curve.G, P):
+                self.assertEqual(self.curve.point_multiply_ladder(k, point),
+                                 self.curve.point_multiply(k, point))
+        
+        self.assertEqual(self.curve.point_multiply_ladder(0, P), self.curve.O)
+        self.assertEqual(self.curve.point_multiply_ladder(n, P), self.curve.O)
+        self.assertEqual(self.curve.point_multiply_ladder(5, self.curve.O), self.curve.O)
+    
+    def test_operation_profile(self):
+        """测试运算计数（退出后恢复原方法，不能嵌套）"""
+        original = SM2Curve.__dict__['jacobian_double']
+        P = self.curve.point_multiply(987654321, self.curve.G)
+        
+        with SM2Curve.profile() as prof:
+            # 5 = 0b101: 3次倍点（含从无穷远点开始的第一次）、2次混合加法、1次模逆
+            result = self.curve.point_multiply(5, P)
+            with self.assertRaises(RuntimeError):
+                with SM2Curve.profile():
+                    pass
+        
+        self.assertEqual(result, self.curve.point_multiply(5, P))
+        self.assertIs(SM2Curve.__dict__['jacobian_double'], original)
+        report = prof.report()
+        self.assertEqual(report['doublings'], 3)
+        self.assertEqual(report['additions'], 2)
+        self.assertEqual(report['inversions'], 1)
+        self.assertEqual(report['multiplications'], 3 * 8 + 2 * 11 + 4)
+        self.assertEqual(report['operations']['point_multiply']['calls'], 1)
+        
+        # 批量转换共用一次模逆
+        with SM2Curve.profile() as prof:
+            self.curve.batch_from_jacobian([self.curve.to_jacobian(P)] * 4)
+        self.assertEqual(prof.inversions, 1)
+        self.assertEqual(prof.calls['batch_inverse'], 1)
+
+
+class TestSM2Field(unittest.TestCase):
+    """SM2素数域约减测试"""
+    
+    def test_field_prime(self):
+        """测试p的广义梅森形式"""
+        self.assertEqual(sm2_field.P, SM2Curve.p)
+        self.assertEqual(sm2_field.P, 2**256 - 2**224 - 2**96 + 2**64 - 1)
+    
+    def test_reductions(self):
+        """测试各约减实现与 % 一致"""
+        p = sm2_field.P
+        rng = random.Random(2024)
+        values = [0, 1, p - 1, p, p + 1, 2**256 - 1, 2**256, (p - 1) ** 2, 2**512 - 1]
+        values += [rng.randrange(p) * rng.randrange(p) for _ in range(500)]
+        values += [rng.getrandbits(512) for _ in range(200)]
+        
+        for name, reduce in sm2_field.REDUCTIONS.items():
+            for x in values:
+                self.assertEqual(reduce(x), x % p, f"{name}: {x:x}")
+    
+    def test_benchmark_reduction(self):
+        """测试约减基准测试接口"""
+        results = sm2_field.benchmark_reduction(count=50, rounds=1)
+        self.assertEqual(set(results), set(sm2_field.REDUCTIONS))
+        self.assertTrue(all(ns > 0 for ns in results.values()))
+
+
+class TestBenchmarkHarness(unittest.TestCase):
+    """基准测试工具测试"""
+    
+    def test_measure(self):
+        """测试计时统计与冷启动计时（不影响已构建的基点表）"""
+        calls = []
+        stats = measure(lambda: calls.append(1), 10, warmup=2, ops=4)
+        self.assertEqual(len(calls), 12)
+        self.assertEqual(stats['iterations'], 10)
+        self.assertTrue(0 <= stats['min'] <= stats['p50'] <= stats['p95'] <= stats['p99'])
+        
+        table = SM2Curve().base_table()
+        stats = measure_cold(lambda: SM2Curve().base_table, 2)
+        self.assertEqual(stats['iterations'], 2)
+        self.assertIs(SM2Curve._base_table, table)
+    
+    def test_compare_results(self):
+        """测试与基线对比（新格式p50与旧格式平均值）"""
+        baseline = {'signing': {'optimized_avg': 1.0, 'speedup': 2.0, 'optimized': {'p50': 1.0, 'p99': 1.0}},
+                    'field': {'mul_mod': {'p50': 2.0}}}
+        current = {'signing': {'optimized_avg': 1.1, 'speedup': 9.0, 'optimized': {'p50': 1.5, 'p99': 9.0}},
+                   'field': {'mul_mod': {'p50': 1.0}}, 'point': {'jacobian_add': {'p50': 5.0}}}
+        
+        regressions = compare_results(current, baseline, tolerance=0.25)
+        self.assertEqual([item['metric'] for item in regressions], ['signing.optimized.p50'])
+        self.assertAlmostEqual(regressions[0]['ratio'], 1.5)
+        self.assertEqual(compare_results(current, baseline, tolerance=0.5), [])
+
+
+class TestSM3Hash(unittest.TestCase):
+    """SM2使用的SM3杂凑测试"""
+    
+    def test_standard_vectors(self):
+        """测试GB/T 32905标准向量"""
+        vectors = [
+            (b'abc', '66c7f0f462eeedd9d1f2d46bdc10e4e24167c4875cf2f7a2297da02b8f4ba8e0'),
+            (b'abcd' * 16, 'debe9ff92275b8a138604889c18e5a4d6fdb70e5387e5765293dcba39c0c5732'),
+        ]
+        for message, expected in vectors:
+            self.assertEqual(SM3(message).hexdigest(), expected)
+            self.assertEqual(new_sm3(message).hexdigest(), expected)
+            self.assertEqual(sm3(message).hex(), expected)
+    
+    def test_streaming_and_copy(self):
+        """测试分段update与copy中间状态"""
+        rng = random.Random(41)
+        for length in (0, 1, 55, 56, 63, 64, 65, 119, 128, 300):
+            message = bytes(rng.getrandbits(8) for _ in range(length))
+            h = SM3()
+            for i in range(0, length, 7):
+                h.update(message[i:i + 7])
+            self.assertEqual(h.digest(), SM3(message).digest())
+            
+            midstate = h.copy()
+            midstate.update(b'tail')
+            self.assertEqual(midstate.digest(), SM3(message + b'tail').digest())
+            self.assertEqual(h.digest(), SM3(message).digest())
+    
+    def test_sm2_hash_backend(self):
+        """测试SM2可替换的哈希后端"""
+        message = b"hash backend"
+        sm2_sm3 = SM2Optimized()
+        sm2_python = SM2Optimized(hash_factory=SM3)
+        sm2_sha256 = SM2Optimized(hash_factory=hashlib.sha256)
+        
+        private_key, public_key = sm2_sm3.generate_keypair()
+        za = sm2_sm3.za_value(b'1234567812345678', public_key)
+        self.assertEqual(za, sm2_python.za_value(b'1234567812345678', public_key))
+        self.assertEqual(SM2Basic().sm3_hash(b'abc'), sm3(b'abc'))
+        
+        signature = sm2_python.sign(private_key, message)
+        self.assertTrue(sm2_sm3.verify(public_key, message, signature))
+        self.assertTrue(SM2Basic().verify(public_key, message, signature))
+        self.assertFalse(sm2_sha256.verify(public_key, message, signature))
+        self.assertTrue(sm2_sha256.verify(public_key, message, sm2_sha256.sign(private_key, message)))
 
 
 class TestSM2Basic(unittest.TestCase):
@@ -155,20 +417,58 @@ class TestSM2Optimized(unittest.TestCase):
         """测试预计算功能"""
         G = self.sm2.curve.G
         
-        # 进行预计算
-        self.sm2.precompute_points(G, 8)
+        # 进行预计算（覆盖8位标量）
+        table = self.sm2.precompute_points(G, 8)
         
         # 验证预计算表
-        key = (G.x, G.y)
-        self.assertIn(key, self.sm2._precomputed_points)
-        
-        precomputed = self.sm2._precomputed_points[key]
-        self.assertEqual(len(precomputed), 8)
+        self.assertIn(G, self.sm2.precompute_cache)
+        self.assertIs(self.sm2.precompute_cache.peek(G), table)
+        self.assertEqual(table.window_bits * table.windows, 8)
         
         # 验证预计算的正确性
-        for i in range(8):
-            expected = self.sm2.curve.point_multiply(2**i, G)
-            self.assertEqual(precomputed[i], expected)
+        for k in range(256):
+            self.assertEqual(table.multiply(k), self.sm2.curve.point_multiply(k, G))
+        
+        # 超出预计算范围的标量回退到wNAF
+        k = 0x123456789
+        self.assertEqual(self.sm2.optimized_point_multiply(k, G), self.sm2.curve.point_multiply(k, G))
+    
+    def test_precomputation_cache(self):
+        """测试公钥预计算表的LRU缓存"""
+        sm2 = SM2Optimized(build_threshold=2)
+        cache = sm2.precompute_cache
+        keys = [sm2.generate_keypair() for _ in range(3)]
+        
+        # 预算只够两张表
+        probe = sm2.precompute_points(keys[0][1])
+        cache.max_bytes = 2 * cache.table_bytes(probe)
+        cache.clear()
+        
+        message = b"cache test"
+        signed = [(public_key, sm2.sign(private_key, message)) for private_key, public_key in keys]
+        
+        # 第一次验证只计数，第二次达到阈值后建表，之后命中
+        for _ in range(3):
+            self.assertTrue(sm2.verify(signed[0][0], message, signed[0][1]))
+        self.assertEqual((cache.misses, cache.hits, len(cache)), (2, 1, 1))
+        
+        for public_key, signature in signed[1:]:
+            for _ in range(2):
+                self.assertTrue(sm2.verify(public_key, message, signature))
+        
+        # 第三张表建好后淘汰最久未使用的keys[0]
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.evictions, 1)
+        self.assertNotIn(keys[0][1], cache)
+        self.assertLessEqual(cache.memory_bytes, cache.max_bytes)
+        
+        stats = cache.stats()
+        self.assertEqual(stats['builds'], 4)
+        self.assertEqual(stats['hits'] + stats['misses'], 7)
+        
+        # 缓存中的表不影响验证结果
+        self.assertFalse(sm2.verify(signed[1][0], message + b'!', signed[1][1]))
+        self.assertFalse(sm2.verify(signed[0][0], message, signed[1][1]))
     
     def test_optimized_point_multiply(self):
         """测试优化的标量乘法"""
@@ -184,6 +484,22 @@ class TestSM2Optimized(unittest.TestCase):
             optimized_result = self.sm2.optimized_point_multiply(k, G)
             self.assertEqual(basic_result, optimized_result)
     
+    def test_fixed_base_table(self):
+        """测试基点固定基表的标量乘法"""
+        curve = self.sm2.curve
+        test_scalars = [0, 1, 2, 255, 256, 0x10000, curve.n - 1, curve.n,
+                        0x9876543210FEDCBA9876543210FEDCBA9876543210FEDCBA9876543210FEDCBA]
+        
+        for k in test_scalars:
+            self.assertEqual(curve.base_multiply(k), curve.point_multiply(k, curve.G))
+        
+        # 其他点、其他窗口宽度
+        P = curve.point_multiply(12345, curve.G)
+        table = FixedBaseTable(curve, P, window_bits=4)
+        self.assertEqual(len(table.table), 64)
+        for k in [1, 15, 16, 0xABCDEF, curve.n - 2]:
+            self.assertEqual(table.multiply(k), curve.point_multiply(k, P))
+    
     def test_optimized_sign_verify(self):
         """测试优化版本的签名验证"""
         # 生成密钥对
@@ -198,6 +514,124 @@ class TestSM2Optimized(unittest.TestCase):
         is_valid = self.sm2.verify(public_key, message, signature)
         self.assertTrue(is_valid)
     
+    def test_signing_context(self):
+        """测试Za上下文缓存"""
+        private_key, public_key = self.sm2.generate_keypair()
+        user_id = b'ALICE123@YAHOO.COM'
+        message = b"context message"
+        
+        ctx = self.sm2.context(public_key, user_id)
+        self.assertIs(self.sm2.context(public_key, user_id), ctx)
+        self.assertIsNot(self.sm2.context(public_key), ctx)
+        self.assertEqual(ctx.za, self.sm2.za_value(user_id, public_key))
+        
+        # 复制中间状态得到的摘要与完整哈希一致，且多次使用互不影响
+        expected = int.from_bytes(self.sm2.sm3_hash(ctx.za + message), 'big')
+        self.assertEqual(ctx.digest(message), expected)
+        self.assertEqual(ctx.digest(message), expected)
+        
+        self.assertEqual(self.sm2.public_key_of(private_key), public_key)
+        signature = self.sm2.sign(private_key, message, user_id)
+        self.assertTrue(ctx.verify(message, signature))
+        self.assertTrue(SM2Basic().verify(public_key, message, signature, user_id))
+        self.assertFalse(ctx.verify(message + b'!', signature))
+        self.assertFalse(self.sm2.verify(public_key, message, signature))
+    
+    def test_signing_key(self):
+        """测试签名密钥对象与随机数池"""
+        private_key, public_key = self.sm2.generate_keypair()
+        message = b"signing key message"
+        
+        key = self.sm2.signing_key(private_key, background=False, pool_size=4)
+        self.assertEqual(key.public_key, public_key)
+        self.assertEqual(key.d_inv, pow(1 + private_key, -1, self.sm2.curve.n))
+        
+        self.assertEqual(key.fill(), 4)
+        self.assertEqual(key.pool_size(), 4)
+        signatures = [key.sign(message) for _ in range(6)]
+        self.assertEqual((key.pool_hits, key.pool_misses), (4, 2))
+        
+        basic = SM2Basic()
+        for signature in signatures:
+            self.assertTrue(basic.verify(public_key, message, signature))
+            self.assertTrue(key.verify(message, signature))
+        self.assertEqual(len(set(signatures)), len(signatures))
+        
+        # 后台线程填充随机数池，关闭后线程退出
+        with SigningKey(private_key, self.sm2, b'ALICE123@YAHOO.COM', pool_size=8) as background_key:
+            signature = background_key.sign(message)
+            thread = background_key._thread
+            self.assertTrue(self.sm2.verify(public_key, message, signature, b'ALICE123@YAHOO.COM'))
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(background_key.pool_size(), 0)
+        
+        with self.assertRaises(ValueError):
+            SigningKey(self.sm2.curve.n - 1, self.sm2, background=False)
+    
+    def test_generate_keypairs(self):
+        """测试批量生成密钥对（单进程与多进程）"""
+        curve = self.sm2.curve
+        for workers in (None, 2):
+            keypairs = list(self.sm2.generate_keypairs(40, workers, chunk_size=16))
+            self.assertEqual(len(keypairs), 40)
+            self.assertEqual(len({d for d, _ in keypairs}), 40)
+            for private_key, public_key in keypairs:
+                self.assertTrue(1 <= private_key <= curve.n - 2)
+                self.assertEqual(public_key, curve.point_multiply(private_key, curve.G))
+        
+        self.assertEqual(list(self.sm2.generate_keypairs(0)), [])
+    
+    def test_sign_many(self):
+        """测试批量签名（签名密钥、单进程与多进程）"""
+        private_key, public_key = self.sm2.generate_keypair()
+        messages = [b"batch %d" % i for i in range(30)] + [b""]
+        
+        with self.sm2.signing_key(private_key, background=False) as key:
+            signatures = list(key.sign_many(messages, chunk_size=8))
+        self.assertEqual(len(signatures), len(messages))
+        
+        for workers in (None, 2):
+            signatures += list(self.sm2.sign_many(private_key, iter(messages), b'ALICE123@YAHOO.COM',
+                                                  workers, chunk_size=8))
+        
+        for i, signature in enumerate(signatures):
+            user_id = b'1234567812345678' if i < len(messages) else b'ALICE123@YAHOO.COM'
+            self.assertTrue(self.sm2.verify(public_key, messages[i % len(messages)], signature, user_id))
+        self.assertEqual(list(self.sm2.sign_many(private_key, [])), [])
+    
+    def test_verify_batch(self):
+        """测试批量签名验证"""
+        keys = [self.sm2.generate_keypair() for _ in range(3)]
+        items = []
+        for i in range(12):
+            private_key, public_key = keys[i % len(keys)]
+            user_id = b'1234567812345678' if i % 2 else b'ALICE123@YAHOO.COM'
+            message = f"batch message {i}".encode()
+            items.append((public_key, message, self.sm2.sign(private_key, message, user_id), user_id))
+        
+        expected = [True] * len(items)
+        
+        # 篡改消息、签名、用户标识和公钥
+        public_key, message, signature, user_id = items[1]
+        items[1] = (public_key, message + b'!', signature, user_id)
+        items[4] = items[4][:2] + ((items[4][2][0], items[4][2][1] ^ 1), items[4][3])
+        items[7] = items[7][:3] + (b'mallory',)
+        items[9] = (keys[(9 + 1) % 3][1],) + items[9][1:]
+        items[10] = items[10][:2] + ((0, 1), items[10][3])
+        for i in (1, 4, 7, 9, 10):
+            expected[i] = False
+        
+        self.assertEqual(self.sm2.verify_batch(items), expected)
+        self.assertEqual([self.sm2.verify(*item) for item in items], expected)
+        self.assertEqual(self.sm2.verify_batch(items, workers=2), expected)
+        self.assertEqual(self.sm2.verify_batch([]), [])
+        
+        # 没有窗口表的公钥: 奇数倍点表与结果点各一次批量模逆
+        uncached = SM2Optimized(build_threshold=len(items) + 1)
+        with SM2Curve.profile() as prof:
+            self.assertEqual(uncached.verify_batch(items), expected)
+        self.assertEqual(prof.inversions, 2)
+    
     def test_cross_compatibility(self):
         """测试基础版本和优化版本的兼容性"""
         sm2_basic = SM2Basic()
@@ -215,6 +649,365 @@ class TestSM2Optimized(unittest.TestCase):
         opt_signature = self.sm2.sign(private_key, message)
         basic_verify = sm2_basic.verify(public_key, message, opt_signature)
         self.assertTrue(basic_verify)
+    
+    def test_constant_time_mode(self):
+        """测试恒定时间模式（秘密标量使用Montgomery阶梯）与普通模式互通"""
+        message = b"Constant time test"
+        
+        for sm2_ct in (SM2Basic(constant_time=True), SM2Optimized(constant_time=True)):
+            private_key, public_key = sm2_ct.generate_keypair()
+            self.assertEqual(public_key, self.sm2.curve.base_multiply(private_key))
+            
+            signature = sm2_ct.sign(private_key, message)
+            self.assertTrue(self.sm2.verify(public_key, message, signature))
+            self.assertTrue(sm2_ct.verify(public_key, message, self.sm2.sign(private_key, message)))
+            
+            ciphertext = sm2_ct.encrypt(public_key, message)
+            self.assertEqual(self.sm2.decrypt(private_key, ciphertext), message)
+            self.assertEqual(sm2_ct.decrypt(private_key, self.sm2.encrypt(public_key, message)), message)
+        
+        with SigningKey(private_key, sm2_ct, background=False, pool_size=2) as key:
+            self.assertTrue(self.sm2.verify(public_key, message, key.sign(message)))
+
+
+class TestSM2Encryption(unittest.TestCase):
+    """SM2公钥加密测试"""
+    
+    def setUp(self):
+        self.sm2_basic = SM2Basic()
+        self.sm2_opt = SM2Optimized()
+        self.private_key, self.public_key = self.sm2_opt.generate_keypair()
+    
+    def test_encrypt_decrypt(self):
+        """测试加解密及密文格式"""
+        for sm2 in (self.sm2_basic, self.sm2_opt):
+            for plaintext in (b'', b'a', b'encryption standard', bytes(range(256)) * 5):
+                ciphertext = sm2.encrypt(self.public_key, plaintext)
+                self.assertEqual(len(ciphertext), 65 + 32 + len(plaintext))
+                self.assertEqual(ciphertext[0], 4)
+                self.assertEqual(self.sm2_basic.decrypt(self.private_key, ciphertext), plaintext)
+                self.assertEqual(self.sm2_opt.decrypt(self.private_key, ciphertext), plaintext)
+    
+    def test_openssl_ciphertext(self):
+        """测试解密OpenSSL生成的密文（DER中的C1, C3, C2转换为C1||C3||C2）"""
+        private_key = 0x53219F7B45C39026F642D90D598D0D32BCA96AFB02B76E2BF9B1EE9E081FC89E
+        c1 = Point(0x1D9E5238AB4C9E6E1B2A88CD3A67CCDA9F9DEF08AA83BD83908AEECA4BC4E9DD,
+                   0x40C7221AD6D1D3D5A058A411576E093ED7C030F71C0D1D7EE2A2E8A788AFF029)
+        c3 = bytes.fromhex('EBC6AE0D52BF3F2D076F8C50E52CE92DDD0BB2C61C97A338B06FF20B7AAE6D94')
+        c2 = bytes.fromhex('5CF3B54081F8DE892781339DF18FB3F9CA')
+        
+        ciphertext = self.sm2_opt.curve.encode_point(c1) + c3 + c2
+        self.assertEqual(self.sm2_opt.decrypt(private_key, ciphertext), b'hello openssl sm2')
+    
+    def test_tampered_ciphertext(self):
+        """测试篡改密文与错误私钥"""
+        ciphertext = self.sm2_opt.encrypt(self.public_key, b"secret message")
+        
+        for position in (1, 70, len(ciphertext) - 1):
+            tampered = bytearray(ciphertext)
+            tampered[position] ^= 1
+            with self.assertRaises(ValueError):
+                self.sm2_opt.decrypt(self.private_key, bytes(tampered))
+        
+        with self.assertRaises(ValueError):
+            self.sm2_opt.decrypt(self.private_key + 1, ciphertext)
+        with self.assertRaises(ValueError):
+            self.sm2_opt.decrypt(self.private_key, ciphertext[:90])
+        with self.assertRaises(ValueError):
+            self.sm2_opt.encrypt(Point(1, 2), b"invalid key")
+    
+    def test_kdf_stream(self):
+        """测试流式KDF与一次性KDF一致"""
+        z = bytes(range(64))
+        expected = self.sm2_opt.kdf(z, 1000)
+        self.assertEqual(len(expected), 1000)
+        
+        stream = KDFStream(z, self.sm2_opt.new_hash)
+        pieces = [stream.read(n) for n in (1, 31, 32, 33, 100, 803)]
+        self.assertEqual(b''.join(pieces), expected)
+        self.assertFalse(stream.all_zero)
+    
+    def test_stream_encryption(self):
+        """测试分块流式加解密"""
+        plaintext = bytes(range(256)) * 40
+        
+        source = io.BytesIO(plaintext)
+        encrypted = io.BytesIO()
+        self.assertEqual(self.sm2_opt.encrypt_stream(self.public_key, source, encrypted, chunk_size=100),
+                         len(plaintext))
+        ciphertext = encrypted.getvalue()
+        self.assertEqual(self.sm2_basic.decrypt(self.private_key, ciphertext), plaintext)
+        
+        decrypted = io.BytesIO()
+        self.sm2_basic.decrypt_stream(self.private_key, io.BytesIO(ciphertext), decrypted, chunk_size=77)
+        self.assertEqual(decrypted.getvalue(), plaintext)
+        
+        tampered = bytearray(ciphertext)
+        tampered[-1] ^= 1
+        with self.assertRaises(ValueError):
+            self.sm2_opt.decrypt_stream(self.private_key, io.BytesIO(bytes(tampered)), io.BytesIO())
+
+
+class TestSM2KeyExchange(unittest.TestCase):
+    """SM2密钥交换测试"""
+    
+    def setUp(self):
+        self.sm2 = SM2Optimized()
+        self.alice = KeyExchangeParty(self.sm2.generate_keypair()[0], b'ALICE123@YAHOO.COM')
+        self.bob = KeyExchangeParty(self.sm2.generate_keypair()[0], b'BILL456@YAHOO.COM')
+    
+    def test_handshake(self):
+        """测试双方协商出相同密钥"""
+        for klen, confirm in ((16, True), (48, True), (16, False)):
+            key_a, key_b = handshake(self.alice, self.bob, klen, confirm)
+            self.assertEqual(key_a, key_b)
+            self.assertEqual(len(key_a), klen)
+        
+        # 每次握手使用新的临时密钥
+        self.assertNotEqual(handshake(self.alice, self.bob)[0], handshake(self.alice, self.bob)[0])
+    
+    def test_shared_point(self):
+        """测试共享点与按定义逐步计算的结果一致"""
+        curve = self.sm2.curve
+        session_a = self.alice.initiate(self.bob.public_key, self.bob.user_id)
+        session_b = self.bob.respond(self.alice.public_key, session_a.R, self.alice.user_id)
+        
+        # V = [tB](PA + [x̄1]RA)
+        expected = curve.point_multiply(session_b.t, curve.point_add(
+            self.alice.public_key, curve.point_multiply(x_bar(session_a.R.x), session_a.R)))
+        self.assertEqual(session_b._shared_point(session_a.R), expected)
+        
+        x = expected.x.to_bytes(32, 'big')
+        y = expected.y.to_bytes(32, 'big')
+        self.assertEqual(session_b.key, self.sm2.kdf(x + y + self.alice.za + self.bob.za, 16))
+        self.assertEqual(self.alice.peer_za(self.bob.public_key, self.bob.user_id), self.bob.za)
+        
+        # 对端公钥建好窗口表后结果不变
+        self.alice.sm2.precompute_points(self.bob.public_key)
+        self.assertEqual(session_a.finish(session_b.R, session_b.confirmation), session_b.key)
+        self.assertEqual(session_b.verify_confirmation(session_a.confirmation), session_b.key)
+    
+    def test_constant_time_mode(self):
+        """测试恒定时间模式下的密钥交换与普通模式互通"""
+        sm2_ct = SM2Optimized(constant_time=True)
+        carol = KeyExchangeParty(sm2_ct.generate_keypair()[0], b'CAROL789@YAHOO.COM', sm2_ct)
+        
+        key_a, key_c = handshake(self.alice, carol)
+        self.assertEqual(key_a, key_c)
+        key_c, key_b = handshake(carol, self.bob)
+        self.assertEqual(key_c, key_b)
+    
+    def test_confirmation_failure(self):
+        """测试确认值不匹配及非法的临时公钥和长期公钥"""
+        session_a = self.alice.initiate(self.bob.public_key, self.bob.user_id)
+        session_b = self.bob.respond(self.alice.public_key, session_a.R, self.alice.user_id)
+        
+        tampered = bytes([session_b.confirmation[0] ^ 1]) + session_b.confirmation[1:]
+        with self.assertRaises(ValueError):
+            session_a.finish(session_b.R, tampered)
+        self.assertIsNone(session_a.key)
+        
+        with self.assertRaises(ValueError):
+            session_b.verify_confirmation(None)
+        
+        # 使用错误的对端身份时确认失败
+        session_a = self.alice.initiate(self.bob.public_key, b'MALLORY')
+        session_b = self.bob.respond(self.alice.public_key, session_a.R, self.alice.user_id)
+        with self.assertRaises(ValueError):
+            session_a.finish(session_b.R, session_b.confirmation)
+        
+        with self.assertRaises(ValueError):
+            self.bob.respond(self.alice.public_key, Point(1, 2), self.alice.user_id)
+        
+        # 对端长期公钥为无穷远点或不在曲线上时，建立会话即失败
+        G = self.alice.sm2.curve.G
+        for bad_key in (self.alice.sm2.curve.O, Point(1, 2), Point(G.x, G.y + 1)):
+            with self.assertRaises(ValueError):
+                self.alice.initiate(bad_key, self.bob.user_id)
+            with self.assertRaises(ValueError):
+                self.bob.respond(bad_key, session_a.R, self.alice.user_id)
+
+
+class TestSM2Encoding(unittest.TestCase):
+    """密钥与签名编码测试"""
+    
+    def setUp(self):
+        self.sm2 = SM2Optimized()
+        self.keys = [self.sm2.generate_keypair() for _ in range(5)]
+        self.signatures = [self.sm2.sign(d, b"encoding") for d, _ in self.keys]
+        self.signatures += [(1, 1), (0x7F, 0x80), (self.sm2.curve.n - 1, 2**255)]
+    
+    def test_point_compression(self):
+        """测试压缩点编码与开平方解压"""
+        curve = self.sm2.curve
+        for _, public_key in self.keys + [(None, curve.G)]:
+            compressed = curve.encode_point(public_key, compressed=True)
+            self.assertEqual(len(compressed), 33)
+            self.assertEqual(compressed[0], 2 | (public_key.y & 1))
+            self.assertEqual(curve.decode_point(compressed), public_key)
+            self.assertEqual(curve.decode_point(curve.encode_point(public_key)), public_key)
+        
+        # x不在曲线上（右端不是二次剩余）时解压失败
+        x = 1
+        while curve.sqrt((x ** 3 + curve.a * x + curve.b) % curve.p) is not None:
+            x += 1
+        with self.assertRaises(ValueError):
+            curve.decode_point(b'\x02' + x.to_bytes(32, 'big'))
+        with self.assertRaises(ValueError):
+            curve.decode_point(b'\x05' + bytes(32))
+    
+    def test_signature_codecs(self):
+        """测试原始与DER签名编解码"""
+        for signature in self.signatures:
+            raw = sm2_encoding.encode_signature_raw(signature)
+            self.assertEqual(len(raw), 64)
+            self.assertEqual(sm2_encoding.decode_signature_raw(raw), signature)
+            
+            der = sm2_encoding.encode_signature_der(signature)
+            self.assertEqual(sm2_encoding.decode_signature_der(der), signature)
+        
+        self.assertEqual(sm2_encoding.encode_signature_der((1, 0x80)).hex(), '3007020101020200' + '80')
+        
+        # 非最简编码、负数、多余字节均被拒绝
+        for bad in ('3008020200010202' + '0080', '3006020181020101', '300602010102010100', '3006020101'):
+            with self.assertRaises(ValueError):
+                sm2_encoding.decode_signature_der(bytes.fromhex(bad))
+    
+    def test_openssl_signature(self):
+        """测试验证OpenSSL生成的DER签名"""
+        private_key = 0x53219F7B45C39026F642D90D598D0D32BCA96AFB02B76E2BF9B1EE9E081FC89E
+        der = bytes.fromhex(
+            '3046022100e2766e9744c5634c4102a2eac7c0a768fc5cb0146edde10b8df60c1c3914b9e1'
+            '022100b3a41aa7a00e38271b695355fa70aa1795e00dcc016feab594a69884094afdad')
+        signature = sm2_encoding.decode_signature_der(der)
+        public_key = self.sm2.public_key_of(private_key)
+        
+        self.assertTrue(self.sm2.verify(public_key, b'interop message', signature))
+        self.assertEqual(sm2_encoding.encode_signature_der(signature), der)
+    
+    def test_bulk_encoding(self):
+        """测试批量编解码"""
+        for fmt in ('raw', 'der'):
+            data = sm2_encoding.encode_signatures(self.signatures, fmt)
+            self.assertEqual(sm2_encoding.decode_signatures(data, fmt), self.signatures)
+        self.assertEqual(sm2_encoding.decode_signatures(b''), [])
+        with self.assertRaises(ValueError):
+            sm2_encoding.decode_signatures(bytes(65))
+        
+        public_keys = [public_key for _, public_key in self.keys]
+        for compressed in (True, False):
+            data = sm2_encoding.encode_public_keys(public_keys, compressed)
+            self.assertEqual(len(data), len(public_keys) * sm2_encoding.point_size(compressed))
+            self.assertEqual(sm2_encoding.decode_public_keys(data, compressed), public_keys)
+        
+        private_key, public_key = self.keys[0]
+        keypair = sm2_encoding.encode_keypair(private_key, public_key)
+        self.assertEqual(len(keypair), 65)
+        self.assertEqual(sm2_encoding.decode_keypair(keypair), (private_key, public_key))
+    
+    def test_keypair_stream(self):
+        """测试密钥对流式写入与读取（raw 与 jsonl）"""
+        keypairs = list(self.sm2.generate_keypairs(10))
+        for fmt in sm2_encoding.KEYPAIR_FORMATS:
+            stream = io.BytesIO()
+            self.assertEqual(sm2_encoding.write_keypairs(iter(keypairs), stream, fmt), 10)
+            if fmt == 'raw':
+                self.assertEqual(len(stream.getvalue()), 10 * sm2_encoding.KEYPAIR_SIZE)
+            stream.seek(0)
+            self.assertEqual(list(sm2_encoding.read_keypairs(stream, fmt)), keypairs)
+        
+        with self.assertRaises(ValueError):
+            list(sm2_encoding.read_keypairs(io.BytesIO(bytes(70)), 'raw'))
+        with self.assertRaises(ValueError):
+            sm2_encoding.write_keypairs(keypairs, io.BytesIO(), 'pem')
+    
+    def test_message_and_signature_streams(self):
+        """测试消息流读取与签名流写入"""
+        messages = [b"first", b"", b"third\r", b"\n\x00binary"]
+        stream = io.BytesIO()
+        self.assertEqual(sm2_encoding.write_messages(messages, stream), 4)
+        stream.seek(0)
+        self.assertEqual(list(sm2_encoding.read_messages(stream, 'length-prefixed')), messages)
+        
+        lines = io.BytesIO(b"one\ntwo\r\n\nlast")
+        self.assertEqual(list(sm2_encoding.read_messages(lines)), [b"one", b"two", b"", b"last"])
+        with self.assertRaises(ValueError):
+            list(sm2_encoding.read_messages(io.BytesIO(b"\x00\x00\x00\x05abc"), 'length-prefixed'))
+        
+        for fmt in ('raw', 'der'):
+            stream = io.BytesIO()
+            self.assertEqual(sm2_encoding.write_signatures(iter(self.signatures), stream, fmt),
+                             len(self.signatures))
+            self.assertEqual(sm2_encoding.decode_signatures(stream.getvalue(), fmt), self.signatures)
+        
+        stream = io.BytesIO()
+        sm2_encoding.write_signatures(self.signatures, stream, 'jsonl')
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), len(self.signatures))
+        self.assertEqual(int(json.loads(lines[0])['s'], 16), self.signatures[0][1])
+
+
+class TestSM2Service(unittest.TestCase):
+    """SM2签名/验证服务测试（工作进程数为0，在事件循环所在进程中执行）"""
+    
+    def setUp(self):
+        self.sm2 = SM2Optimized()
+        self.private_key, self.public_key = self.sm2.generate_keypair()
+    
+    async def _run_requests(self, lines, **options):
+        server = SM2Server(self.private_key, workers=0, **options)
+        host, port = await server.start()
+        try:
+            client = SM2LoadClient(host, port, connections=2, window=8)
+            pubkey = await client.request(b'PUBKEY\n')
+            responses = [await client.request(line) for line in lines]
+            stats = await client.run(make_requests(40, 'mixed', keys=2))
+        finally:
+            await server.stop()
+        return pubkey, responses, stats, server
+    
+    def test_sign_verify_requests(self):
+        """测试签名、验证、公钥查询和错误请求"""
+        message = b"service message"
+        signature = self.sm2.sign(self.private_key, message)
+        encoded_key = sm2_encoding.encode_public_key(self.public_key).hex().encode()
+        encoded_sig = sm2_encoding.encode_signature_raw(signature).hex().encode()
+        bad_sig = sm2_encoding.encode_signature_raw((signature[0], signature[1] ^ 1)).hex().encode()
+        
+        lines = [
+            b'SIGN ' + message.hex().encode() + b'\n',
+            b'VERIFY ' + encoded_key + b' ' + message.hex().encode() + b' ' + encoded_sig + b'\n',
+            b'VERIFY ' + encoded_key + b' ' + message.hex().encode() + b' ' + bad_sig + b'\n',
+            b'SIGN zz\n',
+            b'HELLO\n',
+        ]
+        pubkey, responses, stats, server = asyncio.run(self._run_requests(lines))
+        
+        self.assertEqual(pubkey, b'KEY ' + encoded_key + b'\n')
+        self.assertTrue(responses[0].startswith(b'SIG '))
+        signed = sm2_encoding.decode_signature_raw(bytes.fromhex(responses[0].split()[1].decode()))
+        self.assertTrue(self.sm2.verify(self.public_key, message, signed))
+        self.assertEqual(responses[1:], [b'OK\n', b'FAIL\n', b'ERR\n', b'ERR\n'])
+        
+        # 负载请求全部成功，流水线请求被合并为批次
+        self.assertEqual((stats['requests'], stats['ok']), (40, 40))
+        self.assertLess(server.stats()['batches'], server.stats()['requests'])
+    
+    def test_micro_batcher(self):
+        """测试微批处理按时间窗口和最大批大小合并请求"""
+        batches = []
+        
+        async def run_batch(items):
+            batches.append(list(items))
+            return [item * 2 for item in items]
+        
+        async def main():
+            batcher = MicroBatcher(run_batch, window=0.01, max_batch=4)
+            futures = [batcher.submit(i) for i in range(6)]
+            return await asyncio.gather(*futures)
+        
+        self.assertEqual(asyncio.run(main()), [0, 2, 4, 6, 8, 10])
+        self.assertEqual(batches, [[0, 1, 2, 3], [4, 5]])
 
 
 class TestSM2Security(unittest.TestCase):
@@ -296,21 +1089,8 @@ def run_all_tests():
     print("🧪 SM2算法测试套件")
     print("=" * 50)
     
-    # 创建测试套件
-    test_suite = unittest.TestSuite()
-    
-    # 添加测试类
-    test_classes = [
-        TestSM2Curve,
-        TestSM2Basic,
-        TestSM2Optimized,
-        TestSM2Security,
-        TestSatoshiSignatureForgery
-    ]
-    
-    for test_class in test_classes:
-        tests = unittest.TestLoader().loadTestsFromTestCase(test_class)
-        test_suite.addTests(tests)
+    # 加载本模块中的全部测试类（新增的测试类无需再手动登记）
+    test_suite = unittest.defaultTestLoader.loadTestsFromModule(sys.modules[__name__])
     
     # 运行测试
     runner = unittest.TextTestRunner(verbosity=2)